@@ -0,0 +1,161 @@
+import numpy as np
+import argparse
+import csv
+import glob
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+
+import visualize
+from lib import cache
+from lib import loader
+from lib import inference
+from lib import normalize
+from lib import profiling
+from lib import sorting
+from lib.missing import MissingMask
+from lib.profiler import currentMemory, peakMemory, resetPeakMemory
+
+STAGES = ['header', 'load', 'inference', 'missing', 'normalize', 'sort', 'figure', 'html']
+# the stages faster than this (seconds) are too noisy to be compared with the baseline
+MIN_COMPARED_TIME = 0.005
+
+def parseArguments():
+    parser = argparse.ArgumentParser(description='time each stage of the pipeline on the resources datasets')
+    parser.add_argument('datasets', nargs='*', default=None, help='the csv files to benchmark (resources/*.csv by default)')
+    parser.add_argument('-r', '--repeat', dest='repeat', type=int, default=5, help='the number of runs of each stage')
+    parser.add_argument('--scales', dest='scales', default='1,10,100', help='the row multipliers of the synthetic variants, ex: 1,10,100')
+    parser.add_argument('--wide', dest='wide', type=int, default=10, help='the column multiplier of the wide variant, 0 to skip it')
+    parser.add_argument('-o', '--output', dest='output', default='benchmark.json', help='the json file of the results')
+    parser.add_argument('--baseline', dest='baseline', default=None, help='the json results to compare with')
+    parser.add_argument('--threshold', dest='threshold', type=float, default=0.25, help='the relative slowdown of a stage median failing the comparison')
+    args = parser.parse_args()
+    if len(args.datasets) == 0:
+        args.datasets = sorted(glob.glob(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'resources', '*.csv')))
+    args.scales = [int(s) for s in args.scales.split(',') if s != '']
+    return args
+
+def measure(function, repeat, warmup=False):
+    ''' run `function` `repeat` times, after an untimed run with `warmup` set (ex: for the stages
+        importing plotly on their first run)
+        returns its last result and the median time, 95th percentile time and peak memory
+        (above the memory in use before the stage) of the runs
+    '''
+    if warmup:
+        function()
+    times, peaks = [], []
+    for _ in range(repeat):
+        resetPeakMemory()
+        before = currentMemory()
+        start = time.time()
+        result = function()
+        times.append(time.time() - start)
+        peaks.append(max(0, peakMemory() - before))
+    return result, {
+        'median': float(np.median(times)),
+        'p95': float(np.percentile(times, 95)),
+        'peak_memory': int(max(peaks)),
+    }
+
+def writeVariant(filepath, directory, rows=1, columns=1):
+    ''' write a synthetic variant of a csv file, its rows repeated `rows` times and its
+        columns `columns` times (the labels of the copies are suffixed)
+    '''
+    name = os.path.splitext(os.path.basename(filepath))[0]
+    variant = os.path.join(directory, '%s-x%d-w%d.csv' % (name, rows, columns))
+    labels, has_header = loader.readLabels(filepath)
+    with open(filepath, 'rb') as f:
+        body = [row for row in csv.reader(f) if len(row) > 0][1 if has_header else 0:]
+    with open(variant, 'wb') as f:
+        writer = csv.writer(f)
+        writer.writerow(['%s_%d' % (label, k) if k > 0 else label for k in range(columns) for label in labels])
+        for _ in range(rows):
+            writer.writerows(row * columns for row in body)
+    return variant
+
+def benchmarkFile(filepath, repeat, directory):
+    ''' time each stage of the pipeline on a csv file
+    '''
+    results = {}
+    _, results['header'] = measure(lambda: loader.readLabels(filepath), repeat)
+    table, results['load'] = measure(lambda: loader.loadColumns(filepath), repeat)
+    features_type, results['inference'] = measure(lambda: inference.inferTable(table), repeat)
+    def missing():
+        mask = MissingMask.fromColumns([column.missing_bits for column in table.columns], table.shape[0])
+        return mask.countPerColumn(), mask.countPerRow()
+    _, results['missing'] = measure(missing, repeat)
+    heatmap, results['normalize'] = measure(lambda: normalize.computeHeatmapValues(table, features_type), repeat)
+    sort_labels = list(table.labels[:2])
+    _, results['sort'] = measure(lambda: sorting.sortPermutation(heatmap, table.labels, sort_labels), repeat)
+    # the figure is built from the table, types and heatmap of the stages above
+    args = visualize.parseArguments([filepath, '--no-cache', '--sort', ','.join(sort_labels)])
+    profile = profiling.DatasetProfile(filepath, table, features_type, heatmap,
+                                       [cache.columnRange(column, features_type[j]) for j, column in enumerate(table.columns)],
+                                       table.mask.countPerColumn(), np.arange(table.shape[0]), table.shape[0])
+    # plotly is imported by the first figure and the first html page
+    (fig, scripts, _), results['figure'] = measure(lambda: visualize.buildFigure(args, profile), repeat, warmup=True)
+    filename = os.path.join(directory, 'csv-plot.html')
+    _, results['html'] = measure(lambda: visualize.writeReport(args, fig, scripts, filename, auto_open=False), repeat, warmup=True)
+    return results
+
+def compare(results, baseline, threshold):
+    ''' the (variant, stage, time, baseline time) of the stages slower than the baseline by more
+        than `threshold`
+    '''
+    regressions = []
+    for variant, stages in sorted(results.items()):
+        for stage in STAGES:
+            if variant not in baseline or stage not in baseline[variant] or stage not in stages:
+                continue
+            now, then = stages[stage]['median'], baseline[variant][stage]['median']
+            if now > MIN_COMPARED_TIME and now > then * (1 + threshold):
+                regressions.append((variant, stage, now, then))
+    return regressions
+
+def printResults(results):
+    sys.stdout.write('%-40s %-10s %10s %10s %10s\n' % ('dataset', 'stage', 'median', 'p95', 'peak'))
+    for variant, stages in sorted(results.items()):
+        for stage in STAGES:
+            r = stages[stage]
+            sys.stdout.write('%-40s %-10s %9.4fs %9.4fs %8.1fMB\n' % (variant, stage, r['median'], r['p95'], r['peak_memory'] / 1024.**2))
+
+def main():
+    args = parseArguments()
+    directory = tempfile.mkdtemp()
+    results = {}
+    try:
+        for filepath in args.datasets:
+            name = os.path.splitext(os.path.basename(filepath))[0]
+            variants = [(name if scale == 1 else '%s-x%d' % (name, scale), scale, 1) for scale in args.scales]
+            if args.wide > 1:
+                variants.append(('%s-w%d' % (name, args.wide), 1, args.wide))
+            for variant, rows, columns in variants:
+                path = filepath if rows == 1 and columns == 1 else writeVariant(filepath, directory, rows, columns)
+                results[variant] = benchmarkFile(path, args.repeat, directory)
+                if path != filepath:
+                    os.remove(path)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    printResults(results)
+    with open(args.output, 'w') as f:
+        json.dump({
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'repeat': args.repeat,
+            'results': results,
+        }, f, indent=1, sort_keys=True)
+    if args.baseline is not None:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['results']
+        regressions = compare(results, baseline, args.threshold)
+        for variant, stage, now, then in regressions:
+            sys.stdout.write('regression: %s %s %.4fs (baseline %.4fs)\n' % (variant, stage, now, then))
+        if len(regressions) > 0:
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+import numpy as np
+import collections
+import copy
+import glob
+import multiprocessing
+import os
+import dataset
+import profiler
+import utils
+
+# the arguments of the report workers, set before the pool is forked (see `parallel.shared`)
+shared = None
+
+def expandPaths(pattern):
+    ''' the csv files of a directory, or the files matching a glob pattern, sorted
+    '''
+    if os.path.isdir(pattern):
+        pattern = os.path.join(pattern, '*.csv')
+    return sorted(path for path in glob.glob(pattern) if os.path.isfile(path))
+
+def reportFilenames(paths, output_dir):
+    ''' the report of each file in `output_dir`, named after the file, or after its path from
+        the common directory of the files sharing its name (ex: a_part.html and b_part.html
+        for data/a/part.csv and data/b/part.csv). A name still taken (by the index page or
+        another report) is suffixed by a number
+    '''
+    names = [os.path.splitext(os.path.basename(path))[0] for path in paths]
+    groups = collections.defaultdict(list)
+    for path, name in zip(paths, names):
+        groups[name].append(os.path.dirname(os.path.abspath(path)) + os.sep)
+    taken, filenames = set(['index']), []
+    for path, name in zip(paths, names):
+        if len(groups[name]) > 1:
+            directory = os.path.commonprefix(groups[name])
+            directory = directory[:directory.rfind(os.sep) + 1]
+            name = os.path.splitext(os.path.abspath(path)[len(directory):])[0].replace(os.sep, '_')
+        unique, k = name, 1
+        while unique in taken:
+            k += 1
+            unique = '%s-%d' % (name, k)
+        taken.add(unique)
+        filenames.append(os.path.join(output_dir, unique + '.html'))
+    return filenames
+
+def summarize(table, features_type, n_rows):
+    ''' the summary stats of a profiled dataset shown in the index page
+    '''
+    n_cells = table.shape[0] * table.shape[1]
+    return {
+        'rows': int(n_rows),
+        'columns': table.shape[1],
+        'missing': 100. * table.mask.countPerColumn().sum() / n_cells if n_cells > 0 else 0.,
+        'types': dict((dataset.labels[t], int(np.sum(np.asarray(features_type) == t))) for t in sorted(dataset.labels)),
+    }
+
+def reportWorker(job):
+    function, args = shared
+    filepath, filename = job
+    n_stages = len(profiler.active.stages) if profiler.active is not None else 0
+    try:
+        summary = function(args, filepath, filename, False)
+    except Exception as e:
+        summary = {'error': '%s: %s' % (type(e).__name__, e)}
+    summary['path'], summary['report'] = filepath, filename
+    if profiler.active is not None:
+        # the stages recorded by a worker are sent back to the profiler of the parent process
+        summary['stages'] = [stage.toDict() for stage in profiler.active.stages[n_stages:]]
+    return summary
+
+def runBatch(function, paths, args, output_dir, jobs=1):
+    ''' write the report of each file with `function(args, filepath, filename, auto_open)`,
+        split over a pool of `jobs` processes, then an index.html page linking the reports
+        Parameters :
+            * `function` : (function)
+                writes the report of a file and returns its `summarize` stats
+            * `args` : (Namespace)
+                the arguments of `function`, the reports run on a single process each
+        returns the path of the index page
+    '''
+    global shared
+    if not os.path.isdir(output_dir):
+        os.makedirs(output_dir)
+    args = copy.copy(args)
+    args.jobs = 1
+    shared = (function, args)
+    reports = list(zip(paths, reportFilenames(paths, output_dir)))
+    try:
+        if jobs <= 1 or len(paths) <= 1:
+            summaries = [reportWorker(job) for job in reports]
+        else:
+            pool = multiprocessing.Pool(min(jobs, len(paths)))
+            try:
+                # the files are handed out one at a time, their sizes are unrelated
+                summaries = pool.map(reportWorker, reports, chunksize=1)
+            finally:
+                pool.close()
+                pool.join()
+    finally:
+        shared = None
+    if profiler.active is not None and jobs > 1 and len(paths) > 1:
+        for summary in summaries:
+            profiler.active.stages.extend(profiler.Stage.fromDict(stage) for stage in summary['stages'])
+    index = os.path.join(output_dir, 'index.html')
+    writeIndex(summaries, index)
+    return index
+
+def writeIndex(summaries, filename):
+    ''' write the html index page of the reports, one row of summary stats per file
+    '''
+    type_labels = [dataset.labels[t] for t in sorted(dataset.labels) if t != dataset.types['missing']]
+    escape = lambda s: utils.escapeHTML(str(s))
+    with open(filename, 'w') as f:
+        f.write('<html><head><meta charset="utf-8" /><style>')
+        f.write('body { font: 13px sans-serif; } table { border-collapse: collapse; } ')
+        f.write('th, td { padding: 3px 10px; border-bottom: 1px solid #d0d0d0; text-align: right; } th:first-child, td:first-child { text-align: left; }')
+        f.write('</style></head><body><table>')
+        f.write('<tr><th>file</th><th>rows</th><th>columns</th><th>missing</th>%s</tr>' % ''.join('<th>%s</th>' % label for label in type_labels + ['empty']))
+        for summary in summaries:
+            name = escape(summary['path'])
+            if 'error' in summary:
+                f.write('<tr><td>%s</td><td colspan="%d">%s</td></tr>' % (name, 3 + len(type_labels) + 1, escape(summary['error'])))
+                continue
+            link = escape(os.path.basename(summary['report']))
+            f.write('<tr><td><a href="%s">%s</a></td><td>%d</td><td>%d</td><td>%.1f%%</td>%s</tr>' % (
+                link, name, summary['rows'], summary['columns'], summary['missing'],
+                ''.join('<td>%d</td>' % summary['types'][label] for label in type_labels + ['missing'])))
+        f.write('</table></body></html>')
@@ -0,0 +1,185 @@
+import numpy as np
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+import dataset
+import dates
+import inference
+import normalize
+import sketches
+from columns import Column, Table
+from missing import MissingMask
+
+CACHE_VERSION = 5
+CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'datasetVisualizationTool')
+MAX_SIZE = 2 * 1024**3
+# the profiles are kept apart from the other artifacts of the cache directory (row indices,
+# incremental states), which are not evicted with them
+PROFILES_DIR = 'profiles'
+# the name of a profile entry, its key (see `ProfileCache.key`)
+ENTRY_NAME = re.compile(r'^[0-9a-f]{40}$')
+BLOCK_SIZE = 1024**2
+
+def contentHash(filepath):
+    sha = hashlib.sha1()
+    with open(filepath, 'rb') as f:
+        for block in iter(lambda: f.read(BLOCK_SIZE), b''):
+            sha.update(block)
+    return sha.hexdigest()
+
+def inferenceSettings():
+    ''' the settings the cached artifacts depend on, a change invalidates the cache
+    '''
+    return {
+        'version': CACHE_VERSION,
+        'min_confidence': inference.MIN_CONFIDENCE,
+        'missing_labels': dataset.missing_labels,
+        'date_formats': list(dates.FORMATS.keys()),
+        'high_cardinality': [normalize.HIGH_CARDINALITY, normalize.CARDINALITY_ENCODING, normalize.TOP_K, normalize.HASH_BINS],
+    }
+
+def saveStrings(path, strings):
+    ''' save a list of strings as a blob of bytes and the offsets of the strings in it
+    '''
+    strings = [s if isinstance(s, bytes) else s.encode('utf-8') for s in strings]
+    offsets = np.cumsum([0] + [len(s) for s in strings]).astype(np.int64)
+    np.save(path + '.offsets.npy', offsets)
+    np.save(path + '.blob.npy', np.frombuffer(b''.join(strings), dtype=np.uint8))
+
+def loadStrings(path):
+    offsets = np.load(path + '.offsets.npy')
+    blob = np.load(path + '.blob.npy').tobytes()
+    return [blob[offsets[i]:offsets[i+1]] for i in range(len(offsets) - 1)]
+
+def columnRange(column, feature_type):
+    ''' the [min, max] of the values placed on the scale of a feature, None if it has none
+    '''
+    if feature_type == dataset.types['numerical'] and column.values is not None:
+        values = column.values[column.isNumerical()]
+    elif feature_type == dataset.types['date'] and column.epochs is not None:
+        values = column.epochs[~np.isnan(column.epochs)]
+    else:
+        return None
+    return [float(np.min(values)), float(np.max(values))] if len(values) > 0 else None
+
+def readEntry(entry):
+    ''' read a profile written by `writeEntry`, its arrays are memory-mapped
+        returns the table, features_type, heatmap, ranges and the meta data of the entry
+    '''
+    with open(os.path.join(entry, 'meta.json')) as f:
+        meta = json.load(f)
+    path = lambda name: os.path.join(entry, name)
+    optional = lambda name: np.load(path(name), mmap_mode='r') if os.path.isfile(path(name)) else None
+    mask = MissingMask(np.load(path('mask.npy'), mmap_mode='r'), meta['n_rows'])
+    columns = []
+    for j in range(len(meta['features_type'])):
+        column = Column(optional('values_%d.npy'%j), optional('codes_%d.npy'%j), loadStrings(path('categories_%d'%j)), mask.bits[j], meta['n_rows'])
+        column.epochs = optional('epochs_%d.npy'%j)
+        column.text_codes = optional('text_codes_%d.npy'%j)
+        if column.text_codes is not None:
+            column.texts = loadStrings(path('texts_%d'%j))
+        column.encoding = meta['encodings'][j]
+        if column.encoding is not None:
+            # the distinct count of an encoded column is not found again from its categories
+            column.sketch = sketches.ColumnSketch()
+            column.sketch.hll.registers = np.load(path('registers_%d.npy'%j))
+        columns.append(column)
+    table = Table(loadStrings(path('labels')), columns, mask)
+    return table, meta['features_type'], np.load(path('heatmap.npy'), mmap_mode='r'), meta['ranges'], meta
+
+def writeEntry(entry, table, features_type, heatmap, meta=None):
+    ''' write a profile in the directory `entry`, as .npy files and a meta.json file
+        Parameters :
+            * `meta` : (dict)
+                additional meta data stored in meta.json
+    '''
+    path = lambda name: os.path.join(entry, name)
+    np.save(path('mask.npy'), table.mask.bits)
+    np.save(path('heatmap.npy'), heatmap)
+    saveStrings(path('labels'), list(table.labels))
+    for j, column in enumerate(table.columns):
+        for name, array in [('values', column.values), ('codes', column.codes), ('epochs', column.epochs), ('text_codes', column.text_codes)]:
+            if array is not None:
+                np.save(path('%s_%d.npy'%(name, j)), array)
+        saveStrings(path('categories_%d'%j), column.categories)
+        if column.text_codes is not None:
+            saveStrings(path('texts_%d'%j), column.texts)
+        if column.encoding is not None:
+            np.save(path('registers_%d.npy'%j), column.sketch.hll.registers)
+    meta = dict(meta or {})
+    meta.update({
+        'n_rows': table.shape[0],
+        'features_type': [int(t) for t in features_type],
+        'ranges': [columnRange(column, features_type[j]) for j, column in enumerate(table.columns)],
+        'encodings': [column.encoding for column in table.columns],
+    })
+    # meta.json is written last, an entry without it is incomplete
+    with open(path('meta.json'), 'w') as f:
+        json.dump(meta, f)
+
+class ProfileCache(object):
+    ''' an on-disk cache of the profiled datasets, keyed by the file path, size, modification
+        time, content hash and inference settings. Each entry is a directory of .npy files
+        which are memory-mapped when loaded, in the `PROFILES_DIR` subdirectory of the cache
+        directory. The least recently used entries are evicted once they exceed `max_size` bytes
+    '''
+    def __init__(self, directory=CACHE_DIR, max_size=MAX_SIZE):
+        self.directory = os.path.join(directory, PROFILES_DIR)
+        self.max_size = max_size
+        self.keys = {}
+
+    def key(self, filepath):
+        stat = os.stat(filepath)
+        identity = (os.path.abspath(filepath), stat.st_size, stat.st_mtime)
+        # the content is only hashed once per file version
+        if identity not in self.keys:
+            settings = json.dumps(list(identity) + [contentHash(filepath), inferenceSettings()], sort_keys=True)
+            self.keys[identity] = hashlib.sha1(settings.encode('utf-8')).hexdigest()
+        return self.keys[identity]
+
+    def load(self, filepath):
+        ''' return the cached (table, features_type, heatmap, ranges) of a file, None if not cached,
+            see `columnRange` for the ranges
+        '''
+        entry = os.path.join(self.directory, self.key(filepath))
+        if not os.path.isfile(os.path.join(entry, 'meta.json')):
+            return None
+        os.utime(entry, None)
+        return readEntry(entry)[:4]
+
+    def store(self, filepath, table, features_type, heatmap):
+        ''' store the profile of a file, then evict the least recently used entries
+        '''
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+        entry = os.path.join(self.directory, self.key(filepath))
+        # staged under a name which is not a key, it is not an entry until renamed
+        tmp = tempfile.mkdtemp(prefix='tmp', dir=self.directory)
+        writeEntry(tmp, table, features_type, heatmap)
+        if os.path.isdir(entry):
+            shutil.rmtree(entry)
+        os.rename(tmp, entry)
+        self.evict()
+
+    def entries(self):
+        ''' the (last use time, size, path) of the complete entries of the cache
+        '''
+        entries = []
+        for name in os.listdir(self.directory):
+            entry = os.path.join(self.directory, name)
+            if ENTRY_NAME.match(name) and os.path.isfile(os.path.join(entry, 'meta.json')):
+                size = sum(os.path.getsize(os.path.join(entry, f)) for f in os.listdir(entry))
+                entries.append((os.path.getmtime(entry), size, entry))
+        return sorted(entries)
+
+    def evict(self):
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry in entries[:-1]:
+            if total <= self.max_size:
+                break
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
@@ -0,0 +1,217 @@
+import numpy as np
+from missing import MissingMask, takeColumn, unpackColumn
+
+class Column(object):
+    ''' typed storage for a single feature of the dataset
+        Attributes :
+            * `values` : (ndarray or None)
+                float64 array holding the numerical cells (nan elsewhere),
+                None when the feature has no numerical cell
+            * `codes` : (ndarray or None)
+                int32 array of indices in `categories` for the non-numerical
+                cells (-1 elsewhere), None when every cell is numerical or missing
+            * `categories` : (list)
+                the dictionary of the distinct non-numerical strings
+            * `texts` : (list)
+                the dictionary of the text of the numerical cells which is not their formatted
+                value (see `formatNumber`), ex: '007' or '1.10'
+            * `text_codes` : (ndarray or None)
+                int32 array of indices in `texts` for the numerical cells whose text is in it
+                (-1 elsewhere), None when every numerical cell is its formatted value
+            * `missing_bits` : (ndarray)
+                the missing cells packed as bits, usually a row of the `missing.MissingMask`
+                of the table, unpacked by the `missing` property
+            * `length` : (int)
+                the number of cells
+            * `epochs` : (ndarray or None)
+                the epoch seconds of the categories once parsed as dates (see `dates.columnEpochs`)
+            * `stats` : (ColumnStats or None)
+                the summary statistics of the numerical cells gathered while loading the column,
+                None when not gathered (see `stats.columnStats`)
+            * `sketch` : (ColumnSketch or None)
+                the distinct count and most frequent strings of the column, gathered while
+                loading it or over the whole file when sampled, None when not gathered
+                (see `sketches.columnSketch`)
+            * `encoding` : (string or None)
+                how the strings of a high-cardinality column were encoded while loading, its
+                dictionary bounded (see `loader.ColumnBuilder`) : 'topk' when `categories` are
+                its most frequent strings then `normalize.OTHER_CATEGORY`, 'hash' when they
+                are the hash bins of the strings, None when they are every distinct string
+    '''
+    def __init__(self, values, codes, categories, missing_bits, length):
+        self.values = values
+        self.codes = codes
+        self.categories = categories
+        self.missing_bits = missing_bits
+        self.length = length
+        self.texts = []
+        self.text_codes = None
+        self.epochs = None
+        self.stats = None
+        self.sketch = None
+        self.encoding = None
+
+    def __len__(self):
+        return self.length
+
+    @property
+    def missing(self):
+        ''' bool array, True where the cell is a missing label
+        '''
+        return unpackColumn(self.missing_bits, self.length)
+
+    def isNumerical(self, rows=None):
+        ''' bool array, True where the cell holds a numerical value
+            Parameters :
+                * `rows` : (ndarray)
+                    optional indices of the rows to check, all rows if None
+        '''
+        if self.values is None:
+            return np.zeros(len(self) if rows is None else len(rows), dtype=bool)
+        if rows is None:
+            numerical = ~self.missing
+            if self.codes is not None:
+                numerical &= self.codes < 0
+            return numerical
+        numerical = ~takeColumn(self.missing_bits, rows)
+        if self.codes is not None:
+            numerical &= self.codes[rows] < 0
+        return numerical
+
+    def isCategorical(self):
+        ''' bool array, True where the cell holds a dictionary encoded string
+        '''
+        if self.codes is None:
+            return np.zeros(len(self), dtype=bool)
+        return self.codes >= 0
+
+    def strings(self, rows=None):
+        ''' rebuild the cells as strings (missing cells are empty strings)
+            Parameters :
+                * `rows` : (ndarray)
+                    optional indices of the rows to rebuild, all rows if None
+        '''
+        n = len(self) if rows is None else len(rows)
+        out = np.empty(n, dtype=object)
+        out[:] = ''
+        if self.values is not None:
+            values = self.values if rows is None else self.values[rows]
+            numerical = self.isNumerical(rows)
+            out[numerical] = [formatNumber(v) for v in values[numerical]]
+            if self.text_codes is not None:
+                text_codes = self.text_codes if rows is None else self.text_codes[rows]
+                raw = numerical & (text_codes >= 0)
+                out[raw] = np.asarray(self.texts, dtype=object)[text_codes[raw]]
+        if self.codes is not None:
+            codes = self.codes if rows is None else self.codes[rows]
+            categorical = codes >= 0
+            out[categorical] = np.asarray(self.categories, dtype=object)[codes[categorical]]
+        return out
+
+    def stringCodes(self):
+        ''' the distinct strings of the column and the code of each cell in them, the code 0
+            being the empty string of the missing cells. The numbers are formatted once per
+            distinct value, the numbers written otherwise in the file keep their text
+            returns the list of strings and the array of codes, of the smallest unsigned dtype
+        '''
+        strings = ['']
+        codes = np.zeros(len(self), dtype=np.int64)
+        numerical = self.isNumerical()
+        if np.any(numerical):
+            numbers, inverse = np.unique(self.values[numerical], return_inverse=True)
+            codes[numerical] = len(strings) + inverse
+            strings += [formatNumber(x) for x in numbers]
+            if self.text_codes is not None:
+                raw = numerical & (self.text_codes >= 0)
+                codes[raw] = len(strings) + self.text_codes[raw]
+                strings += list(self.texts)
+        if self.codes is not None:
+            categorical = self.codes >= 0
+            codes[categorical] = len(strings) + self.codes[categorical]
+            strings += list(self.categories)
+        return strings, codes.astype(np.min_scalar_type(len(strings)))
+
+class Table(object):
+    ''' a dataset stored as a list of typed columns (see `Column`), with the
+        `missing.MissingMask` shared by its columns
+    '''
+    def __init__(self, labels, columns, mask=None):
+        self.labels = np.asarray(labels)
+        self.columns = columns
+        if mask is None:
+            mask = MissingMask.fromColumns([column.missing_bits for column in columns], self.shape[0])
+            for j in range(len(columns)):
+                columns[j].missing_bits = mask.bits[j]
+        self.mask = mask
+
+    @property
+    def shape(self):
+        return (len(self.columns[0]) if len(self.columns) > 0 else 0, len(self.columns))
+
+    def hasMissingValues(self):
+        return self.mask.any()
+
+    def toStringMatrix(self):
+        ''' rebuild the cells as strings, stored column by column (see `StringColumns`)
+        '''
+        tables, codes = [], []
+        for column in self.columns:
+            strings, column_codes = column.stringCodes()
+            tables.append(strings)
+            codes.append(column_codes)
+        return StringColumns(tables, codes, self.shape[0])
+
+class StringColumns(object):
+    ''' a matrix of strings stored column by column: the distinct strings of each column and the
+        code of each cell in them, instead of a matrix of cells padded to the longest string
+        Attributes :
+            * `tables` : (list)
+                the distinct strings of each column
+            * `codes` : (list)
+                the code of each cell of each column (arrays of unsigned integers)
+            * `n_rows` : (int)
+                the number of rows
+    '''
+    def __init__(self, tables, codes, n_rows):
+        self.tables = tables
+        self.codes = codes
+        self.n_rows = n_rows
+
+    @classmethod
+    def fromCodes(cls, strings, codes):
+        ''' the matrix of `strings[codes[i,j]]`, every column sharing the table `strings`
+        '''
+        codes = np.asarray(codes)
+        return cls([strings] * codes.shape[1], [codes[:,j] for j in range(codes.shape[1])], codes.shape[0])
+
+    @property
+    def shape(self):
+        return (self.n_rows, len(self.tables))
+
+    @property
+    def nbytes(self):
+        return sum(codes.nbytes for codes in self.codes)
+
+    def take(self, rows):
+        ''' the matrix of the rows `rows`
+        '''
+        return StringColumns(self.tables, [codes[rows] for codes in self.codes], len(rows))
+
+    def appendConstant(self, strings):
+        ''' the matrix followed by a column of `strings[k]` for each string k
+        '''
+        constant = np.zeros(self.n_rows, dtype=np.uint8)
+        return StringColumns(self.tables + [[string] for string in strings], self.codes + [constant] * len(strings), self.n_rows)
+
+    def toArray(self):
+        ''' the object array of the strings, the cells referencing the strings of their column
+        '''
+        data = np.empty(self.shape, dtype=object)
+        for j, (table, codes) in enumerate(zip(self.tables, self.codes)):
+            data[:,j] = np.asarray(table, dtype=object)[codes]
+        return data
+
+def formatNumber(x):
+    ''' format a float the short way, ex: 3.0 -> '3', 0.1 -> '0.1'
+    '''
+    return '%.15g'%x
@@ -1,23 +1,22 @@
 import numpy as np
 import csv
 import utils
+import loader
+import inference
+import parallel
+from missing import MissingMask
 
 types = {'missing':0, 'numerical':1, 'string':2, 'date':3, 'bool':4}
 labels= {0:'missing', 1:'numerical', 2:'string', 3:'date', 4:'bool'}
 missing_labels = ['','nan','NaN','n/a','N/A','NA']
 
 def loadCSV(filepath, has_header=True):
-    with open(filepath, 'rbU') as csvfile:
-        reader = csv.reader(csvfile, delimiter=',')
-        has_header = hasHeader(csvfile)
-        data = []
-        for i, row in  enumerate(reader):
-            if i == 0 and has_header: labels = row; continue
-            data.append(row)
-    data = np.asarray(data)
-    if has_header is False:
-        labels = ["feature-%d"%i for i in range(data.shape[1])]
-    return data, np.asarray(labels)
+    ''' load the csv file as a string matrix, see `loader.loadColumns` for the typed columns
+    '''
+    labels, _ = loader.readLabels(filepath)
+    chunks = [np.asarray(chunk, dtype=str) for chunk in loader.iterCSVChunks(filepath)]
+    data = np.concatenate(chunks) if len(chunks) > 0 else np.empty((0, len(labels)), dtype=str)
+    return data, labels
 
 def hasHeader(csvfile):
     ''' check if csvfile has an header with sniffer. In case it does not
@@ -39,65 +38,33 @@ def centeredNormalization(data):
     data /= np.std(data)
     return data
 
-def dropMissingData(data, return_indices=False):
+def dropMissingData(data, return_indices=False, mask=None):
     ''' remove the lines containing a missing value from the dataset
-        takes a 1 or 2 dimensional array
+        takes a 1 or 2 dimensional array, and optionally its missing cells as
+        a bool array (1-dimensional) or a `missing.MissingMask` (2-dimensional)
     '''
     if len(data.shape) == 1:
-        new = data[np.isin(data, missing_labels, invert=True)]
-        return (new, np.argwhere(np.isin(data, missing_labels))) if return_indices else new
-    incomplete = []
-    for i in range(len(data)):
-        if np.count_nonzero(np.isin(data[i], missing_labels)) > 0:
-            incomplete.append(i)
-    new = np.delete(data, incomplete, axis=0)
-    return (new, incomplete) if return_indices else new
+        missing = np.isin(data, missing_labels) if mask is None else mask
+        new = data[~missing]
+        return (new, np.argwhere(missing)) if return_indices else new
+    if mask is None:
+        mask = MissingMask.fromArray(np.isin(data, missing_labels))
+    new, incomplete = mask.filterRows(data, return_indices=True)
+    return (new, list(incomplete)) if return_indices else new
 
-def determineValuesType(data, return_keys=False):
+def determineValuesType(data, return_keys=False, jobs=1):
+    ''' return the type of each value, the values of each feature are typed
+        by their distinct strings (see `inference.inferStrings`)
+    '''
+    valuesType = np.empty(data.shape, dtype=np.uint8)
+    for j, (cells, _) in enumerate(parallel.inferStrings(data, jobs=jobs)):
+        valuesType[:,j] = cells
     if return_keys is True:
-        mlen = np.max([len(key) for key in types.keys()])
-        keys = np.empty_like(data, dtype='|S%d'%mlen)
-    valuesType = np.empty_like(data, dtype=int)
-    for i in range(data.shape[0]):
-        for j in range(data.shape[1]):
-            if data[i,j] in missing_labels:
-                valuesType[i,j] = types['missing']
-                if return_keys: keys[i,j] = 'Missing'
-            elif utils.isFloat(data[i,j]):
-                valuesType[i,j] = types['numerical']
-                if return_keys: keys[i,j] = 'Numerical'
-            elif data[i,j].lower() in ['true','false']:
-                valuesType[i,j] = types['bool']
-                if return_keys: keys[i,j] = 'Boolean'
-            elif utils.isDate(data[i,j]):
-                valuesType[i,j] = types['date']
-                if return_keys: keys[i,j] = 'Date'
-            else:
-                valuesType[i,j] = types['string']
-                if return_keys: keys[i,j] = 'String'
-    return (valuesType, keys) if return_keys else valuesType
+        names = np.asarray(['Missing', 'Numerical', 'String', 'Date', 'Boolean'])
+        return valuesType, names[valuesType]
+    return valuesType
 
-def determineFeaturesType(data):
-    ''' return the type of the first value (except missing) for each feature
+def determineFeaturesType(data, jobs=1):
+    ''' return the majority type of the values (except missing) for each feature
     '''
-    features_type = []
-    for j in range(data.shape[1]):
-        for i in range(data.shape[0]):
-            if data[i,j] in missing_labels:
-                if i == data.shape[0] - 1:
-                    features_type.append(types['missing'])
-                    break
-                continue
-            elif utils.isFloat(data[i,j]):
-                features_type.append(types['numerical'])
-                break
-            elif data[i,j].lower() in ['true','false']:
-                features_type.append(types['bool'])
-                break
-            elif utils.isDate(data[i,j]):
-                features_type.append(types['date'])
-                break
-            else:
-                features_type.append(types['string'])
-                break
-    return features_type
+    return [feature_type for _, feature_type in parallel.inferStrings(data, jobs=jobs)]
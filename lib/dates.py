@@ -0,0 +1,176 @@
+import numpy as np
+import re
+import calendar
+from collections import OrderedDict
+from dateutil.parser import parse
+
+SAMPLE_SIZE = 100
+CACHE_SIZE = 65536
+
+# formats detected from a sample of a feature, the groups are the fields of the date
+FORMATS = OrderedDict([
+    ('%Y-%m-%d %H:%M:%S', re.compile(r'^(?P<Y>\d{4})-(?P<m>\d{1,2})-(?P<d>\d{1,2})(?:[ T](?P<H>\d{1,2}):(?P<M>\d{2})(?::(?P<S>\d{2})(?:\.\d+)?)?Z?)?$')),
+    ('%Y%m%dT%H%M%S', re.compile(r'^(?P<Y>\d{4})(?P<m>\d{2})(?P<d>\d{2})T(?P<H>\d{2})(?P<M>\d{2})(?P<S>\d{2})?$')),
+    ('%Y/%m/%d', re.compile(r'^(?P<Y>\d{4})/(?P<m>\d{1,2})/(?P<d>\d{1,2})$')),
+    ('%m/%d/%Y', re.compile(r'^(?P<m>\d{1,2})/(?P<d>\d{1,2})/(?P<Y>\d{4}|\d{2})$')),
+    ('%d/%m/%Y', re.compile(r'^(?P<d>\d{1,2})/(?P<m>\d{1,2})/(?P<Y>\d{4}|\d{2})$')),
+    ('%d.%m.%Y', re.compile(r'^(?P<d>\d{1,2})\.(?P<m>\d{1,2})\.(?P<Y>\d{4}|\d{2})$')),
+    ('%d-%m-%Y', re.compile(r'^(?P<d>\d{1,2})-(?P<m>\d{1,2})-(?P<Y>\d{4})$')),
+])
+FIELDS = ['Y', 'm', 'd', 'H', 'M', 'S']
+DIGIT_PATTERN = re.compile(r'\d')
+# the strings matched by their template are at most MAX_WIDTH bytes long (see `matchFields`)
+MAX_WIDTH = 32
+
+class BoundedCache(object):
+    ''' a memo dictionary keeping at most `size` entries, the least recently used are dropped
+    '''
+    def __init__(self, size=CACHE_SIZE):
+        self.size = size
+        self.entries = OrderedDict()
+
+    def get(self, key, default=None):
+        if key not in self.entries:
+            return default
+        value = self.entries.pop(key)
+        self.entries[key] = value
+        return value
+
+    def put(self, key, value):
+        self.entries.pop(key, None)
+        self.entries[key] = value
+        if len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+
+    def clear(self):
+        self.entries.clear()
+
+cache = BoundedCache()
+
+def parseEpoch(string):
+    ''' parse a string with dateutil, memoized
+        returns the epoch seconds (naive dates are read as UTC), nan when unparsable
+    '''
+    epoch = cache.get(string)
+    if epoch is None:
+        try:
+            date = parse(string)
+            epoch = float(calendar.timegm(date.utctimetuple() if date.tzinfo else date.timetuple()))
+        except (ValueError, OverflowError, TypeError):
+            epoch = np.nan
+        cache.put(string, epoch)
+    return epoch
+
+def matchEach(strings, pattern):
+    ''' match the strings against a format pattern one at a time (see `matchFields`)
+    '''
+    fields = np.zeros((len(strings), len(FIELDS)), dtype=np.int64)
+    matched = np.zeros(len(strings), dtype=bool)
+    for i in range(len(strings)):
+        match = pattern.match(strings[i])
+        if match is None:
+            continue
+        groups = match.groupdict()
+        fields[i] = [int(groups.get(f) or 0) for f in FIELDS]
+        matched[i] = True
+    return fields, matched
+
+def matchFields(strings, pattern):
+    ''' match the strings against a format pattern
+        The patterns only tell the digits from the other characters: the strings are
+        grouped by their template (their bytes, every digit replaced by '0'), each template
+        is matched once and the fields are read from the digits at the spans of its groups.
+        The strings longer than `MAX_WIDTH` bytes are matched one at a time, as are all the
+        strings when they are unicode strings which are not ascii
+        returns the fields as an int array of shape (len(strings), 6) and a bool array of the matched strings
+    '''
+    strings = np.asarray(strings, dtype=object)
+    try:
+        raw = strings.astype(bytes)
+    except (UnicodeError, ValueError):
+        return matchEach(strings, pattern)
+    lengths = np.char.str_len(raw) if len(raw) > 0 else np.empty(0, dtype=int)
+    short = np.flatnonzero(lengths <= MAX_WIDTH)
+    fields, matched = np.zeros((len(strings), len(FIELDS)), dtype=np.int64), np.zeros(len(strings), dtype=bool)
+    long_rows = np.flatnonzero(lengths > MAX_WIDTH)
+    fields[long_rows], matched[long_rows] = matchEach(strings[long_rows], pattern)
+    if len(short) == 0:
+        return fields, matched
+    width = min(raw.dtype.itemsize, MAX_WIDTH)
+    chars = np.frombuffer(raw[short].astype('S%d' % width).tobytes(), dtype=np.uint8).reshape(len(short), width)
+    templates = np.where((chars >= 48) & (chars <= 57), 48, chars).astype(np.uint8)
+    keys = np.ascontiguousarray(templates).view('S%d' % width).ravel()
+    unique, inverse = np.unique(keys, return_inverse=True)
+    order = np.argsort(inverse, kind='mergesort')
+    bounds = np.searchsorted(inverse[order], np.arange(len(unique) + 1))
+    digits = chars.astype(np.int64) - 48
+    for k in range(len(unique)):
+        match = pattern.match(unique[k].decode('latin-1'))
+        if match is None:
+            continue
+        rows = order[bounds[k]:bounds[k+1]]
+        for f, name in enumerate(FIELDS):
+            if name in pattern.groupindex and match.group(name) is not None:
+                start, stop = match.span(name)
+                number = np.zeros(len(rows), dtype=np.int64)
+                for c in range(start, stop):
+                    number = number * 10 + digits[rows, c]
+                fields[short[rows], f] = number
+        matched[short[rows]] = True
+    return fields, matched
+
+def fieldsToEpochs(fields):
+    ''' vectorized conversion of date fields (see `matchFields`) to epoch seconds,
+        invalid dates become nan
+    '''
+    Y, m, d, H, M, S = [fields[:,k] for k in range(len(FIELDS))]
+    Y = np.where(Y < 100, np.where(Y < 69, Y + 2000, Y + 1900), Y)
+    valid = (m >= 1) & (m <= 12) & (d >= 1) & (H < 24) & (M < 60) & (S < 61)
+    months = (Y - 1970) * 12 + np.clip(m, 1, 12) - 1
+    start = months.astype('datetime64[M]').astype('datetime64[D]').astype(np.int64)
+    end = (months + 1).astype('datetime64[M]').astype('datetime64[D]').astype(np.int64)
+    valid &= d <= end - start
+    epochs = ((start + d - 1) * 86400 + H * 3600 + M * 60 + S).astype(float)
+    epochs[~valid] = np.nan
+    return epochs
+
+def detectFormat(strings, sample_size=SAMPLE_SIZE):
+    ''' return the name of the format (key of `FORMATS`) matching the most strings
+        of a sample, None if no format matches any of them
+    '''
+    strings = np.asarray(strings, dtype=object)
+    if len(strings) > sample_size:
+        strings = strings[np.linspace(0, len(strings) - 1, sample_size).astype(int)]
+    best, best_count = None, 0
+    for name, pattern in FORMATS.items():
+        fields, matched = matchFields(strings, pattern)
+        count = np.count_nonzero(~np.isnan(fieldsToEpochs(fields[matched])))
+        if count > best_count:
+            best, best_count = name, count
+    return best
+
+def toEpochs(strings, fmt=None):
+    ''' convert strings to epoch seconds, with the format detected on a sample if `fmt` is None.
+        The strings not matching the format are parsed by `parseEpoch` if they contain a digit,
+        the others become nan
+    '''
+    strings = np.asarray(strings, dtype=object)
+    epochs = np.empty(len(strings))
+    epochs.fill(np.nan)
+    if fmt is None:
+        fmt = detectFormat(strings)
+    if fmt is not None:
+        fields, matched = matchFields(strings, FORMATS[fmt])
+        epochs[matched] = fieldsToEpochs(fields[matched])
+    for i in np.flatnonzero(np.isnan(epochs)):
+        if DIGIT_PATTERN.search(strings[i]):
+            epochs[i] = parseEpoch(strings[i])
+    return epochs
+
+def columnEpochs(column):
+    ''' return the epoch seconds of the categories of a `columns.Column`,
+        computed once and kept on the column
+    '''
+    if column.epochs is None:
+        column.epochs = toEpochs(column.categories)
+    return column.epochs
@@ -0,0 +1,78 @@
+import numpy as np
+import json
+import dataset
+import output
+
+def columnStrings(column):
+    ''' the distinct strings of a column and the code of each cell in them,
+        the code 0 is the empty string of the missing cells
+        returns the list of strings and the array of codes
+    '''
+    strings, codes = column.stringCodes()
+    return [s.decode('utf-8', 'replace') if isinstance(s, bytes) else s for s in strings], codes
+
+def hoverScript(table, rows=None, blocks=(), values=True):
+    ''' javascript showing the raw value of the hovered cell of the heatmaps, looked up in
+        a table of the distinct strings of its column instead of a text matrix of every cell
+        Parameters :
+            * `table` : (Table)
+                the displayed dataset
+            * `rows` : (ndarray)
+                the row of the table displayed at each row of the heatmaps, in order if None.
+                The sort buttons further permute the rows through `gd.csvPlotOrder`
+            * `blocks` : (iterable)
+                the labels of the columns drawn after the columns of the table, aggregating
+                other features (see `wide.featureView`), hovered without value
+            * `values` : (bool)
+                set to look up the raw values, else only the types of the cells are hovered,
+                looked up from the type heatmap (ex: the heatmap of values of the bins of
+                rows of --lod shows its own text)
+    '''
+    columns = []
+    for column in (table.columns if values else []):
+        strings, codes = columnStrings(column)
+        columns.append({'strings': strings, 'codes': output.encodeArray(codes)})
+    return '''
+(function() {
+    var TYPES = {uint8: Uint8Array, uint16: Uint16Array, uint32: Uint32Array, float32: Float32Array, float64: Float64Array};
+    var columns = %s, labels = %s, typeLabels = %s;
+    var rows = %s, values = %s;
+    var decode = function(encoded) {
+        var s = atob(encoded.data), a = new Uint8Array(s.length);
+        for (var i = 0; i < s.length; i++) a[i] = s.charCodeAt(i);
+        return new TYPES[encoded.dtype](a.buffer);
+    };
+    var gd = document.getElementsByClassName('plotly-graph-div')[0];
+    var tip = document.createElement('div');
+    tip.style.cssText = 'position: fixed; display: none; pointer-events: none; z-index: 1000; padding: 4px 6px; ' +
+        'font: 12px sans-serif; color: #ffffff; background: #424242; border-radius: 2px; white-space: nowrap;';
+    document.body.appendChild(tip);
+    var lookup = function(i, j) {
+        var column = columns[j];
+        if (column === undefined) return 'aggregated features';
+        if (column.decoded === undefined) column.decoded = decode(column.codes);
+        var order = gd.csvPlotOrder;
+        var row = order === undefined ? i : order[i];
+        return column.strings[column.decoded[rows === null ? row : rows[row]]];
+    };
+    gd.on('plotly_hover', function(e) {
+        var point = e.points[0];
+        if (point.curveNumber > 1 || (point.curveNumber === 0 && !values)) return;
+        var i = point.pointNumber[0], j = point.pointNumber[1];
+        var lines = point.curveNumber === 0
+            ? [labels[j], 'row: ' + point.y, lookup(i, j)]
+            : [labels[j], typeLabels[point.z]];
+        tip.innerHTML = '';
+        lines.forEach(function(line, k) {
+            if (k > 0) tip.appendChild(document.createElement('br'));
+            tip.appendChild(document.createTextNode(line));
+        });
+        tip.style.left = (e.event.clientX + 12) + 'px';
+        tip.style.top = (e.event.clientY + 12) + 'px';
+        tip.style.display = 'block';
+    });
+    gd.on('plotly_unhover', function() { tip.style.display = 'none'; });
+})();
+''' % (json.dumps(columns), json.dumps([str(label) for label in table.labels] + [str(label) for label in blocks]),
+       json.dumps([dataset.labels[t] for t in sorted(dataset.labels)]), 'null' if rows is None else json.dumps([int(i) for i in rows]),
+       json.dumps(values))
@@ -0,0 +1,339 @@
+import numpy as np
+import csv
+import hashlib
+import json
+import os
+import shutil
+import cache
+import dataset
+import inference
+import loader
+import normalize
+from columns import Column, Table
+from missing import packColumn, unpackColumn
+
+STATE_DIR = os.path.join(cache.CACHE_DIR, 'incremental')
+# the bytes hashed at the start and at the end of the profiled part of a file, to detect
+# a file rewritten instead of appended to
+EDGE_SIZE = 64 * 1024
+BLOCK_SIZE = 1024**2
+# the cells of the columns, stored as raw arrays which the new rows are appended to
+CELL_FILES = [('values', np.float64, np.nan), ('codes', np.int32, -1), ('text_codes', np.int32, -1)]
+
+
+class State(object):
+    ''' the profile of the rows of a file read so far, and the aggregates needed to extend it
+        Attributes :
+            * `table`, `features_type`, `heatmap`, `ranges` :
+                the profile of the rows (see `profiling.DatasetProfile`)
+            * `counts` : (ndarray)
+                the number of cells of each type of each feature, of shape (n_features, n_types)
+            * `kinds` : (list)
+                the type of each category of each feature (see `inference.classifyStrings`)
+            * `ranked` : (list)
+                the sorted distinct strings of the string and boolean features, None for the others
+                and the high-cardinality ones (see `normalize.cardinalitySketch`)
+            * `offset` : (int)
+                the byte offset of the end of the last row read
+            * `meta` : (dict)
+                the content of the meta.json file of the stored state (see `readState`)
+    '''
+    def __init__(self, table, features_type, heatmap, ranges, counts, kinds, ranked, offset, meta):
+        self.table = table
+        self.features_type = features_type
+        self.heatmap = heatmap
+        self.ranges = ranges
+        self.counts = counts
+        self.kinds = kinds
+        self.ranked = ranked
+        self.offset = offset
+        self.meta = meta
+
+    @classmethod
+    def empty(cls, labels, offset):
+        n = len(labels)
+        columns = [Column(None, None, [], packColumn([]), 0) for _ in range(n)]
+        meta = {
+            'settings': cache.inferenceSettings(), 'offset': offset, 'n_rows': 0,
+            'features_type': [dataset.types['missing']] * n, 'ranges': [None] * n,
+            'counts': np.zeros((n, len(dataset.types))).tolist(),
+            'columns': [{'values': False, 'codes': False, 'text_codes': False, 'epochs': False, 'categories': 0, 'blob': 0,
+                         'texts': 0, 'texts_blob': 0, 'ranked': False} for _ in range(n)],
+        }
+        return cls(Table(labels, columns), list(meta['features_type']), np.empty((0, n), dtype=normalize.HEATMAP_DTYPE), [None] * n,
+                   np.array(meta['counts']), [np.empty(0, dtype=np.int64) for _ in range(n)], [None] * n, offset, meta)
+
+def statePath(filepath, state_dir=STATE_DIR):
+    return os.path.join(state_dir, hashlib.sha1(os.path.abspath(filepath).encode('utf-8')).hexdigest())
+
+def edgeHash(f, offset):
+    ''' hash the first and the last `EDGE_SIZE` bytes before `offset`
+    '''
+    sha = hashlib.sha1()
+    f.seek(0)
+    sha.update(f.read(min(EDGE_SIZE, offset)))
+    start = max(0, offset - EDGE_SIZE)
+    f.seek(start)
+    sha.update(f.read(offset - start))
+    return sha.hexdigest()
+
+def iterLines(f, start, end):
+    ''' the lines of a file between the byte offsets `start` and `end`
+    '''
+    f.seek(start)
+    position = start
+    while position < end:
+        line = f.readline()
+        if len(line) == 0:
+            break
+        position += len(line)
+        yield line
+
+def readArray(path, dtype, shape):
+    ''' memory-map the first cells of a raw array file, the cells after them are left
+        by a refresh which did not complete
+    '''
+    shape = shape if isinstance(shape, tuple) else (shape,)
+    if int(np.prod(shape)) == 0:
+        return np.empty(shape, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode='r', shape=shape)
+
+def appendBytes(path, size, data):
+    ''' write `data` (bytes or an array) at the byte `size` of a file, discarding the bytes after it
+    '''
+    with open(path, 'r+b' if os.path.isfile(path) else 'wb') as f:
+        f.truncate(size)
+        f.seek(size)
+        f.write(data if isinstance(data, bytes) else np.ascontiguousarray(data).tobytes())
+
+def readStrings(path, count, blob_size):
+    ''' the first `count` strings of a file written by `appendStrings`
+    '''
+    ends = readArray(path + '.ends.bin', np.int64, count)
+    if blob_size == 0:
+        return [b''] * count
+    with open(path + '.blob.bin', 'rb') as f:
+        blob = f.read(blob_size)
+    starts = np.concatenate([[0], ends[:-1]])
+    return [blob[starts[i]:ends[i]] for i in range(count)]
+
+def appendStrings(path, strings, count, blob_size):
+    ''' append strings after the first `count` strings, of `blob_size` bytes, of a file
+        returns the number of strings and of bytes of the file
+    '''
+    strings = [s if isinstance(s, bytes) else s.encode('utf-8') for s in strings]
+    ends = blob_size + np.cumsum([len(s) for s in strings]).astype(np.int64)
+    appendBytes(path + '.ends.bin', count * 8, ends)
+    appendBytes(path + '.blob.bin', blob_size, b''.join(strings))
+    return count + len(strings), int(ends[-1]) if len(ends) > 0 else blob_size
+
+def writeMeta(entry, meta):
+    ''' replace the meta.json file of a state at once, it commits the lengths of the arrays
+        appended to before it
+    '''
+    tmp = os.path.join(entry, 'meta.json.tmp')
+    with open(tmp, 'w') as f:
+        json.dump(meta, f)
+    os.rename(tmp, os.path.join(entry, 'meta.json'))
+
+def readState(entry, meta):
+    ''' read a state stored in the directory `entry`, its arrays are memory-mapped
+        The state is stored as raw arrays the rows are appended to: heatmap.bin of shape
+        (n_rows, n_features), and for each feature j its packed missing cells mask_j.bin,
+        its cells values_j.bin, codes_j.bin and text_codes_j.bin (see `columns.Column`), its
+        categories and their types and epochs, and the texts of its numbers. meta.json holds the number of rows and of categories, and
+        the aggregates rewritten by each refresh (types, ranges and counts)
+    '''
+    path = lambda name: os.path.join(entry, name)
+    n_rows, n_features = meta['n_rows'], len(meta['features_type'])
+    columns, kinds, ranked = [], [], []
+    for j, info in enumerate(meta['columns']):
+        cells = [readArray(path('%s_%d.bin'%(name, j)), dtype, n_rows) if info[name] else None for name, dtype, _ in CELL_FILES]
+        categories = readStrings(path('categories_%d'%j), info['categories'], info['blob'])
+        column = Column(cells[0], cells[1], categories, readArray(path('mask_%d.bin'%j), np.uint8, (n_rows + 7) // 8), n_rows)
+        column.epochs = readArray(path('epochs_%d.bin'%j), np.float64, info['categories']) if info['epochs'] else None
+        column.text_codes = cells[2]
+        column.texts = readStrings(path('texts_%d'%j), info['texts'], info['texts_blob'])
+        columns.append(column)
+        kinds.append(readArray(path('kinds_%d.bin'%j), np.int64, info['categories']))
+        ranked.append(cache.loadStrings(path('ranked_%d'%j)) if info['ranked'] else None)
+    # the table copies the packed missing cells into its mask
+    table = Table(cache.loadStrings(path('labels')), columns)
+    heatmap = readArray(path('heatmap.bin'), normalize.HEATMAP_DTYPE, (n_rows, n_features))
+    return State(table, list(meta['features_type']), heatmap, list(meta['ranges']), np.array(meta['counts']),
+                 kinds, ranked, meta['offset'], meta)
+
+def loadState(filepath, labels, state_dir=STATE_DIR):
+    ''' the stored state of a file, None if it has none, if its last refresh did not complete
+        or if the file was not only appended to since the state was stored
+    '''
+    entry = statePath(filepath, state_dir)
+    if not os.path.isfile(os.path.join(entry, 'meta.json')):
+        return None
+    with open(os.path.join(entry, 'meta.json')) as f:
+        meta = json.load(f)
+    if not meta.get('complete', False):
+        return None
+    if json.dumps(meta['settings'], sort_keys=True) != json.dumps(cache.inferenceSettings(), sort_keys=True):
+        return None
+    if cache.loadStrings(os.path.join(entry, 'labels')) != [l if isinstance(l, bytes) else l.encode('utf-8') for l in labels]:
+        return None
+    if os.path.getsize(filepath) < meta['offset']:
+        return None
+    with open(filepath, 'rb') as f:
+        if edgeHash(f, meta['offset']) != meta['edge']:
+            return None
+        # a last line read without its newline must not have been continued
+        f.seek(meta['offset'])
+        if meta['partial'] and f.read(1) not in (b'', b'\n', b'\r'):
+            return None
+    return readState(entry, meta)
+
+def tailKeys(state, j, tail, feature_type):
+    ''' place the cells of the tail of a feature on the scale of the feature
+        returns the keys of the cells and the (span, maximum) of the scale extended to them,
+        None if the scale of the whole column has to be recomputed
+    '''
+    old_type = state.features_type[j]
+    if feature_type != old_type:
+        return None, None
+    if feature_type == dataset.types['missing']:
+        return np.full(len(tail), np.nan), (1, 0)
+    keys = normalize.columnKeys(tail, feature_type) if feature_type in (dataset.types['numerical'], dataset.types['date']) else None
+    if keys is not None:
+        present = keys[~np.isnan(keys)]
+        old_range = state.ranges[j]
+        if old_range is None:
+            return None, None
+        if len(present) > 0 and (np.min(present) < old_range[0] or np.max(present) > old_range[1]):
+            return None, None
+        return keys, normalize.rangeScale(*old_range)
+    # the ranks of the string features hold as long as no new distinct string comes in
+    ranked = state.ranked[j]
+    if ranked is None:
+        return None, None
+    present = tail.isNumerical() | tail.isCategorical()
+    strings = tail.strings()[present]
+    ranked_array = np.asarray(ranked, dtype=object)
+    positions = np.searchsorted(ranked_array, strings) if len(strings) > 0 else np.empty(0, dtype=int)
+    found = positions < len(ranked)
+    found[found] = ranked_array[positions[found]] == strings[found]
+    if not np.all(found):
+        return None, None
+    keys = np.full(len(tail), np.nan)
+    keys[present] = positions
+    return keys, normalize.rankScale(len(ranked))
+
+def extendState(entry, state, labels, chunks, offset, edge, partial):
+    ''' append the rows of the chunks of strings to the state stored in the directory `entry`
+        The cells of the new rows are appended to the files of the state, only the columns
+        whose type, range or distinct strings change are normalized again and rewritten in
+        place, the others only normalize their new cells
+        returns the new state, which ends at the byte `offset`
+    '''
+    path = lambda name: os.path.join(entry, name)
+    tail = loader.buildTable(labels, chunks, [column.categories for column in state.table.columns],
+                             texts=[column.texts for column in state.table.columns])
+    meta = dict(state.meta, offset=offset, edge=edge, partial=partial, complete=True)
+    meta['columns'] = [dict(info) for info in state.meta['columns']]
+    n_old, n_tail, n_features = state.table.shape[0], tail.shape[0], len(labels)
+    counts = np.array(state.counts)
+    features_type = list(state.features_type)
+    heatmap = np.zeros((n_tail, n_features), dtype=normalize.HEATMAP_DTYPE)
+    rescaled = []
+    for j, (old, new) in enumerate(zip(state.table.columns, tail.columns)):
+        info = meta['columns'][j]
+        # only the new categories are classified
+        n_categories = len(old.categories)
+        kinds = state.kinds[j]
+        new.epochs = old.epochs
+        if len(new.categories) > n_categories:
+            new_kinds, new_epochs = inference.classifyStrings(new.categories[n_categories:], return_epochs=True)
+            kinds = np.concatenate([kinds, new_kinds]).astype(np.int64)
+            new.epochs = np.concatenate([old.epochs if info['epochs'] else np.full(n_categories, np.nan), new_epochs])
+            appendBytes(path('kinds_%d.bin'%j), n_categories * 8, kinds[n_categories:])
+            appendBytes(path('epochs_%d.bin'%j), n_categories * 8 if info['epochs'] else 0,
+                        new.epochs[n_categories:] if info['epochs'] else new.epochs)
+            info['epochs'] = True
+            info['categories'], info['blob'] = appendStrings(path('categories_%d'%j), new.categories[n_categories:], n_categories, info['blob'])
+        if len(new.texts) > len(old.texts):
+            info['texts'], info['texts_blob'] = appendStrings(path('texts_%d'%j), new.texts[len(old.texts):], len(old.texts), info['texts_blob'])
+        counts[j] += inference.typeCounts(new, kinds)
+        feature_type = inference.featureType(counts[j])
+        for name, dtype, fill in CELL_FILES:
+            old_cells, new_cells = getattr(old, name), getattr(new, name)
+            if old_cells is None and new_cells is None:
+                continue
+            new_cells = np.full(n_tail, fill, dtype=dtype) if new_cells is None else np.asarray(new_cells, dtype=dtype)
+            if old_cells is None:
+                # the first cells of this kind, the previous rows are filled
+                appendBytes(path('%s_%d.bin'%(name, j)), 0, np.concatenate([np.full(n_old, fill, dtype=dtype), new_cells]))
+            else:
+                appendBytes(path('%s_%d.bin'%(name, j)), n_old * np.dtype(dtype).itemsize, new_cells)
+            info[name] = True
+        # the last byte of the packed missing cells is completed by the first new rows
+        head = unpackColumn(old.missing_bits[n_old//8:], n_old % 8)
+        appendBytes(path('mask_%d.bin'%j), n_old // 8, packColumn(np.concatenate([head, new.missing])))
+        keys, scale = tailKeys(state, j, new, feature_type)
+        if scale is None:
+            rescaled.append(j)
+        else:
+            heatmap[:,j] = normalize.scaleColumn(keys, feature_type, scale)
+        features_type[j] = int(feature_type)
+    appendBytes(path('heatmap.bin'), n_old * n_features * heatmap.itemsize, heatmap)
+    meta.update({'n_rows': n_old + n_tail, 'features_type': features_type, 'counts': counts.tolist()})
+    if len(rescaled) > 0:
+        # the columns normalized again are rewritten in place, the stored state is
+        # incomplete until they are
+        writeMeta(entry, dict(state.meta, complete=False))
+    state = readState(entry, meta)
+    if len(rescaled) > 0:
+        scaled = np.memmap(path('heatmap.bin'), dtype=normalize.HEATMAP_DTYPE, mode='r+', shape=state.heatmap.shape)
+        for j in rescaled:
+            column, feature_type = state.table.columns[j], features_type[j]
+            scaled[:,j] = normalize.scaleColumn(normalize.columnKeys(column, feature_type), feature_type)
+            state.ranges[j] = cache.columnRange(column, feature_type)
+            # the keys of high-cardinality features are not ranks, they are encoded again
+            is_string = feature_type in (dataset.types['string'], dataset.types['bool'])
+            is_ranked = is_string and normalize.cardinalitySketch(column) is None
+            state.ranked[j] = normalize.rankedStrings(column) if is_ranked else None
+            if state.ranked[j] is not None:
+                cache.saveStrings(path('ranked_%d'%j), state.ranked[j])
+            meta['columns'][j]['ranked'] = state.ranked[j] is not None
+        scaled.flush()
+        del scaled
+        meta['ranges'] = state.ranges
+    writeMeta(entry, meta)
+    return state
+
+def refresh(filepath, state_dir=STATE_DIR):
+    ''' profile a csv file, only parsing the rows appended since the last refresh
+        The cost of a refresh is the cost of the new rows, and of the columns whose type,
+        range or distinct strings they change. A last line without newline is stored too,
+        the state is rebuilt if it is continued instead of followed by new lines
+        returns the table, features_type, heatmap and ranges of the file, None if the
+        file can not be read incrementally
+    '''
+    labels, has_header = loader.readLabels(filepath)
+    state = loadState(filepath, labels, state_dir)
+    entry = statePath(filepath, state_dir)
+    with open(filepath, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        start = f.read(BLOCK_SIZE)
+        if b'\r' in start and b'\n' not in start:
+            # the rows are only split at newlines, old mac line endings are not supported
+            return None
+        if state is None:
+            f.seek(0)
+            header_end = len(f.readline()) if has_header else 0
+            state = State.empty(labels, header_end)
+            if os.path.isdir(entry):
+                shutil.rmtree(entry)
+            os.makedirs(entry)
+            cache.saveStrings(os.path.join(entry, 'labels'), list(labels))
+        if size > state.offset:
+            f.seek(size - 1)
+            partial = f.read(1) != b'\n'
+            reader = csv.reader(iterLines(f, state.offset, size), delimiter=',')
+            state = extendState(entry, state, labels, loader.iterReaderChunks(reader, len(labels)), size, edgeHash(f, size), partial)
+    return state.table, state.features_type, state.heatmap, state.ranges
@@ -0,0 +1,90 @@
+import numpy as np
+import re
+import dataset
+import utils
+import dates
+import parallel
+
+MIN_CONFIDENCE = 0.5
+
+BOOL_PATTERN = re.compile(r'^\s*(true|false)\s*$', re.IGNORECASE)
+
+def classifyStrings(strings, return_epochs=False):
+    ''' return the type of each string of an array of distinct strings,
+        and optionally their epoch seconds (nan for the strings which are not dates)
+    '''
+    strings = np.asarray(strings, dtype=object)
+    kinds = np.empty(len(strings), dtype=int)
+    kinds.fill(dataset.types['string'])
+    missing = np.isin(strings, dataset.missing_labels)
+    kinds[missing] = dataset.types['missing']
+    _, numerical = utils.parseFloats(np.where(missing, 'nan', strings))
+    kinds[numerical & ~missing] = dataset.types['numerical']
+    bools = np.asarray([BOOL_PATTERN.match(s) is not None for s in strings], dtype=bool)
+    kinds[bools & (kinds == dataset.types['string'])] = dataset.types['bool']
+    epochs = np.empty(len(strings))
+    epochs.fill(np.nan)
+    candidates = np.flatnonzero(kinds == dataset.types['string'])
+    epochs[candidates] = dates.toEpochs(strings[candidates])
+    kinds[~np.isnan(epochs)] = dataset.types['date']
+    return (kinds, epochs) if return_epochs else kinds
+
+def featureType(counts, min_confidence=MIN_CONFIDENCE):
+    ''' choose the type of a feature from the number of cells of each type
+        Parameters :
+            * `counts` : (ndarray)
+                the number of cells of each type, indexed by `dataset.types`
+            * `min_confidence` : (float)
+                the minimal proportion of the non missing cells the majority type
+                must reach, the feature is typed as string below it
+    '''
+    counts = np.asarray(counts, dtype=float)
+    present = counts.sum() - counts[dataset.types['missing']]
+    if present == 0:
+        return dataset.types['missing']
+    counts[dataset.types['missing']] = 0
+    majority = int(np.argmax(counts))
+    return majority if counts[majority] / present >= min_confidence else dataset.types['string']
+
+def inferStrings(column, min_confidence=MIN_CONFIDENCE):
+    ''' infer the types of a 1-dimensional array of strings, working on its distinct values
+        returns the type of each cell and the type of the feature
+    '''
+    unique, inverse, counts = np.unique(column, return_inverse=True, return_counts=True)
+    kinds = classifyStrings(unique)
+    cells = kinds[inverse]
+    return cells, featureType(np.bincount(kinds, weights=counts, minlength=len(dataset.types)), min_confidence)
+
+def typeCounts(column, kinds=None):
+    ''' the number of cells of each type of a `columns.Column`, indexed by `dataset.types`,
+        `kinds` being the type of each of its categories (see `classifyStrings`)
+    '''
+    counts = np.zeros(len(dataset.types))
+    counts[dataset.types['missing']] = np.count_nonzero(column.missing)
+    counts[dataset.types['numerical']] = np.count_nonzero(column.isNumerical())
+    if column.codes is not None:
+        categorical = column.codes >= 0
+        counts += np.bincount(kinds, weights=np.bincount(column.codes[categorical], minlength=len(kinds)), minlength=len(dataset.types))
+    return counts
+
+def inferColumn(column, min_confidence=MIN_CONFIDENCE):
+    ''' infer the types of a `columns.Column`, only its dictionary of strings is classified,
+        the dates found are kept on the column for the normalization
+        returns the type of each cell and the type of the feature
+    '''
+    cells = np.zeros(len(column), dtype=int)
+    cells[column.isNumerical()] = dataset.types['numerical']
+    kinds = None
+    if column.codes is not None:
+        categorical = column.codes >= 0
+        kinds, column.epochs = classifyStrings(column.categories, return_epochs=True)
+        cells[categorical] = kinds[column.codes[categorical]]
+    return cells, featureType(typeCounts(column, kinds), min_confidence)
+
+def inferTable(table, min_confidence=MIN_CONFIDENCE, jobs=1):
+    ''' infer the types of every column of a `columns.Table`, over `jobs` processes
+        returns the type of each feature as a list
+    '''
+    if jobs > 1:
+        return parallel.inferTable(table, min_confidence, jobs)
+    return [inferColumn(column, min_confidence)[1] for column in table.columns]
@@ -0,0 +1,269 @@
+import numpy as np
+import csv
+import dataset
+import inference
+import normalize
+import sketches
+import stats
+import utils
+from columns import Column, Table, formatNumber
+from missing import packColumn
+
+CHUNK_SIZE = 65536
+
+def readLabels(filepath):
+    ''' return the labels of the features and whether the file has an header
+    '''
+    with open(filepath, 'rbU') as csvfile:
+        has_header = dataset.hasHeader(csvfile)
+        row = next(csv.reader(csvfile, delimiter=','), [])
+    if has_header is False:
+        return np.asarray(["feature-%d"%i for i in range(len(row))]), False
+    return np.asarray(row), True
+
+def iterCSVChunks(filepath, chunk_size=CHUNK_SIZE):
+    ''' read the csv file by blocks of `chunk_size` rows
+        yields 2-dimensional object arrays of strings of shape (chunk_size, n_features),
+        rows are padded with empty strings or truncated to the number of labels
+    '''
+    labels, has_header = readLabels(filepath)
+    with open(filepath, 'rbU') as csvfile:
+        reader = csv.reader(csvfile, delimiter=',')
+        if has_header:
+            next(reader, None)
+        for chunk in iterReaderChunks(reader, len(labels), chunk_size):
+            yield chunk
+
+def iterReaderChunks(reader, width, chunk_size=CHUNK_SIZE):
+    ''' group the rows of a csv reader in chunks of strings, see `iterCSVChunks`
+    '''
+    rows = []
+    for row in reader:
+        if len(row) == 0:
+            continue
+        if len(row) != width:
+            row = (row + [''] * width)[:width]
+        rows.append(row)
+        if len(rows) == chunk_size:
+            yield makeChunk(rows, width)
+            rows = []
+    if len(rows) > 0:
+        yield makeChunk(rows, width)
+
+def makeChunk(rows, width):
+    chunk = np.empty((len(rows), width), dtype=object)
+    chunk[:] = rows
+    return chunk
+
+class ColumnBuilder(object):
+    ''' accumulate chunks of strings of a feature into typed buffers, the strings are
+        encoded in the dictionary `categories` (extended with the new strings), and the
+        text of the numbers which is not their formatted value in the dictionary `texts`.
+        With `summarize` set, the summary statistics of the numerical cells and the sketch of
+        the distinct cells are gathered chunk by chunk (see `stats.ColumnStats` and
+        `sketches.ColumnSketch`). Once the sketch flags a string feature as high-cardinality,
+        the dictionary stops growing: the strings of its cells are kept as their hash and
+        encoded by `normalize.CARDINALITY_ENCODING` when the column is finished, so that the
+        state of a feature is bounded whatever its number of distinct strings. The dates
+        keep their dictionary, their cells are placed by the epoch of their string
+    '''
+    def __init__(self, categories=(), summarize=False, texts=()):
+        self.stats = stats.ColumnStats() if summarize else None
+        self.sketch = sketches.ColumnSketch() if summarize else None
+        self.lengths = []
+        self.values = []
+        self.codes = []
+        self.text_codes = []
+        self.missing = []
+        # the hashes of the strings of each chunk once the dictionary is bounded (see `bound`)
+        self.hashes = None
+        self.flagged = False
+        self.categories = list(categories)
+        self.dictionary = dict((string, code) for code, string in enumerate(self.categories))
+        self.texts = list(texts)
+        self.text_dictionary = dict((string, code) for code, string in enumerate(self.texts))
+
+    def append(self, strings):
+        n = len(strings)
+        missing = np.isin(strings, dataset.missing_labels)
+        present = np.flatnonzero(~missing)
+        values = np.empty(n)
+        values.fill(np.nan)
+        codes = None
+        try:
+            # fast path, every present cell is numerical (a spelling of nan is a string,
+            # see `utils.parseFloats`)
+            values[present] = strings[present].astype(float)
+            is_numerical = not np.any(np.isnan(values[present]))
+        except ValueError:
+            is_numerical = False
+        if is_numerical:
+            if self.sketch is not None:
+                self.sketch.addNumbers(values[present])
+            # the numbers are formatted once per distinct value
+            numbers, inverse = np.unique(values[present], return_inverse=True)
+            formatted = np.asarray([formatNumber(x) for x in numbers], dtype=object)
+            cell_codes = self.textCodes(strings[present], formatted[inverse])
+        else:
+            unique, inverse = np.unique(strings[present], return_inverse=True)
+            parsed, numerical = utils.parseFloats(unique)
+            if self.sketch is not None:
+                counts = np.bincount(inverse, minlength=len(unique))
+                hashes = sketches.hashStrings(unique[~numerical])
+                self.sketch.addStrings(unique[~numerical], counts[~numerical], hashes)
+                self.sketch.addNumbers(parsed[numerical])
+                if not self.flagged and self.sketch.distinct() > normalize.HIGH_CARDINALITY:
+                    self.flagged = True
+                    if self.isString(unique[~numerical], counts[~numerical], len(present) - np.sum(counts[~numerical])):
+                        self.bound()
+            ucodes = np.empty(len(unique), dtype=np.int32)
+            ucodes.fill(-1)
+            if self.hashes is not None:
+                # the codes are set by `finish`, from the hashes
+                ucodes[~numerical] = 0
+                uhashes = np.zeros(len(unique), dtype=np.uint64)
+                uhashes[~numerical] = hashes
+                chunk_hashes = np.zeros(n, dtype=np.uint64)
+                chunk_hashes[present] = uhashes[inverse]
+            else:
+                for k in np.flatnonzero(~numerical):
+                    ucodes[k] = self.encode(unique[k])
+            values[present] = parsed[inverse]
+            codes = np.empty(n, dtype=np.int32)
+            codes.fill(-1)
+            codes[present] = ucodes[inverse]
+            formatted = [formatNumber(x) if is_number else string for x, is_number, string in zip(parsed, numerical, unique)]
+            ucell_codes = self.textCodes(unique, formatted)
+            cell_codes = None if ucell_codes is None else ucell_codes[inverse]
+            if not np.any(numerical):
+                values = None
+        if len(present) == 0:
+            values = None
+        text_codes = None
+        if cell_codes is not None:
+            text_codes = np.empty(n, dtype=np.int32)
+            text_codes.fill(-1)
+            text_codes[present] = cell_codes
+        if self.stats is not None and values is not None:
+            self.stats.update(values[present])
+        # buffers of a chunk are only kept when the chunk holds such cells
+        self.lengths.append(n)
+        self.values.append(values)
+        self.codes.append(codes)
+        self.text_codes.append(text_codes)
+        self.missing.append(missing)
+        if self.hashes is not None:
+            self.hashes.append(chunk_hashes if codes is not None else None)
+
+    def textCodes(self, strings, formatted):
+        ''' the code in `texts` of each string of a number which is not its formatted value
+            (ex: '007', '1.10' or '1e3' for '7', '1.1' and '1000'), -1 for the other strings,
+            None when every string is its formatted value
+        '''
+        differs = np.flatnonzero(np.asarray(strings, dtype=object) != np.asarray(formatted, dtype=object))
+        if len(differs) == 0:
+            return None
+        codes = np.empty(len(strings), dtype=np.int32)
+        codes.fill(-1)
+        codes[differs] = [self.encodeText(strings[k]) for k in differs]
+        return codes
+
+    def encodeText(self, string):
+        code = self.text_dictionary.get(string)
+        if code is None:
+            code = len(self.texts)
+            self.text_dictionary[string] = code
+            self.texts.append(string)
+        return code
+
+    def isString(self, strings, string_counts, n_numbers):
+        ''' whether the cells added so far and the cells of a chunk (its distinct strings, the
+            number of cells holding each and its number of numerical cells) are typed as a
+            string feature (see `inference.featureType`), only the distinct strings are classified
+        '''
+        kinds = inference.classifyStrings(self.categories)
+        counts = np.bincount(inference.classifyStrings(strings), weights=string_counts, minlength=len(dataset.types))
+        counts[dataset.types['numerical']] += n_numbers
+        for values, codes in zip(self.values, self.codes):
+            if values is not None:
+                counts[dataset.types['numerical']] += np.count_nonzero(~np.isnan(values))
+            if codes is not None:
+                counts += np.bincount(kinds, weights=np.bincount(codes[codes >= 0], minlength=len(kinds)), minlength=len(dataset.types))
+        return inference.featureType(counts) in (dataset.types['string'], dataset.types['bool'])
+
+    def bound(self):
+        ''' stop growing the dictionary, the strings of the cells are kept as their hash from now
+            on (the codes of the cells being placeholders until `finish`)
+        '''
+        hashes = sketches.hashStrings(self.categories)
+        self.hashes = [None if codes is None else np.where(codes >= 0, hashes[np.maximum(codes, 0)], np.uint64(0))
+                       for codes in self.codes]
+        self.categories, self.dictionary = [], {}
+
+    def encodeHashes(self, codes):
+        ''' the categories and the codes of the cells of a bounded column (see `bound`), encoded
+            as in `normalize.topKeys` or `normalize.hashKeys`
+        '''
+        hashes = self.merge(self.hashes, 0, np.uint64)
+        categorical = codes >= 0
+        if normalize.CARDINALITY_ENCODING == 'hash':
+            codes[categorical] = hashes[categorical] % np.uint64(normalize.HASH_BINS)
+            return [normalize.HASH_CATEGORY % b for b in range(normalize.HASH_BINS)], codes
+        names, top = normalize.topCodes(hashes[categorical], self.sketch)
+        codes[categorical] = top
+        return names + [normalize.OTHER_CATEGORY], codes
+
+    def encode(self, string):
+        code = self.dictionary.get(string)
+        if code is None:
+            code = len(self.categories)
+            self.dictionary[string] = code
+            self.categories.append(string)
+        return code
+
+    def finish(self):
+        missing = packColumn(np.concatenate(self.missing) if len(self.missing) > 0 else [])
+        codes, categories = self.merge(self.codes, -1, np.int32), self.categories
+        if self.hashes is not None:
+            categories, codes = self.encodeHashes(codes)
+        column = Column(self.merge(self.values, np.nan, float), codes, categories, missing, sum(self.lengths))
+        column.encoding = normalize.CARDINALITY_ENCODING if self.hashes is not None else None
+        column.texts, column.text_codes = self.texts, self.merge(self.text_codes, -1, np.int32)
+        column.stats = self.stats
+        column.sketch = self.sketch
+        self.values, self.codes, self.text_codes, self.missing = [], [], [], []
+        self.hashes = None if self.hashes is None else []
+        return column
+
+    def merge(self, buffers, fill, dtype):
+        if all(buffer is None for buffer in buffers):
+            return None
+        merged = np.empty(sum(self.lengths), dtype=dtype)
+        start = 0
+        for n, buffer in zip(self.lengths, buffers):
+            merged[start:start+n] = fill if buffer is None else buffer
+            start += n
+        return merged
+
+def buildTable(labels, chunks, categories=None, summarize=False, texts=None):
+    ''' build a `Table` of typed columns from an iterable of chunks of strings
+        Parameters :
+            * `categories`, `texts` : (list)
+                the dictionaries each column starts from, ex: to encode new rows with
+                the codes of a table already loaded (see `ColumnBuilder`)
+            * `summarize` : (bool)
+                set to gather the summary statistics and the sketches of the columns while building them
+    '''
+    builders = [ColumnBuilder(() if categories is None else categories[j], summarize, () if texts is None else texts[j])
+                for j in range(len(labels))]
+    for chunk in chunks:
+        for j in range(len(builders)):
+            builders[j].append(chunk[:,j])
+    # the table gathers the packed columns into its missing mask
+    return Table(labels, [builder.finish() for builder in builders])
+
+def loadColumns(filepath, chunk_size=CHUNK_SIZE, summarize=False):
+    ''' load a csv file as a `Table` of typed columns, reading `chunk_size` rows at a time
+    '''
+    labels, _ = readLabels(filepath)
+    return buildTable(labels, iterCSVChunks(filepath, chunk_size), summarize=summarize)
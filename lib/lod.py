@@ -0,0 +1,138 @@
+import numpy as np
+import dataset
+from normalize import MISSING_VALUE
+
+TARGET_ROWS = 1000
+REDUCERS = ['mean', 'max', 'any']
+
+class LevelOfDetail(object):
+    ''' the rows of the heatmaps aggregated into bins
+        Attributes :
+            * `rows` : (ndarray)
+                the index of the first row of each bin
+            * `heatmap` : (ndarray)
+                the summary of the normalized values of each bin, `MISSING_VALUE` when
+                no cell of the bin has a value
+            * `types` : (ndarray)
+                the most frequent type of the present cells of each bin (see `majorityTypes`),
+                0 when most of its cells are missing
+            * `missing` : (ndarray)
+                the fraction of missing cells of each bin
+            * `completeness` : (ndarray)
+                the number of present features of each bin (mean, or minimum for the 'any' reducer)
+    '''
+    def __init__(self, rows, heatmap, types, missing, completeness, n_rows):
+        self.rows = rows
+        self.heatmap = heatmap
+        self.types = types
+        self.missing = missing
+        self.completeness = completeness
+        self.n_rows = n_rows
+
+    def describe(self):
+        ''' the hover text of each cell: the rows of the bin and its missing fraction
+        '''
+        ends = np.append(self.rows[1:], self.n_rows) - 1
+        text = np.empty(self.heatmap.shape, dtype=object)
+        for i in range(len(self.rows)):
+            prefix = 'rows %d-%d, missing: ' % (self.rows[i], ends[i])
+            text[i] = [prefix + '%d%%' % p for p in np.round(self.missing[i] * 100)]
+        return text
+
+def binStarts(n_rows, target_rows=TARGET_ROWS):
+    ''' the index of the first row of each bin, to split `n_rows` rows in at most `target_rows` bins
+    '''
+    n_bins = max(1, min(n_rows, target_rows))
+    return np.unique(np.linspace(0, n_rows, n_bins, endpoint=False).astype(int))
+
+def reduceMean(values, present, starts):
+    sums = np.add.reduceat(np.where(present, values, 0.), starts, axis=0)
+    counts = np.add.reduceat(present.astype(np.int64), starts, axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return sums / counts
+
+def reduceMode(values, present, starts, n_rows):
+    ''' the most frequent value of each bin of a column of ranks, nan for the bins without value
+    '''
+    bins = np.repeat(np.arange(len(starts)), np.diff(np.append(starts, n_rows)))
+    modes = np.empty(len(starts))
+    modes.fill(np.nan)
+    if not np.any(present):
+        return modes
+    pairs, counts = np.unique(np.stack([bins[present], values[present]]), axis=1, return_counts=True)
+    # the last pair of each bin in (bin, count) order is its most frequent value
+    order = np.lexsort((counts, pairs[0]))
+    last = np.append(np.diff(pairs[0][order]) != 0, True)
+    modes[pairs[0][order][last].astype(int)] = pairs[1][order][last]
+    return modes
+
+def majorityTypes(type_counts):
+    ''' the most frequent type of the present cells of each bin, the greatest of the most
+        frequent types on ties and 0 for the bins without present cell
+        Parameters :
+            * `type_counts` : (ndarray)
+                the number of present cells of each type of each bin, its last axis indexed
+                by the types but 'missing' (`dataset.types` from 1 on)
+    '''
+    n_types = type_counts.shape[-1]
+    majority = (n_types - np.argmax(type_counts[...,::-1], axis=-1)).astype(np.uint8)
+    majority[~np.any(type_counts > 0, axis=-1)] = 0
+    return majority
+
+def binTypeCounts(types, starts, n_rows):
+    ''' the number of present cells of each type of each bin and feature, of shape
+        (n_bins, n_features, n_types - 1) (see `majorityTypes`)
+    '''
+    n_types = len(dataset.types)
+    bins = np.repeat(np.arange(len(starts), dtype=np.int64), np.diff(np.append(starts, n_rows)))
+    counts = np.empty((len(starts), types.shape[1], n_types - 1), dtype=np.int64)
+    for j in range(types.shape[1]):
+        counts[:,j] = np.bincount(bins * n_types + types[:,j], minlength=len(starts) * n_types).reshape(-1, n_types)[:,1:]
+    return counts
+
+def aggregateRows(heatmap, types, completeness, features_type, target_rows=TARGET_ROWS, reducer='mean'):
+    ''' aggregate the rows of the heatmaps into at most `target_rows` bins
+        Parameters :
+            * `heatmap` : (ndarray)
+                the normalized values as returned by `normalize.computeHeatmapValues`
+            * `types` : (ndarray)
+                the type of each cell, 0 for the missing cells
+            * `completeness` : (ndarray)
+                the number of present features of each row
+            * `features_type` : (iterable)
+                the type of each feature, the values of the string and boolean features
+                are summarized by their mode instead of their mean
+            * `reducer` : (string)
+                'mean' for the mean (or mode) of each bin, 'max' for its maximum,
+                'any' to show the bins containing a missing cell as missing
+        returns a `LevelOfDetail`
+    '''
+    if reducer not in REDUCERS:
+        raise ValueError("unknown reducer '%s', expected one of %s" % (reducer, REDUCERS))
+    n_rows = heatmap.shape[0]
+    starts = binStarts(n_rows, target_rows)
+    sizes = np.diff(np.append(starts, n_rows))[:,None]
+    present = heatmap != MISSING_VALUE
+    missing = np.add.reduceat((types == 0).astype(np.int64), starts, axis=0) / sizes.astype(float)
+
+    if reducer == 'max':
+        summary = np.maximum.reduceat(np.where(present, heatmap, -np.inf), starts, axis=0)
+        summary[np.isinf(summary)] = np.nan
+    else:
+        summary = reduceMean(heatmap, present, starts)
+        for j in range(heatmap.shape[1]):
+            if features_type[j] in (dataset.types['string'], dataset.types['bool']):
+                summary[:,j] = reduceMode(heatmap[:,j], present[:,j], starts, n_rows)
+    if reducer == 'any':
+        summary[missing > 0] = np.nan
+    summary[np.isnan(summary)] = MISSING_VALUE
+
+    # the majority type of the present cells, a bin is missing when most of its cells are
+    bin_types = majorityTypes(binTypeCounts(types, starts, n_rows))
+    bin_types[missing > 0.5] = 0
+    if reducer == 'any':
+        bin_types[missing > 0] = 0
+        bin_completeness = np.minimum.reduceat(completeness, starts)
+    else:
+        bin_completeness = np.add.reduceat(completeness.astype(float), starts) / sizes[:,0]
+    return LevelOfDetail(starts, summary, bin_types, missing, bin_completeness, n_rows)
@@ -0,0 +1,92 @@
+import numpy as np
+
+# number of bits set in each byte value
+POPCOUNT = np.unpackbits(np.arange(256, dtype=np.uint8)[:,None], axis=1).sum(axis=1).astype(np.uint8)
+
+class MissingMask(object):
+    ''' the missing cells of a dataset stored as packed bits, one row of bytes per feature
+        Attributes :
+            * `bits` : (ndarray)
+                uint8 array of shape (n_features, ceil(n_rows / 8)), bit i of the row j
+                is set when the cell (i, j) is missing
+            * `n_rows` : (int)
+                the number of rows of the dataset
+    '''
+    def __init__(self, bits, n_rows):
+        self.bits = bits
+        self.n_rows = n_rows
+
+    @classmethod
+    def fromArray(cls, missing):
+        ''' build the mask from a 2-dimensional bool array of shape (n_rows, n_features)
+        '''
+        missing = np.asarray(missing, dtype=bool)
+        return cls(np.packbits(missing.T, axis=1), missing.shape[0])
+
+    @classmethod
+    def fromColumns(cls, columns_bits, n_rows):
+        ''' build the mask from the packed bits of each feature (see `packColumn`)
+        '''
+        bits = np.empty((len(columns_bits), (n_rows + 7) // 8), dtype=np.uint8)
+        for j in range(len(columns_bits)):
+            bits[j] = columns_bits[j]
+        return cls(bits, n_rows)
+
+    @property
+    def shape(self):
+        return (self.n_rows, self.bits.shape[0])
+
+    @property
+    def nbytes(self):
+        return self.bits.nbytes
+
+    def any(self):
+        return bool(np.any(self.bits))
+
+    def column(self, j):
+        ''' bool array of the missing cells of the feature `j`
+        '''
+        return unpackColumn(self.bits[j], self.n_rows)
+
+    def countPerColumn(self):
+        ''' number of missing cells of each feature
+        '''
+        return POPCOUNT[self.bits].sum(axis=1, dtype=np.int64)
+
+    def countPerRow(self):
+        ''' number of missing cells of each row
+        '''
+        counts = np.zeros(self.n_rows, dtype=np.int32)
+        for j in range(self.bits.shape[0]):
+            counts += self.column(j)
+        return counts
+
+    def validIndices(self, j):
+        ''' indices of the rows where the feature `j` is not missing
+        '''
+        return np.flatnonzero(~self.column(j))
+
+    def completeRows(self):
+        ''' bool array of the rows without any missing cell
+        '''
+        if self.bits.shape[0] == 0:
+            return np.ones(self.n_rows, dtype=bool)
+        return ~unpackColumn(np.bitwise_or.reduce(self.bits, axis=0), self.n_rows)
+
+    def filterRows(self, data, return_indices=False):
+        ''' remove the rows containing a missing cell from `data`, an array of n_rows rows
+        '''
+        complete = self.completeRows()
+        return (data[complete], np.flatnonzero(~complete)) if return_indices else data[complete]
+
+def packColumn(missing):
+    return np.packbits(np.asarray(missing, dtype=bool))
+
+def unpackColumn(bits, n_rows):
+    return np.unpackbits(bits)[:n_rows].view(bool)
+
+def takeColumn(bits, rows):
+    ''' the missing flags of the rows `rows` of a packed column, only their bytes are unpacked
+    '''
+    rows = np.asarray(rows, dtype=np.int64)
+    return ((bits[rows >> 3] >> (7 - (rows & 7)).astype(np.uint8)) & 1).astype(bool)
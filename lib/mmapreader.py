@@ -0,0 +1,111 @@
+import numpy as np
+import csv
+import hashlib
+import io
+import mmap
+import os
+import cache
+import loader
+
+BLOCK_SIZE = 64 * 1024**2
+INDEX_DIR = os.path.join(cache.CACHE_DIR, 'rowindex')
+
+def scanRowStarts(buf, block_size=BLOCK_SIZE):
+    ''' return the byte offset of the start of each non empty line of a csv buffer,
+        newlines inside quoted fields do not start a line
+    '''
+    size = len(buf)
+    starts = [np.zeros(1, dtype=np.int64)]
+    quotes = 0
+    for offset in range(0, size, block_size):
+        block = np.frombuffer(buf, dtype=np.uint8, count=min(block_size, size - offset), offset=offset)
+        quote = np.flatnonzero(block == ord('"'))
+        newline = np.flatnonzero(block == ord('\n'))
+        # a newline is outside quotes when an even number of quotes precedes it,
+        # escaped quotes ("") count twice and keep the parity
+        inside = (quotes + np.searchsorted(quote, newline)) % 2 == 1
+        starts.append(newline[~inside].astype(np.int64) + offset + 1)
+        quotes += len(quote)
+    starts = np.concatenate(starts)
+    ends = np.append(starts[1:], size)
+    starts = starts[starts < size]
+    ends = ends[:len(starts)]
+    # drop the blank lines, as the csv reader does
+    blank = np.zeros(len(starts), dtype=bool)
+    for length, terminator in [(1, '\n'), (2, '\r\n')]:
+        candidates = np.flatnonzero(ends - starts == length)
+        blank[candidates] |= np.asarray([buf[s:s+length] == terminator for s in starts[candidates]], dtype=bool)
+    return starts[~blank]
+
+class MappedCSV(object):
+    ''' a csv file mapped in memory with the byte offset of each of its rows, the index is
+        built on the first opening then persisted in `index_dir` (kept in memory only if None)
+    '''
+    def __init__(self, filepath, index_dir=INDEX_DIR):
+        self.filepath = filepath
+        self.labels, self.has_header = loader.readLabels(filepath)
+        self.file = open(filepath, 'rb')
+        size = os.fstat(self.file.fileno()).st_size
+        self.buffer = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if size > 0 else b''
+        self.offsets = self.loadIndex(index_dir)
+        if self.has_header:
+            self.offsets = self.offsets[1:]
+        self.ends = np.append(self.offsets[1:], len(self.buffer))
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def close(self):
+        if isinstance(self.buffer, mmap.mmap):
+            self.buffer.close()
+        self.file.close()
+
+    def loadIndex(self, index_dir):
+        if index_dir is None:
+            return scanRowStarts(self.buffer)
+        stat = os.stat(self.filepath)
+        identity = '%s:%d:%r' % (os.path.abspath(self.filepath), stat.st_size, stat.st_mtime)
+        path = os.path.join(index_dir, hashlib.sha1(identity.encode('utf-8')).hexdigest() + '.npy')
+        if os.path.isfile(path):
+            return np.load(path)
+        offsets = scanRowStarts(self.buffer)
+        if not os.path.isdir(index_dir):
+            os.makedirs(index_dir)
+        np.save(path, offsets)
+        return offsets
+
+    def readRows(self, rows):
+        ''' decode the rows of indices `rows` (a slice or an array), only their bytes are read
+            returns a 2-dimensional object array of strings (see `loader.iterCSVChunks`)
+        '''
+        indices = np.arange(len(self))[rows] if isinstance(rows, slice) else np.asarray(rows)
+        if len(indices) == 0:
+            return np.empty((0, len(self.labels)), dtype=object), indices
+        if np.all(np.diff(indices) == 1):
+            # a contiguous window is decoded from a single slice of the buffer
+            lines = io.BytesIO(self.buffer[self.offsets[indices[0]]:self.ends[indices[-1]]])
+        else:
+            lines = io.BytesIO(b''.join(self.buffer[self.offsets[i]:self.ends[i]] for i in indices))
+        width = len(self.labels)
+        parsed = [(row + [''] * width)[:width] for row in csv.reader(lines, delimiter=',') if len(row) > 0]
+        return loader.makeChunk(parsed, width), indices
+
+def parseRows(text):
+    ''' parse a START:STOP[:STEP] string to a slice, ex: '5000000:5010000' or '::100'
+    '''
+    fields = [int(f) if f != '' else None for f in text.split(':')]
+    if len(fields) == 1:
+        return slice(fields[0], fields[0] + 1)
+    return slice(*fields[:3])
+
+def loadRows(filepath, rows, index_dir=INDEX_DIR):
+    ''' load a window of rows of a csv file as a `Table`, the index of the rows of the file
+        being persisted in `index_dir` (see `MappedCSV`)
+        returns the table, the index of its rows in the file and the number of rows of the file
+    '''
+    mapped = MappedCSV(filepath, index_dir)
+    try:
+        chunk, indices = mapped.readRows(rows)
+        return loader.buildTable(mapped.labels, [chunk]), indices, len(mapped)
+    finally:
+        mapped.close()
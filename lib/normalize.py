@@ -0,0 +1,212 @@
+import numpy as np
+import dataset
+import dates
+import parallel
+import sketches
+from columns import formatNumber
+
+MISSING_VALUE = 1.001
+# the dtype of the heatmap of the normalized values, the colors of the plot do not need more precision
+HEATMAP_DTYPE = np.float32
+# the normalized values quantized as uint16 (see `quantize`) are round(value * QUANTIZATION_SCALE),
+# MISSING_VALUE included
+QUANTIZATION_SCALE = 65000
+# the string features with more distinct cells are flagged as high-cardinality, their cells
+# are not ranked among every distinct string but encoded by CARDINALITY_ENCODING :
+#   'topk' : the TOP_K most frequent strings by frequency, then a key for the others
+#   'hash' : the bin of the hash of the string among HASH_BINS bins
+HIGH_CARDINALITY = 4096
+CARDINALITY_ENCODING = 'topk'
+TOP_K = 32
+HASH_BINS = 64
+# the categories of the columns encoded while loading (see `loader.ColumnBuilder`), the cells
+# out of the top strings and the hash bins
+OTHER_CATEGORY = '(other)'
+HASH_CATEGORY = '(bin %d)'
+
+def columnKeys(column, feature_type):
+    ''' return the values used to place the cells of a column on the feature-relative scale,
+        nan for the cells which can not be placed (missing or of another type)
+    '''
+    keys = np.empty(len(column))
+    keys.fill(np.nan)
+    if feature_type == dataset.types['missing']:
+        return keys
+    numerical = column.isNumerical()
+    categorical = column.isCategorical()
+    if feature_type == dataset.types['numerical']:
+        if np.any(numerical):
+            keys[numerical] = column.values[numerical]
+    elif feature_type == dataset.types['date']:
+        if np.any(categorical):
+            keys[categorical] = dates.columnEpochs(column)[column.codes[categorical]]
+    elif column.encoding is not None:
+        keys = encodedKeys(column, numerical, categorical)
+    else:
+        sketch = cardinalitySketch(column)
+        if sketch is None:
+            keys = categoryRanks(column, numerical, categorical)
+        elif CARDINALITY_ENCODING == 'hash':
+            keys = hashKeys(column, numerical, categorical)
+        else:
+            keys = topKeys(column, sketch, numerical, categorical)
+    return keys
+
+def cardinalitySketch(column):
+    ''' the sketch of a column flagged as high-cardinality, estimated to hold more than
+        `HIGH_CARDINALITY` distinct cells, None for the other columns. The sketch gathered
+        while loading the column is used, the columns without sketch are only sketched when
+        they may have that many distinct cells
+    '''
+    sketch = column.sketch
+    if sketch is None:
+        if len(column.categories) + np.count_nonzero(column.isNumerical()) <= HIGH_CARDINALITY:
+            return None
+        sketch = sketches.columnSketch(column)
+    return sketch if sketch.distinct() > HIGH_CARDINALITY else None
+
+def topCodes(hashes, sketch, k=TOP_K):
+    ''' encode strings by their 64 bits hashes (see `sketches.hashStrings`) as their frequency rank
+        among the `k` most frequent strings of the sketch found in `hashes` (0 for the most frequent),
+        the other strings share the code after them
+        returns the most frequent strings and the int32 code of each hash
+    '''
+    names = [name for name, _ in sketch.top.mostCommon(sketch.top.capacity)]
+    keys = sketches.hashStrings(names)
+    # the sketch may hold strings which are not among the hashes, such as numbers
+    found = np.flatnonzero(np.isin(keys, hashes))[:k]
+    names, keys = [names[i] for i in found], keys[found]
+    codes = np.empty(len(hashes), dtype=np.int32)
+    codes.fill(len(keys))
+    if len(keys) > 0:
+        order = np.argsort(keys)
+        position = np.minimum(np.searchsorted(keys[order], hashes), len(keys) - 1)
+        is_top = keys[order][position] == hashes
+        codes[is_top] = order[position[is_top]]
+    return names, codes
+
+def topKeys(column, sketch, numerical, categorical, k=TOP_K):
+    ''' key the cells of a high-cardinality column by the frequency rank of their string among
+        its `k` most frequent categories (0 for the most frequent), the other cells share the
+        key after them (see `topCodes`)
+    '''
+    names, rank = topCodes(sketches.hashStrings(column.categories), sketch, k)
+    keys = np.empty(len(column))
+    keys.fill(np.nan)
+    if np.any(categorical):
+        keys[categorical] = rank[column.codes[categorical]]
+    if np.any(numerical):
+        keys[numerical] = len(names)
+    return keys
+
+def hashKeys(column, numerical, categorical, bins=HASH_BINS):
+    ''' key the cells of a high-cardinality column by the bin of their hash among `bins` bins
+        (see `sketches.hashStrings` and `sketches.hashNumbers`)
+    '''
+    keys = np.empty(len(column))
+    keys.fill(np.nan)
+    if np.any(categorical):
+        binned = sketches.hashStrings(column.categories) % np.uint64(bins)
+        keys[categorical] = binned[column.codes[categorical]]
+    if np.any(numerical):
+        keys[numerical] = sketches.hashNumbers(column.values[numerical]) % np.uint64(bins)
+    return keys
+
+def encodedKeys(column, numerical, categorical):
+    ''' key the cells of a column whose strings were encoded while loading by their code (see
+        `loader.ColumnBuilder`), the numbers are keyed as in `topKeys` and `hashKeys`
+    '''
+    keys = np.empty(len(column))
+    keys.fill(np.nan)
+    if np.any(categorical):
+        keys[categorical] = column.codes[categorical]
+    if np.any(numerical):
+        if column.encoding == 'hash':
+            keys[numerical] = sketches.hashNumbers(column.values[numerical]) % np.uint64(len(column.categories))
+        else:
+            keys[numerical] = len(column.categories) - 1
+    return keys
+
+def rankedStrings(column, numerical=None):
+    ''' the sorted distinct strings of a column (its categories and its formatted numbers)
+    '''
+    numerical = column.isNumerical() if numerical is None else numerical
+    strings = list(column.categories)
+    if np.any(numerical):
+        strings += [formatNumber(x) for x in np.unique(column.values[numerical])]
+    return sorted(strings)
+
+def categoryRanks(column, numerical, categorical):
+    ''' rank the cells of a column in the sorted order of its distinct strings,
+        the dictionary codes are ranked once instead of looking up every cell
+    '''
+    strings = list(column.categories)
+    if np.any(numerical):
+        numbers, inverse = np.unique(column.values[numerical], return_inverse=True)
+        strings += [formatNumber(x) for x in numbers]
+    order = np.argsort(np.asarray(strings, dtype=object), kind='mergesort')
+    rank = np.empty(len(strings))
+    rank[order] = np.arange(len(strings))
+    ranks = np.empty(len(column))
+    ranks.fill(np.nan)
+    if np.any(categorical):
+        ranks[categorical] = rank[column.codes[categorical]]
+    if np.any(numerical):
+        ranks[numerical] = rank[len(column.categories) + inverse]
+    return ranks
+
+def columnScale(keys, feature_type):
+    ''' the (span, maximum) placing the keys of a column on its scale, None if no key is present
+    '''
+    present = keys[~np.isnan(keys)]
+    if len(present) == 0:
+        return None
+    if feature_type in (dataset.types['numerical'], dataset.types['date']):
+        return rangeScale(np.min(present), np.max(present))
+    return rankScale(int(np.max(present)) + 1)
+
+def rangeScale(minimum, maximum):
+    d = maximum - minimum
+    return (1 if d==0 else d), maximum
+
+def rankScale(lu):
+    return ([1,0] if lu==1 else [lu-1, lu-1])
+
+def scaleColumn(keys, feature_type, scale=None):
+    ''' scale the keys of a column so that its maximum is 1, the cells without key
+        are set to `MISSING_VALUE`
+        Parameters :
+            * `scale` : (tuple)
+                the (span, maximum) of the scale, see `columnScale` if None
+    '''
+    scale = columnScale(keys, feature_type) if scale is None else scale
+    if scale is None:
+        return np.full(len(keys), MISSING_VALUE)
+    span, maximum = scale
+    with np.errstate(invalid='ignore'):
+        scaled = (keys - maximum) / span + 1.
+    scaled[np.isnan(keys)] = MISSING_VALUE
+    return scaled
+
+def computeHeatmapValues(table, features_type, jobs=1):
+    ''' return the matrix of the values of each feature scaled between 0 and 1,
+        missing cells and cells of another type than their feature are set to `MISSING_VALUE`.
+        The columns are split over `jobs` processes if greater than 1
+    '''
+    if jobs > 1:
+        return parallel.computeHeatmapValues(table, features_type, jobs)
+    heatmap = np.empty(table.shape, dtype=HEATMAP_DTYPE)
+    for j, column in enumerate(table.columns):
+        heatmap[:,j] = scaleColumn(columnKeys(column, features_type[j]), features_type[j])
+    return heatmap
+
+def quantize(heatmap):
+    ''' the normalized values as uint16, round(value * `QUANTIZATION_SCALE`), half the size of
+        the float32 heatmap for a step of 1.5e-5, far below the resolution of the colorscales
+    '''
+    heatmap = np.asarray(heatmap)
+    quantized = np.empty(heatmap.shape, dtype=np.uint16)
+    # by blocks of rows, the products are as large as the heatmap
+    for start in range(0, heatmap.shape[0], sketches.BLOCK_SIZE):
+        quantized[start:start+sketches.BLOCK_SIZE] = np.rint(heatmap[start:start+sketches.BLOCK_SIZE] * QUANTIZATION_SCALE)
+    return quantized
@@ -0,0 +1,133 @@
+import numpy as np
+
+# the rows of the mask unpacked at once (a multiple of 8, the rows of a byte of the mask)
+BLOCK_ROWS = 65536
+# the number of patterns of the table of the report
+TOP_PATTERNS = 20
+# the odd multipliers of the words of the patterns longer than 8 bytes, hashed to 64 bits
+HASH_SEED = 0x5EED
+
+def maskBlocks(mask, block_rows=BLOCK_ROWS):
+    ''' the missing cells of the blocks of `block_rows` rows of a `missing.MissingMask`,
+        as uint8 arrays of shape (n_features, rows of the block)
+    '''
+    for start in range(0, mask.n_rows, block_rows):
+        stop = min(mask.n_rows, start + block_rows)
+        yield np.unpackbits(mask.bits[:,start//8:(stop+7)//8], axis=1)[:,:stop-start]
+
+def nullityCorrelation(mask, block_rows=BLOCK_ROWS):
+    ''' the correlation between the missing cells of each pair of features (the Pearson
+        correlation of their missing indicators), from the product of the unpacked mask by
+        its transpose, accumulated by blocks of rows (the float32 products of a block are exact)
+        returns an array of shape (n_features, n_features), nan for the features which are
+        never or always missing
+    '''
+    n_features = mask.shape[1]
+    products = np.zeros((n_features, n_features))
+    for block in maskBlocks(mask, block_rows):
+        block = block.astype(np.float32)
+        products += np.dot(block, block.T)
+    n_rows = float(max(1, mask.n_rows))
+    frequencies = np.diag(products) / n_rows
+    deviations = np.sqrt(frequencies * (1. - frequencies))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        correlation = (products / n_rows - np.outer(frequencies, frequencies)) / np.outer(deviations, deviations)
+    constant = deviations == 0
+    correlation[constant,:] = np.nan
+    correlation[:,constant] = np.nan
+    return np.clip(correlation, -1., 1.)
+
+def packedRows(mask, block_rows=BLOCK_ROWS):
+    ''' the missing features of each row as packed bits, an uint8 array of shape
+        (n_rows, ceil(n_features / 8)), transposed from the mask by blocks of rows
+    '''
+    rows = np.empty((mask.n_rows, (mask.shape[1] + 7) // 8), dtype=np.uint8)
+    for start, block in zip(range(0, mask.n_rows, block_rows), maskBlocks(mask, block_rows)):
+        rows[start:start+block.shape[1]] = np.packbits(block, axis=0).T
+    return rows
+
+def rowKeys(rows):
+    ''' a 64 bits key of each row of bytes: the bytes themselves for the rows of at most 8
+        bytes, a hash of their words for the longer ones
+    '''
+    n_words = max(1, (rows.shape[1] + 7) // 8)
+    words = np.zeros((rows.shape[0], n_words * 8), dtype=np.uint8)
+    words[:,:rows.shape[1]] = rows
+    words = words.view('<u8')
+    if n_words == 1:
+        return words[:,0]
+    multipliers = np.random.RandomState(HASH_SEED).randint(0, 2**62, size=n_words).astype(np.uint64) * np.uint64(2) + np.uint64(1)
+    keys = np.zeros(rows.shape[0], dtype=np.uint64)
+    with np.errstate(over='ignore'):
+        for k in range(n_words):
+            keys = keys * np.uint64(0x100000001B3) + words[:,k] * multipliers[k]
+    return keys
+
+def groupKeys(keys):
+    ''' the groups of equal keys, faster than `np.unique` which sorts them stably to find
+        the first index of each
+        returns the first index of each group, its size and the group of each key
+    '''
+    order = np.argsort(keys)
+    sorted_keys = keys[order]
+    is_first = np.empty(len(keys), dtype=bool)
+    is_first[:1] = True
+    np.not_equal(sorted_keys[1:], sorted_keys[:-1], out=is_first[1:])
+    starts = np.flatnonzero(is_first)
+    first_indices = np.minimum.reduceat(order, starts) if len(starts) > 0 else starts
+    groups = np.empty(len(keys), dtype=np.int64)
+    groups[order] = np.cumsum(is_first) - 1
+    return first_indices, np.diff(np.append(starts, len(keys))), groups
+
+class MissingPatterns(object):
+    ''' the distinct sets of missing features of the rows of a dataset, by decreasing number of rows
+        Attributes :
+            * `patterns` : (ndarray)
+                uint8 array of shape (n_patterns, ceil(n_features / 8)), the missing features
+                of each pattern as packed bits
+            * `counts` : (ndarray)
+                the number of rows of each pattern
+            * `first_rows` : (ndarray)
+                the first row of each pattern
+            * `n_features` : (int)
+    '''
+    def __init__(self, patterns, counts, first_rows, n_features):
+        self.patterns = patterns
+        self.counts = counts
+        self.first_rows = first_rows
+        self.n_features = n_features
+
+    def __len__(self):
+        return len(self.counts)
+
+    def missing(self, k):
+        ''' bool array of the missing features of the pattern `k`
+        '''
+        return np.unpackbits(self.patterns[k])[:self.n_features].view(bool)
+
+    def top(self, labels, n_patterns=TOP_PATTERNS):
+        ''' the json-serializable summary of the `n_patterns` most frequent patterns
+        '''
+        n_rows = max(1, int(np.sum(self.counts)))
+        return [{
+            'rows': int(self.counts[k]),
+            'fraction': float(self.counts[k]) / n_rows,
+            'first_row': int(self.first_rows[k]),
+            'missing': [str(label) for label in np.asarray(labels)[self.missing(k)]],
+        } for k in range(min(n_patterns, len(self)))]
+
+def missingPatterns(mask, block_rows=BLOCK_ROWS):
+    ''' group the rows of a `missing.MissingMask` by their missing features, the packed rows
+        being told apart by a 64 bits key (see `rowKeys`), or compared as whole rows of bytes
+        by `np.unique` when two patterns share a key
+        returns the `MissingPatterns`
+    '''
+    rows = packedRows(mask, block_rows)
+    first_rows, counts, groups = groupKeys(rowKeys(rows))
+    if rows.shape[1] > 8 and np.any(rows != rows[first_rows[groups]]):
+        _, first_rows, counts = np.unique(np.ascontiguousarray(rows).view(np.dtype((np.void, rows.shape[1]))).ravel(),
+                                          return_index=True, return_counts=True)
+    # by decreasing number of rows, then in the order of their first row
+    order = np.lexsort((first_rows, -counts))
+    first_rows, counts = first_rows[order], counts[order]
+    return MissingPatterns(rows[first_rows], counts, first_rows, mask.shape[1])
@@ -0,0 +1,261 @@
+import numpy as np
+import binascii
+import json
+import os
+import webbrowser
+import zlib
+from columns import StringColumns
+
+# the trace attributes stored as binary arrays, when they hold at least MIN_ENCODED_SIZE values
+ENCODED_ATTRIBUTES = ['x', 'y', 'z', 'text', 'customdata']
+MIN_ENCODED_SIZE = 256
+# the arrays are checked and written by blocks of BLOCK_SIZE values, the base64 of a block is a
+# piece of the base64 of the array as BLOCK_SIZE is a multiple of 3
+BLOCK_SIZE = 3 * 2**18
+
+def writeHTML(fig, filename, scripts=(), auto_open=True):
+    ''' write the figure as a standalone html page, followed by the javascript `scripts`
+        (run once the figure is drawn)
+    '''
+    import plotly.offline as py
+    for trace in fig['data']:
+        for attribute in ENCODED_ATTRIBUTES:
+            if isinstance(trace.get(attribute), StringColumns):
+                trace[attribute] = trace[attribute].toArray()
+    div = py.plot(fig, output_type='div', include_plotlyjs=True, show_link=False)
+    with open(filename, 'w') as f:
+        f.write('<html><head><meta charset="utf-8" /></head><body>')
+        f.write(div)
+        for script in scripts:
+            f.write('<script type="text/javascript">%s</script>' % script)
+        f.write('</body></html>')
+    if auto_open:
+        webbrowser.open('file://' + os.path.abspath(filename))
+
+def isIntegral(array):
+    ''' True if every value of a numerical array is an integer, checked by blocks (most float
+        arrays are told apart by their first block)
+    '''
+    if array.dtype.kind in 'uib':
+        return array.size > 0
+    flat = array.reshape(-1)
+    for start in range(0, len(flat), BLOCK_SIZE):
+        block = flat[start:start+BLOCK_SIZE]
+        if not (np.all(np.isfinite(block)) and np.all(np.mod(block, 1) == 0)):
+            return False
+    return array.size > 0
+
+def arrayEncoding(array):
+    ''' the smallest of uint8, uint16, uint32 or float32 which holds the values of a numerical
+        array (float64 for the integers too large for a float32), and the array in this dtype
+    '''
+    array = np.asarray(array)
+    integral = isIntegral(array)
+    low, high = (array.min(), array.max()) if integral else (0, 0)
+    if integral and low >= 0 and high < 2**32:
+        dtype = 'uint8' if high < 2**8 else ('uint16' if high < 2**16 else 'uint32')
+    elif integral and max(-low, high) >= 2**24:
+        dtype = 'float64'
+    else:
+        dtype = 'float32'
+    return dtype, np.ascontiguousarray(array, dtype=np.dtype(dtype).newbyteorder('<'))
+
+def base64Pieces(data):
+    ''' the base64 of the bytes of a contiguous array, by pieces of `BLOCK_SIZE` bytes
+    '''
+    flat = data.reshape(-1).view(np.uint8)
+    for start in range(0, len(flat), BLOCK_SIZE):
+        encoded = binascii.b2a_base64(flat[start:start+BLOCK_SIZE].tobytes())[:-1]
+        # kept as bytes where they are strings (python 2), a unicode copy takes 4 bytes per character
+        yield encoded if isinstance(encoded, str) else encoded.decode('ascii')
+
+def encodeArray(array):
+    ''' encode a numerical array as base64, in the smallest dtype which holds its values
+        (see `arrayEncoding`)
+    '''
+    dtype, data = arrayEncoding(array)
+    return {'dtype': dtype, 'shape': list(data.shape), 'data': ''.join(base64Pieces(data))}
+
+def encodeStrings(array):
+    ''' encode an array of strings as a table of its distinct strings and the codes of the cells,
+        a 2-dimensional array is encoded column by column, each with its own table
+    '''
+    array = np.asarray(array, dtype=object)
+    if array.ndim == 2:
+        return {'shape': list(array.shape), 'columns': [encodeStrings(array[:,j]) for j in range(array.shape[1])]}
+    table, codes = np.unique(array.astype(str), return_inverse=True)
+    return {'shape': list(array.shape), 'table': list(table), 'codes': encodeArray(codes)}
+
+def encodeStringColumns(matrix):
+    ''' encode a `columns.StringColumns` as `encodeStrings` encodes a 2-dimensional array,
+        from the tables and codes of its columns
+    '''
+    return {'shape': list(matrix.shape), 'columns': [{'shape': [matrix.n_rows], 'table': list(table), 'codes': encodeArray(codes)}
+                                                     for table, codes in zip(matrix.tables, matrix.codes)]}
+
+def isEncoded(value):
+    ''' True if a trace attribute is stored as a binary array (see `encodeValue`)
+    '''
+    if isinstance(value, StringColumns):
+        return value.n_rows * len(value.tables) >= MIN_ENCODED_SIZE
+    if not isinstance(value, (np.ndarray, list, tuple)):
+        return False
+    array = np.asarray(value)
+    return array.size >= MIN_ENCODED_SIZE and array.ndim <= 2 and array.dtype.kind in 'uifbSUO'
+
+def encodeValue(value):
+    ''' return the binary encoding of a trace attribute, None to leave it as json
+    '''
+    if not isEncoded(value):
+        return None
+    if isinstance(value, StringColumns):
+        return encodeStringColumns(value)
+    array = np.asarray(value)
+    if array.dtype.kind in 'uifb':
+        return encodeArray(array)
+    return encodeStrings(array)
+
+def splitPayload(fig):
+    ''' move the large arrays of the traces of a figure to a payload of binary arrays
+        returns the figure as a json-serializable dict and the payload, the list of
+        (trace, attribute, value) of the arrays, encoded when written (see `payloadPieces`)
+    '''
+    data, payload = [], []
+    for i, trace in enumerate(fig['data']):
+        trace = dict(trace)
+        for attribute in ENCODED_ATTRIBUTES:
+            if isEncoded(trace.get(attribute)):
+                payload.append((i, attribute, trace[attribute]))
+                del trace[attribute]
+        data.append(trace)
+    return {'data': data, 'layout': fig['layout']}, payload
+
+def payloadPieces(payload):
+    ''' the json of the payload in pieces, an array being encoded once the previous one is
+        written and the base64 of the numerical arrays by blocks, the whole payload is never
+        held in memory
+    '''
+    yield '['
+    for k, (i, attribute, value) in enumerate(payload):
+        yield ', ' if k > 0 else ''
+        array = None if isinstance(value, StringColumns) else np.asarray(value)
+        if array is not None and array.dtype.kind in 'uifb':
+            dtype, data = arrayEncoding(array)
+            yield json.dumps({'dtype': dtype, 'shape': list(data.shape), 'trace': i, 'attribute': attribute})[:-1] + ', "data": "'
+            for piece in base64Pieces(data):
+                yield piece
+            yield '"}'
+        else:
+            encoded = encodeValue(value)
+            encoded.update(trace=i, attribute=attribute)
+            yield json.dumps(encoded)
+    yield ']'
+
+def compressedPieces(pieces):
+    ''' the json string of the base64 of the gzip of the pieces, encoded as the compressed
+        bytes come out: each run of at least `BLOCK_SIZE` bytes is encoded but for its last
+        len % 3 bytes, carried over to the next run
+    '''
+    compressor = zlib.compressobj(9, zlib.DEFLATED, 31)
+    buffered, size = [], 0
+    yield '"'
+    for piece in pieces:
+        compressed = compressor.compress(piece.encode('utf-8'))
+        buffered.append(compressed)
+        size += len(compressed)
+        if size >= BLOCK_SIZE:
+            data = b''.join(buffered)
+            cut = len(data) - len(data) % 3
+            for encoded in base64Pieces(np.frombuffer(data[:cut], dtype=np.uint8)):
+                yield encoded
+            buffered, size = [data[cut:]], len(data) - cut
+    buffered.append(compressor.flush())
+    for encoded in base64Pieces(np.frombuffer(b''.join(buffered), dtype=np.uint8)):
+        yield encoded
+    yield '"'
+
+LOADER_SCRIPT = '''
+(function() {
+    var TYPES = {uint8: Uint8Array, uint16: Uint16Array, uint32: Uint32Array, float32: Float32Array, float64: Float64Array};
+    var bytes = function(b64) {
+        var s = atob(b64), a = new Uint8Array(s.length);
+        for (var i = 0; i < s.length; i++) a[i] = s.charCodeAt(i);
+        return a;
+    };
+    var values = function(encoded) {
+        if (encoded.table === undefined) return new TYPES[encoded.dtype](bytes(encoded.data).buffer);
+        var codes = values(encoded.codes), strings = new Array(codes.length);
+        for (var i = 0; i < codes.length; i++) strings[i] = encoded.table[codes[i]];
+        return strings;
+    };
+    var rebuild = function(encoded) {
+        var shape = encoded.shape, rows = new Array(shape[0]);
+        if (encoded.columns !== undefined) {
+            var columns = encoded.columns.map(values);
+            for (var i = 0; i < shape[0]; i++) rows[i] = columns.map(function(column) { return column[i]; });
+            return rows;
+        }
+        var flat = values(encoded);
+        if (shape.length === 1) return Array.prototype.slice.call(flat);
+        for (var i = 0; i < shape[0]; i++) rows[i] = Array.prototype.slice.call(flat, i * shape[1], (i + 1) * shape[1]);
+        return rows;
+    };
+    var inflate = function(b64) {
+        var stream = new Blob([bytes(b64)]).stream().pipeThrough(new DecompressionStream('gzip'));
+        return new Response(stream).text().then(JSON.parse);
+    };
+    var figure = %(figure)s;
+    var payload = %(payload)s;
+    Promise.resolve(typeof payload === 'string' ? inflate(payload) : payload).then(function(payload) {
+        payload.forEach(function(encoded) { figure.data[encoded.trace][encoded.attribute] = rebuild(encoded); });
+        var gd = document.getElementById('csv-plot');
+        return Plotly.newPlot(gd, figure.data, figure.layout, {showLink: false}).then(function() {
+            window.addEventListener('resize', function() { Plotly.Plots.resize(gd); });
+            %(scripts)s
+        });
+    });
+})();
+'''
+
+def writeCompactHTML(fig, filename, scripts=(), sidecar=False, compress=False, auto_open=True):
+    ''' write the figure as a standalone html page with its large arrays stored as base64
+        binary arrays (see `encodeValue`), rebuilt in the page before plotting
+        Parameters :
+            * `scripts` : (iterable)
+                javascript run once the figure is drawn
+            * `sidecar` : (bool)
+                set to write the arrays in a separate `<filename>.data.js` file
+            * `compress` : (bool)
+                set to gzip the arrays (decompressed with the browser DecompressionStream)
+    '''
+    import plotly.offline.offline as pyOffline
+    import plotly.utils
+    figure, payload = splitPayload(fig)
+    pieces = payloadPieces(payload)
+    if compress:
+        pieces = compressedPieces(pieces)
+    if sidecar:
+        sidecar_filename = os.path.splitext(filename)[0] + '.data.js'
+        with open(sidecar_filename, 'w') as f:
+            f.write('window.csvPlotPayload = ')
+            for piece in pieces:
+                f.write(piece)
+            f.write(';')
+        pieces = ['window.csvPlotPayload']
+    # the payload is written between the two halves of the loader
+    head, tail = LOADER_SCRIPT.split('%(payload)s')
+    with open(filename, 'w') as f:
+        f.write('<html><head><meta charset="utf-8" /></head><body>')
+        f.write('<script type="text/javascript">%s</script>' % pyOffline.get_plotlyjs())
+        if sidecar:
+            f.write('<script type="text/javascript" src="%s"></script>' % os.path.basename(sidecar_filename))
+        f.write('<div id="csv-plot" style="height: 100%; width: 100%;" class="plotly-graph-div"></div>')
+        f.write('<script type="text/javascript">')
+        f.write(head % {'figure': json.dumps(figure, cls=plotly.utils.PlotlyJSONEncoder)})
+        for piece in pieces:
+            f.write(piece)
+        f.write(tail % {'scripts': '\n'.join(scripts)})
+        f.write('</script>')
+        f.write('</body></html>')
+    if auto_open:
+        webbrowser.open('file://' + os.path.abspath(filename))
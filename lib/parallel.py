@@ -0,0 +1,80 @@
+import numpy as np
+import multiprocessing
+import multiprocessing.sharedctypes
+import inference
+import normalize
+
+# the arguments of the column workers, set before the pool is forked so that the
+# workers share the column buffers with the parent process instead of receiving pickled copies
+shared = None
+
+def mapColumns(function, n_columns, arguments, jobs=1):
+    ''' call `function(j)` for each column index j, split over a pool of `jobs` processes
+        Parameters :
+            * `function` : (function)
+                a module level function reading its inputs from `shared`
+            * `arguments` : (tuple)
+                the inputs of the function, shared with the workers
+            * `jobs` : (int)
+                the number of processes, the columns are processed serially if 1
+        returns the results in the order of the columns
+    '''
+    global shared
+    shared = arguments
+    try:
+        if jobs <= 1 or n_columns <= 1:
+            return [function(j) for j in range(n_columns)]
+        pool = multiprocessing.Pool(min(jobs, n_columns))
+        try:
+            return pool.map(function, range(n_columns), chunksize=max(1, n_columns // (4 * jobs)))
+        finally:
+            pool.close()
+            pool.join()
+    finally:
+        shared = None
+
+def sharedArray(shape, dtype=np.float64):
+    ''' a float64 (or float32) array in shared memory, written by the workers in place
+    '''
+    raw = multiprocessing.sharedctypes.RawArray('f' if dtype == np.float32 else 'd', int(np.prod(shape)))
+    return np.frombuffer(raw, dtype=dtype).reshape(shape)
+
+def inferColumnWorker(j):
+    table, min_confidence = shared
+    feature_type = inference.inferColumn(table.columns[j], min_confidence)[1]
+    return feature_type, table.columns[j].epochs
+
+def inferStringsWorker(j):
+    data, min_confidence = shared
+    return inference.inferStrings(data[:,j], min_confidence)
+
+def normalizeColumnWorker(j):
+    table, features_type, heatmap = shared
+    column = table.columns[j]
+    heatmap[:,j] = normalize.scaleColumn(normalize.columnKeys(column, features_type[j]), features_type[j])
+    return column.epochs
+
+def inferTable(table, min_confidence=None, jobs=1):
+    ''' parallel `inference.inferTable`, the dates parsed by the workers are kept on the columns
+    '''
+    min_confidence = inference.MIN_CONFIDENCE if min_confidence is None else min_confidence
+    results = mapColumns(inferColumnWorker, table.shape[1], (table, min_confidence), jobs)
+    for column, (_, epochs) in zip(table.columns, results):
+        column.epochs = epochs
+    return [feature_type for feature_type, _ in results]
+
+def inferStrings(data, min_confidence=None, jobs=1):
+    ''' `inference.inferStrings` on each column of a string matrix
+        returns the list of (cells type, feature type) of the columns
+    '''
+    min_confidence = inference.MIN_CONFIDENCE if min_confidence is None else min_confidence
+    return mapColumns(inferStringsWorker, data.shape[1], (data, min_confidence), jobs)
+
+def computeHeatmapValues(table, features_type, jobs=1):
+    ''' parallel `normalize.computeHeatmapValues`, the workers write in a shared output matrix
+    '''
+    heatmap = sharedArray(table.shape, normalize.HEATMAP_DTYPE) if jobs > 1 else np.empty(table.shape, dtype=normalize.HEATMAP_DTYPE)
+    results = mapColumns(normalizeColumnWorker, table.shape[1], (table, features_type, heatmap), jobs)
+    for column, epochs in zip(table.columns, results):
+        column.epochs = epochs
+    return heatmap
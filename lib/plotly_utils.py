@@ -1,6 +1,4 @@
-import plotly.graph_objs as go
 import numpy as np
-import dataset
 import json
 
 # source : http://bids.github.io/colormap/
@@ -11,6 +9,10 @@ cmaps = {
     'inferno':["#000004","#010005","#010106","#010108","#02010a","#02020c","#02020e","#030210","#040312","#040314","#050417","#060419","#07051b","#08051d","#09061f","#0a0722","#0b0724","#0c0826","#0d0829","#0e092b","#10092d","#110a30","#120a32","#140b34","#150b37","#160b39","#180c3c","#190c3e","#1b0c41","#1c0c43","#1e0c45","#1f0c48","#210c4a","#230c4c","#240c4f","#260c51","#280b53","#290b55","#2b0b57","#2d0b59","#2f0a5b","#310a5c","#320a5e","#340a5f","#360961","#380962","#390963","#3b0964","#3d0965","#3e0966","#400a67","#420a68","#440a68","#450a69","#470b6a","#490b6a","#4a0c6b","#4c0c6b","#4d0d6c","#4f0d6c","#510e6c","#520e6d","#540f6d","#550f6d","#57106e","#59106e","#5a116e","#5c126e","#5d126e","#5f136e","#61136e","#62146e","#64156e","#65156e","#67166e","#69166e","#6a176e","#6c186e","#6d186e","#6f196e","#71196e","#721a6e","#741a6e","#751b6e","#771c6d","#781c6d","#7a1d6d","#7c1d6d","#7d1e6d","#7f1e6c","#801f6c","#82206c","#84206b","#85216b","#87216b","#88226a","#8a226a","#8c2369","#8d2369","#8f2469","#902568","#922568","#932667","#952667","#972766","#982766","#9a2865","#9b2964","#9d2964","#9f2a63","#a02a63","#a22b62","#a32c61","#a52c60","#a62d60","#a82e5f","#a92e5e","#ab2f5e","#ad305d","#ae305c","#b0315b","#b1325a","#b3325a","#b43359","#b63458","#b73557","#b93556","#ba3655","#bc3754","#bd3853","#bf3952","#c03a51","#c13a50","#c33b4f","#c43c4e","#c63d4d","#c73e4c","#c83f4b","#ca404a","#cb4149","#cc4248","#ce4347","#cf4446","#d04545","#d24644","#d34743","#d44842","#d54a41","#d74b3f","#d84c3e","#d94d3d","#da4e3c","#db503b","#dd513a","#de5238","#df5337","#e05536","#e15635","#e25734","#e35933","#e45a31","#e55c30","#e65d2f","#e75e2e","#e8602d","#e9612b","#ea632a","#eb6429","#eb6628","#ec6726","#ed6925","#ee6a24","#ef6c23","#ef6e21","#f06f20","#f1711f","#f1731d","#f2741c","#f3761b","#f37819","#f47918","#f57b17","#f57d15","#f67e14","#f68013","#f78212","#f78410","#f8850f","#f8870e","#f8890c","#f98b0b","#f98c0a","#f98e09","#fa9008","#fa9207","#fa9407","#fb9606","#fb9706","#fb9906","#fb9b06","#fb9d07","#fc9f07","#fca108","#fca309","#fca50a","#fca60c","#fca80d","#fcaa0f","#fcac11","#fcae12","#fcb014","#fcb216","#fcb418","#fbb61a","#fbb81d","#fbba1f","#fbbc21","#fbbe23","#fac026","#fac228","#fac42a","#fac62d","#f9c72f","#f9c932","#f9cb35","#f8cd37","#f8cf3a","#f7d13d","#f7d340","#f6d543","#f6d746","#f5d949","#f5db4c","#f4dd4f","#f4df53","#f4e156","#f3e35a","#f3e55d","#f2e661","#f2e865","#f2ea69","#f1ec6d","#f1ed71","#f1ef75","#f1f179","#f2f27d","#f2f482","#f3f586","#f3f68a","#f4f88e","#f5f992","#f6fa96","#f8fb9a","#f9fc9d","#fafda1","#fcffa4"],
 }
 EPSILON = 1e-7
+# the colorscale of the correlations, from -1 to 1
+CORRELATION_COLORSCALE = [[0., '#2166ac'], [0.5, '#f7f7f7'], [1., '#b2182b']]
+# the missing features listed in a row of the pattern table
+MAX_PATTERN_FEATURES = 12
 
 def hex2rgb(h):
     if h[0] == '#':
@@ -45,6 +47,7 @@ def appendColorToScale(colorscale, color, p=0.001):
 def makeColorLegend(names, colors):
     ''' create a color legend with the defined names and colors
     '''
+    import plotly.graph_objs as go
     c = np.asarray(colors)[np.arange(len(names)) * (len(colors) / len(names))] # TODO: test
     dicts = []
     for i in range(len(names)):
@@ -90,6 +93,25 @@ def makeVerticalLines(x, y0=0, y1=1, xref='x', yref='paper', color='#000000', li
         )
     return dicts
 
+def makeVerticalPath(x, y0=0, y1=1, xref='x', yref='paper', color='#000000', linewidth=0.5):
+    ''' create the vertical lines of `makeVerticalLines` as a single path shape, the browser
+        then draws a single shape whatever the number of lines
+        returns a list holding the plotly path dictionary (to be used in layout['shapes'])
+    '''
+    path = ''.join('M%s,%sL%s,%s' % (xi, y0, xi, y1) for xi in x)
+    return [
+        dict(
+            type='path',
+            xref=xref,
+            yref=yref,
+            path=path,
+            line={
+                'color':color,
+                'width':linewidth
+            },
+        )
+    ]
+
 def makeHorizontalLines(y, x0=0, x1=1, xref='paper', yref='y', color='#000000', linewidth=0.5):
     ''' create a list of horizontal lines
         Parameters :
@@ -124,49 +146,155 @@ def makeHorizontalLines(y, x0=0, x1=1, xref='paper', yref='y', color='#000000',
         )
     return dicts
 
-def makeBoxPlots(data, labels, features_type, axis=2, visible=True, normed=False):
-    ''' create a list of box plots from data and features type
+def makeBoxPlots(summaries, labels, axis=2, visible=True, normed=False, width=0.3):
+    ''' create the box plots of the features from their summary statistics, drawn as lines
+        (plotly computes its box plots from every value, which the figure would then embed)
         Parameters :
-            * `data` : (ndarray)
-                the data as loaded by the csv loader
+            * `summaries` : (iterable)
+                the statistics of each feature as returned by `stats.ColumnStats.summary`,
+                None for the features without box plot
             * `labels` : (iterable)
                 the labels of the features
-            * `features_type` : (iterable)
-                the features types as outputed by 'determineFeaturesType()'
             * `axis` : (int)
                 the axis number, 0 or 1 is the first axis
             * `normed` : (bool)
                 set to constrain the box plots between 0 and 1
-        returns a list of plotly box plots dictionaries
+            * `width` : (float)
+                the half width of the boxes
+        returns a list of two plotly scatter dictionaries: the boxes and whiskers, and the
+        means with their standard deviation (hovered for the statistics)
     '''
-    dicts = []
-    for j in range(data.shape[1]):
-        if features_type[j] == 1:
-            col = dataset.dropMissingData(data[:,j]).astype(float)
-            if normed is True:
-                cmin = np.min(col)
-                cmax = np.max(col)
-                col = (col - cmax) / (cmax - cmin + EPSILON) + 1.
-        else:
-            col = [0]
-        dicts.append(
-            go.Box(
-                x0=j,
-                y=col,
-                boxmean='sd',
-                boxpoints=False,
-                visible=visible,
-                name="%s"%labels[j],
-                opacity=1,
-                fillcolor='#ffffff',
-                line=dict(color='#2f2f2f', width=1.),
-                hoverinfo='y',
-                showlegend=False,
-                xaxis=('x'+str(axis) if axis > 1 else 'x'),
-                yaxis=('y'+str(axis) if axis > 1 else 'y'),
-            ),
-        )
-    return dicts
+    import plotly.graph_objs as go
+    x, y = [], []
+    means, deviations, positions, texts = [], [], [], []
+    for j, summary in enumerate(summaries):
+        if summary is None:
+            continue
+        scale = lambda v: v
+        if normed is True:
+            cmin, cmax = summary['min'], summary['max']
+            scale = lambda v: (v - cmax) / (cmax - cmin + EPSILON) + 1.
+        q1, median, q3 = scale(summary['q1']), scale(summary['median']), scale(summary['q3'])
+        low, high = scale(summary['lowerfence']), scale(summary['upperfence'])
+        # the box, the median, the whiskers and their caps, separated by gaps (nan keeps the
+        # coordinates numerical arrays)
+        for xs, ys in [([j-width, j+width, j+width, j-width, j-width], [q1, q1, q3, q3, q1]),
+                       ([j-width, j+width], [median, median]),
+                       ([j, j], [q1, low]), ([j-width/2, j+width/2], [low, low]),
+                       ([j, j], [q3, high]), ([j-width/2, j+width/2], [high, high])]:
+            x += xs + [np.nan]
+            y += ys + [np.nan]
+        positions.append(j)
+        means.append(scale(summary['mean']))
+        deviations.append(scale(summary['mean'] + summary['std']) - scale(summary['mean']))
+        texts.append('<br>'.join(['%s' % labels[j]] + ['%s: %.6g' % (key, summary[key])
+                     for key in ['count', 'mean', 'std', 'min', 'q1', 'median', 'q3', 'max']]))
+    xaxis, yaxis = ('x'+str(axis) if axis > 1 else 'x'), ('y'+str(axis) if axis > 1 else 'y')
+    return [
+        go.Scatter(
+            x=np.asarray(x),
+            y=np.asarray(y),
+            mode='lines',
+            visible=visible,
+            line=dict(color='#2f2f2f', width=1.),
+            hoverinfo='skip',
+            showlegend=False,
+            xaxis=xaxis,
+            yaxis=yaxis,
+        ),
+        go.Scatter(
+            x=positions,
+            y=means,
+            text=texts,
+            mode='markers',
+            visible=visible,
+            marker=dict(color='#2f2f2f', size=5, symbol='diamond-open'),
+            error_y=dict(type='data', array=deviations, visible=True, color='#2f2f2f', thickness=1, width=0),
+            hoverinfo='text',
+            showlegend=False,
+            xaxis=xaxis,
+            yaxis=yaxis,
+        ),
+    ]
+
+def makeNullityHeatmap(correlation, labels, axis=2, visible=True):
+    ''' create the heatmap of the correlation between the missing cells of the features
+        (see `nullity.nullityCorrelation`), the features never or always missing are blank
+        Parameters :
+            * `correlation` : (ndarray)
+                the correlation of each pair of features, nan when undefined
+            * `labels` : (iterable)
+                the labels of the features
+            * `axis` : (int)
+                the axis number, 0 or 1 is the first axis
+    '''
+    import plotly.graph_objs as go
+    labels = [str(label) for label in labels]
+    return go.Heatmap(
+        x=labels,
+        y=labels,
+        z=correlation,
+        zmin=-1.,
+        zmax=1.,
+        colorscale=CORRELATION_COLORSCALE,
+        colorbar=dict(
+            x=1.,
+            y=0.15,
+            len=0.85,
+            thicknessmode='fraction',
+            thickness=0.025,
+            xpad=8,
+            ypad=0,
+            xanchor='left',
+            yanchor='bottom',
+            ticks='inside',
+            ticklen=5,
+            title='Nullity correlation',
+            titleside='right',
+            outlinewidth=0.5,
+        ),
+        visible=visible,
+        hoverinfo='x+y+z',
+        xaxis='x'+str(axis) if axis > 1 else 'x',
+        yaxis='y'+str(axis) if axis > 1 else 'y',
+    )
+
+def makePatternTable(patterns, domain, visible=True):
+    ''' create the table of the most frequent sets of missing features of the rows
+        Parameters :
+            * `patterns` : (list)
+                the patterns as returned by `nullity.MissingPatterns.top`
+            * `domain` : (dict)
+                the x and y domains of the table
+    '''
+    import plotly.graph_objs as go
+    def featuresText(missing):
+        if len(missing) == 0:
+            return '(complete rows)'
+        text = ', '.join(missing[:MAX_PATTERN_FEATURES])
+        return text + (' (+%d)' % (len(missing) - MAX_PATTERN_FEATURES) if len(missing) > MAX_PATTERN_FEATURES else '')
+    return go.Table(
+        header=dict(
+            values=['Rank', 'Rows', 'Share', 'Missing', 'Missing features'],
+            align='left',
+            fill=dict(color='#e0e0e0'),
+            line=dict(color='#b0b0b0', width=0.5),
+        ),
+        cells=dict(
+            values=[
+                list(range(1, len(patterns)+1)),
+                [pattern['rows'] for pattern in patterns],
+                ['%.2f%%' % (pattern['fraction'] * 100) for pattern in patterns],
+                [len(pattern['missing']) for pattern in patterns],
+                [featuresText(pattern['missing']) for pattern in patterns],
+            ],
+            align='left',
+            line=dict(color='#b0b0b0', width=0.5),
+        ),
+        columnwidth=[1, 2, 2, 2, 12],
+        domain=domain,
+        visible=visible,
+    )
 
 def makeHorizontallyAlignedAnnotations(texts, x, y, xref='paper', yref='paper', xanchor='left'):
     ''' x is array, y is float
@@ -186,9 +314,10 @@ def makeHorizontallyAlignedAnnotations(texts, x, y, xref='paper', yref='paper',
         )
     return dicts
 
-def makeColorscaleButtons(cmaps, add_missing=None):
+def makeColorscaleButtons(cmaps, add_missing=None, traces=None):
     ''' make colorscale update buttons from cmaps.
-        add_missing is either None (does nothing) or a color as string
+        add_missing is either None (does nothing) or a color as string,
+        traces the indices of the traces restyled (every trace if None)
     '''
     buttons = []
     for key in cmaps.keys():
@@ -197,7 +326,7 @@ def makeColorscaleButtons(cmaps, add_missing=None):
             colorscale = appendColorToScale(colorscale, add_missing, p=0.001)
         buttons.append(
             dict(
-                args=['colorscale', json.dumps(colorscale)],
+                args=['colorscale', json.dumps(colorscale)] + ([list(traces)] if traces is not None else []),
                 label=key.capitalize(),
                 method='restyle'
             )
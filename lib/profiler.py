@@ -0,0 +1,208 @@
+import numpy as np
+import contextlib
+import json
+import os
+import resource
+import sys
+import time
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+# the profiler the stages are recorded by, None when profiling is disabled (see `enable`)
+active = None
+# the functions called with each finished `Stage`, even when profiling is disabled
+callbacks = []
+
+def addCallback(callback):
+    ''' call `callback(stage)` at the end of each stage, ex: to forward the metrics
+        to a monitoring service
+    '''
+    callbacks.append(callback)
+
+def removeCallback(callback):
+    callbacks.remove(callback)
+
+def readStatus(field):
+    ''' a memory field of /proc/self/status in bytes (linux only), None if unavailable
+    '''
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith(field + ':'):
+                    return int(line.split()[1]) * 1024
+    except (IOError, OSError):
+        pass
+    return None
+
+def currentMemory():
+    ''' the resident memory of the process in bytes
+    '''
+    rss = readStatus('VmRSS')
+    return rss if rss is not None else 0
+
+def peakMemory():
+    ''' the peak resident memory of the process in bytes
+    '''
+    hwm = readStatus('VmHWM')
+    return hwm if hwm is not None else resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+def resetPeakMemory():
+    ''' reset the peak resident memory of the process (linux only, see /proc/self/clear_refs)
+    '''
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+    except (IOError, OSError):
+        pass
+
+def describeArray(array):
+    if hasattr(array, 'nbytes') and not isinstance(array, np.ndarray):
+        # the arrays stored in parts, as `columns.StringColumns`
+        return {'shape': list(array.shape), 'dtype': type(array).__name__, 'nbytes': int(array.nbytes)}
+    array = np.asarray(array)
+    return {'shape': list(array.shape), 'dtype': str(array.dtype), 'nbytes': int(array.nbytes)}
+
+class Stage(object):
+    ''' the metrics of a stage of the pipeline
+        Attributes :
+            * `name` : (string)
+            * `depth` : (int)
+                the number of stages it is nested in
+            * `start` : (float)
+                the wall time it started at, in seconds since the profiler started
+            * `wall`, `cpu` : (float)
+                the wall and cpu (user + system) durations in seconds
+            * `peak_rss` : (int)
+                the peak resident memory of the process during the stage, in bytes
+            * `rss_delta` : (int)
+                the resident memory at the end of the stage minus at its start, in bytes
+            * `allocated` : (int or None)
+                the memory allocated and not released during the stage according
+                to tracemalloc, None when tracemalloc is not available (python 2)
+            * `arrays` : (dict)
+                the shape, dtype and size of the arrays recorded with `record`
+            * `pid` : (int)
+                the process it ran in
+    '''
+    def __init__(self, name, depth, start):
+        self.name = name
+        self.depth = depth
+        self.start = start
+        self.pid = os.getpid()
+        self.wall = self.cpu = 0.
+        self.peak_rss = self.rss_delta = 0
+        self.allocated = None
+        self.arrays = {}
+
+    def record(self, **arrays):
+        ''' record the shape, dtype and size of arrays produced by the stage
+        '''
+        for name, array in arrays.items():
+            if array is not None:
+                self.arrays[name] = describeArray(array)
+
+    def toDict(self):
+        return {
+            'name': self.name, 'depth': self.depth, 'start': self.start, 'wall': self.wall, 'cpu': self.cpu, 'pid': self.pid,
+            'peak_rss': self.peak_rss, 'rss_delta': self.rss_delta, 'allocated': self.allocated, 'arrays': self.arrays,
+        }
+
+    @classmethod
+    def fromDict(cls, d):
+        stage = cls(d['name'], d['depth'], d['start'])
+        for key, value in d.items():
+            setattr(stage, key, value)
+        return stage
+
+class Profiler(object):
+    ''' records the metrics of the stages of a run, see `stage`
+    '''
+    def __init__(self):
+        self.origin = time.time()
+        self.stages = []
+        self.open = []
+
+    def updatePeak(self):
+        # the peak is reset at the start of each stage, the enclosing stages keep the peak seen so far
+        peak = peakMemory()
+        for stage in self.open:
+            stage.peak_rss = max(stage.peak_rss, peak)
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        self.updatePeak()
+        resetPeakMemory()
+        stage = Stage(name, len(self.open), time.time() - self.origin)
+        self.stages.append(stage)
+        self.open.append(stage)
+        rss, times = currentMemory(), os.times()
+        traced = tracemalloc.get_traced_memory()[0] if tracemalloc is not None and tracemalloc.is_tracing() else None
+        wall = time.time()
+        try:
+            yield stage
+        finally:
+            stage.wall = time.time() - wall
+            end = os.times()
+            stage.cpu = (end[0] - times[0]) + (end[1] - times[1])
+            stage.rss_delta = currentMemory() - rss
+            if traced is not None:
+                stage.allocated = tracemalloc.get_traced_memory()[0] - traced
+            self.updatePeak()
+            self.open.pop()
+
+    def writeTable(self, f=sys.stderr):
+        f.write('%-32s %9s %9s %10s %10s %10s  %s\n' % ('stage', 'wall', 'cpu', 'peak rss', 'rss delta', 'allocated', 'arrays'))
+        mb = lambda n: '%9.1fM' % (n / 1024.**2) if n is not None else '%10s' % '-'
+        for stage in self.stages:
+            arrays = ', '.join('%s %s %s' % (name, 'x'.join(str(n) for n in a['shape']), a['dtype']) for name, a in sorted(stage.arrays.items()))
+            f.write('%-32s %8.3fs %8.3fs %s %s %s  %s\n' % ('  ' * stage.depth + stage.name, stage.wall, stage.cpu,
+                    mb(stage.peak_rss), mb(stage.rss_delta), mb(stage.allocated), arrays))
+
+    def writeJSON(self, filename):
+        with open(filename, 'w') as f:
+            json.dump({'stages': [stage.toDict() for stage in self.stages]}, f, indent=1)
+
+    def writeTrace(self, filename):
+        ''' write the stages in the chrome trace event format (chrome://tracing, perfetto)
+        '''
+        events = [{
+            'name': stage.name, 'ph': 'X', 'pid': os.getpid(), 'tid': stage.pid,
+            'ts': int(stage.start * 1e6), 'dur': int(stage.wall * 1e6),
+            'args': dict((k, v) for k, v in stage.toDict().items() if k not in ('name', 'start', 'wall', 'depth', 'pid')),
+        } for stage in self.stages]
+        with open(filename, 'w') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+
+def enable():
+    ''' start recording the stages, tracemalloc is started when available
+        returns the `Profiler`
+    '''
+    global active
+    if tracemalloc is not None and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    active = Profiler()
+    return active
+
+def disable():
+    global active
+    profiler, active = active, None
+    return profiler
+
+@contextlib.contextmanager
+def stage(name):
+    ''' record a stage of the pipeline with the active profiler, ex:
+            with profiler.stage('load') as s:
+                table = loader.loadColumns(filepath)
+                s.record(table=...)
+        the stage metrics are only measured when profiling is enabled or a callback is registered
+    '''
+    if active is None and len(callbacks) == 0:
+        yield Stage(name, 0, 0.)
+        return
+    profiler = active if active is not None else Profiler()
+    with profiler.stage(name) as s:
+        yield s
+    for callback in callbacks:
+        callback(s)
@@ -0,0 +1,167 @@
+import numpy as np
+import os
+import cache
+import incremental
+import dataset
+import inference
+import loader
+import mmapreader
+import normalize
+import nullity
+import profiler
+import sampling
+import sketches
+import stats
+
+class DatasetProfile(object):
+    ''' the profile of a csv file, everything the report is drawn from
+        Attributes :
+            * `table` : (Table)
+                the typed columns of the loaded rows
+            * `features_type` : (list)
+                the type of each feature (see `dataset.types`)
+            * `heatmap` : (ndarray)
+                the values of each feature scaled between 0 and 1 (see `normalize.computeHeatmapValues`)
+            * `ranges` : (list)
+                the [min, max] of each feature, None for the features without scale (see `cache.columnRange`)
+            * `missing_counts` : (ndarray)
+                the number of missing cells of each feature, over the whole file when sampled
+            * `row_indices` : (ndarray)
+                the index in the file of each loaded row
+            * `n_rows` : (int)
+                the number of rows of the file
+    '''
+    def __init__(self, filepath, table, features_type, heatmap, ranges, missing_counts, row_indices, n_rows):
+        self.filepath = filepath
+        self.table = table
+        self.features_type = features_type
+        self.heatmap = heatmap
+        self.ranges = ranges
+        self.missing_counts = missing_counts
+        self.row_indices = row_indices
+        self.n_rows = n_rows
+
+    @property
+    def labels(self):
+        return self.table.labels
+
+    def columnSummaries(self, features=None):
+        ''' the box plot statistics of each numerical feature (see `stats.ColumnStats.summary`),
+            None for the other features. The statistics gathered while loading are reused,
+            the others are computed in a pass over the values
+            Parameters :
+                * `features` : (iterable)
+                    the indices of the features to summarize, every feature if None
+        '''
+        summaries = []
+        for j in (range(self.table.shape[1]) if features is None else features):
+            column = self.table.columns[j]
+            if self.features_type[j] != dataset.types['numerical']:
+                summaries.append(None)
+                continue
+            summaries.append((column.stats if column.stats is not None else stats.columnStats(column)).summary())
+        return summaries
+
+    def columnSketches(self):
+        ''' the `sketches.ColumnSketch` of each feature, the sketches gathered while loading
+            (over the whole file when sampled) are reused, the others are computed
+        '''
+        return [column.sketch if column.sketch is not None else sketches.columnSketch(column) for column in self.table.columns]
+
+    def distinctCount(self, j, sketch):
+        ''' the number of distinct cells of a feature, counted in its dictionary and its numbers
+            when every row is loaded and the sketch estimates at most `normalize.HIGH_CARDINALITY`
+            of them, else the estimate of the sketch (see `sketches.HyperLogLog`) bounded by the
+            number of present cells
+        '''
+        column = self.table.columns[j]
+        estimate = sketch.distinct()
+        if estimate <= normalize.HIGH_CARDINALITY and column.encoding is None and self.table.shape[0] == self.n_rows:
+            return len(column.categories) + len(np.unique(column.values[column.isNumerical()]) if column.values is not None else [])
+        return min(estimate, int(self.n_rows - self.missing_counts[j]))
+
+    def stats(self):
+        ''' the json-serializable summary of the profile, without the per-cell arrays
+            The distinct counts of the high-cardinality features are estimates (see `distinctCount`),
+            the missing patterns are the most frequent sets of missing features of the rows
+            (see `nullity.missingPatterns`)
+        '''
+        features = []
+        for j, (label, summary, sketch) in enumerate(zip(self.labels, self.columnSummaries(), self.columnSketches())):
+            distinct = self.distinctCount(j, sketch)
+            is_string = self.features_type[j] in (dataset.types['string'], dataset.types['bool'])
+            features.append({
+                'label': str(label),
+                'type': dataset.labels[self.features_type[j]],
+                'missing': int(self.missing_counts[j]),
+                'range': self.ranges[j],
+                'summary': summary,
+                'distinct': distinct,
+                'high_cardinality': is_string and distinct > normalize.HIGH_CARDINALITY,
+            })
+        return {
+            'file': self.filepath,
+            'rows': int(self.n_rows),
+            'loaded_rows': self.table.shape[0],
+            'columns': self.table.shape[1],
+            'complete_rows': int(np.sum(self.table.mask.completeRows())),
+            'missing': int(np.sum(self.missing_counts)),
+            'missing_patterns': nullity.missingPatterns(self.table.mask).top(self.labels),
+            'features': features,
+        }
+
+def profileDataset(filepath, sample=None, rows=None, seed=None, jobs=1, cache_dir=cache.CACHE_DIR, incremental_state=False):
+    ''' load, type and normalize a csv file, without plotting anything
+        Parameters :
+            * `sample` : (int)
+                only load a uniform sample of `sample` rows (see `sampling.sampleCSV`)
+            * `rows` : (slice)
+                only load a window of rows (see `mmapreader.loadRows`)
+            * `jobs` : (int)
+                the number of processes typing and normalizing the features
+            * `cache_dir` : (string)
+                the directory of the profile cache, None to not use it.
+                The cache only holds whole files
+            * `incremental_state` : (bool)
+                set to only parse the rows appended to the file since its last profile,
+                for whole files (see `incremental.refresh`)
+        returns a `DatasetProfile`
+    '''
+    if incremental_state is True and sample is None and rows is None:
+        with profiler.stage('incremental refresh') as stage:
+            state_dir = os.path.join(cache_dir, 'incremental') if cache_dir is not None else incremental.STATE_DIR
+            refreshed = incremental.refresh(filepath, state_dir)
+            if refreshed is not None:
+                stage.record(mask=refreshed[0].mask.bits, heatmap=refreshed[2])
+        if refreshed is not None:
+            table, features_type, heatmap, ranges = refreshed
+            return DatasetProfile(filepath, table, features_type, heatmap, ranges, table.mask.countPerColumn(),
+                                  np.arange(table.shape[0]), table.shape[0])
+    profile_cache = cache.ProfileCache(cache_dir) if cache_dir is not None and sample is None and rows is None else None
+    with profiler.stage('load') as stage:
+        cached = profile_cache.load(filepath) if profile_cache is not None else None
+        if cached is not None:
+            table, features_type, heatmap, ranges = cached
+            row_indices, n_rows = np.arange(table.shape[0]), table.shape[0]
+        elif sample is not None:
+            sampled = sampling.sampleCSV(filepath, sample, seed=seed, summarize=True)
+            table, row_indices, n_rows = sampled.table, sampled.indices, sampled.n_rows
+        elif rows is not None:
+            index_dir = os.path.join(cache_dir, 'rowindex') if cache_dir is not None else None
+            table, row_indices, n_rows = mmapreader.loadRows(filepath, rows, index_dir)
+        else:
+            table = loader.loadColumns(filepath, summarize=True)
+            row_indices, n_rows = np.arange(table.shape[0]), table.shape[0]
+        stage.record(mask=table.mask.bits)
+    if cached is None:
+        with profiler.stage('inference'):
+            features_type = inference.inferTable(table, jobs=jobs)
+        with profiler.stage('normalize') as stage:
+            heatmap = normalize.computeHeatmapValues(table, features_type, jobs=jobs)
+            stage.record(heatmap=heatmap)
+        ranges = [cache.columnRange(column, features_type[j]) for j, column in enumerate(table.columns)]
+        if profile_cache is not None:
+            with profiler.stage('cache store'):
+                profile_cache.store(filepath, table, features_type, heatmap)
+    missing_counts = sampled.missing_counts if cached is None and sample is not None else table.mask.countPerColumn()
+    return DatasetProfile(filepath, table, features_type, heatmap, ranges, missing_counts, row_indices, n_rows)
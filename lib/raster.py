@@ -0,0 +1,160 @@
+import numpy as np
+import struct
+import zlib
+import dataset
+import lod
+from normalize import MISSING_VALUE
+from plotly_utils import cmaps, hex2rgb
+
+# the size in pixels of the heatmap panel, the rows are averaged into HEIGHT pixels
+WIDTH = 1200
+HEIGHT = 1000
+# the width of the completeness panel and the height of the missing counts panel
+PANEL_SIZE = 60
+MARGIN = 8
+BACKGROUND = 255
+FOREGROUND = 0
+# the cells turned into pixels at once, the heatmap may hold millions of rows
+BLOCK_CELLS = 4 * 1024 * 1024
+
+# the color table of each (colormap, missing color)
+color_tables = {}
+
+def colorTable(cmap, missing_color=None):
+    ''' the colors of a colormap of `plotly_utils.cmaps` as an uint8 array of shape (n_colors, 3),
+        followed by the missing color (or the last color if None). The tables are kept
+        after their first use
+    '''
+    key = (cmap, missing_color)
+    if key not in color_tables:
+        colors = cmaps[cmap] + [cmaps[cmap][-1] if missing_color is None else missing_color]
+        color_tables[key] = np.array([hex2rgb(color) for color in colors], dtype=np.uint8)
+    return color_tables[key]
+
+def valueColors(heatmap, n_colors):
+    ''' the index in a color table of each normalized value, `n_colors` for the missing ones
+    '''
+    indices = np.rint(np.clip(heatmap, 0., 1.) * (n_colors - 1)).astype(np.intp)
+    indices[heatmap == MISSING_VALUE] = n_colors
+    return indices
+
+def typeColors(types, n_colors):
+    ''' the index in a color table of each type, `n_colors` for the missing cells
+    '''
+    n_types = len(dataset.types)
+    indices = np.rint((np.asarray(types) - 1.) / max(1, n_types - 2) * (n_colors - 1)).astype(np.intp)
+    indices[types == 0] = n_colors
+    return indices
+
+def downsampleRows(n_rows, height):
+    ''' the first row of each pixel row and the number of pixel rows of each of them, the rows
+        are averaged when they are more than `height`, repeated when they are much less
+    '''
+    starts = lod.binStarts(n_rows, height)
+    repeat = max(1, height // max(1, n_rows))
+    return starts, repeat
+
+def rasterize(cells, table, starts, shape, width):
+    ''' the colors of a matrix of color indices, its rows averaged into the bins `starts`
+        (a box filter) and its columns stretched to `width` pixels
+        Parameters :
+            * `cells` : (function)
+                returns the color indices of the rows start:stop
+            * `table` : (ndarray)
+                the color table (see `colorTable`)
+            * `shape` : (tuple)
+                the number of rows and columns of the matrix
+    '''
+    n_rows, n_columns = shape
+    ends = np.append(starts[1:], n_rows)
+    image = np.empty((len(starts), n_columns, 3), dtype=np.uint8)
+    # whole bins are read at once, about BLOCK_CELLS cells
+    bins_per_block = max(1, BLOCK_CELLS // max(1, n_columns * max(1, n_rows // len(starts))))
+    for b in range(0, len(starts), bins_per_block):
+        block = slice(b, b + bins_per_block)
+        start, stop = starts[block][0], ends[block][-1]
+        colors = table[cells(start, stop)]
+        sums = np.add.reduceat(colors, starts[block] - start, axis=0, dtype=np.uint32)
+        sizes = (ends[block] - starts[block])[:,None,None]
+        image[block] = (sums + sizes // 2) // sizes
+    cell_width = max(1, width // max(1, n_columns))
+    return np.repeat(image, cell_width, axis=1)
+
+def barPanel(lengths, size, vertical=False):
+    ''' bars of `lengths` pixels (at most `size`), one per pixel row, or per pixel column if
+        `vertical`, drawn in `FOREGROUND` over `BACKGROUND`
+    '''
+    lengths = np.rint(np.asarray(lengths, dtype=float)).astype(np.intp)
+    filled = np.arange(size)[None,:] < lengths[:,None]
+    if vertical:
+        # the bars of the columns grow upwards from the bottom of the panel
+        filled = filled.T[::-1]
+    panel = np.where(filled, FOREGROUND, BACKGROUND).astype(np.uint8)
+    return np.repeat(panel[:,:,None], 3, axis=2)
+
+def scaleLengths(values, size, low=0):
+    ''' the length in pixels of a bar of each value, the greatest value filling `size` pixels
+        and the values down to `low` a single pixel
+    '''
+    values = np.asarray(values, dtype=float)
+    top = values.max() if len(values) > 0 else low
+    if top <= low:
+        return np.where(values > low, size, 0)
+    return np.where(values >= low, (values - low) * (size - 1) / (top - low) + 1, 0)
+
+def renderImage(heatmap, types, completeness, missing_counts, cmap='viridis', missing_color=None, plot='values',
+                width=WIDTH, height=HEIGHT):
+    ''' draw the report of a dataset as an RGB image, without plotly: the heatmap of the
+        values (or of the types with `plot`='types'), the completeness of each row on its
+        right and the number of missing cells of each feature below it
+        Parameters :
+            * `heatmap` : (ndarray)
+                the normalized values (see `normalize.computeHeatmapValues`)
+            * `types` : (ndarray)
+                the type of each cell, 0 for the missing cells
+            * `completeness` : (ndarray)
+                the number of present features of each row
+            * `missing_counts` : (ndarray)
+                the number of missing cells of each feature
+        returns an uint8 array of shape (image height, image width, 3), the heatmap panel
+        being about `width` x `height` pixels
+    '''
+    table = colorTable(cmap, missing_color)
+    n_colors = len(table) - 1
+    n_rows = heatmap.shape[0]
+    if plot == 'types':
+        cells = lambda start, stop: typeColors(types[start:stop], n_colors)
+    else:
+        cells = lambda start, stop: valueColors(heatmap[start:stop], n_colors)
+    starts, repeat = downsampleRows(n_rows, height)
+    main = np.repeat(rasterize(cells, table, starts, heatmap.shape, width), repeat, axis=0)
+    # the completeness panel, averaged over the rows of each pixel row
+    sizes = np.diff(np.append(starts, n_rows))
+    present = np.add.reduceat(np.asarray(completeness, dtype=float), starts) / sizes
+    # the bars start at the least complete row, as the completeness axis of the report
+    right = np.repeat(barPanel(scaleLengths(present, PANEL_SIZE, low=present.min() - 0.05), PANEL_SIZE), repeat, axis=0)
+    # the missing counts panel, a bar per feature as wide as its column
+    cell_width = main.shape[1] // max(1, len(missing_counts))
+    bottom = np.repeat(barPanel(scaleLengths(missing_counts, PANEL_SIZE), PANEL_SIZE, vertical=True), cell_width, axis=1)
+    image = np.full((main.shape[0] + bottom.shape[0] + 3 * MARGIN, main.shape[1] + right.shape[1] + 3 * MARGIN, 3), BACKGROUND, dtype=np.uint8)
+    image[MARGIN:MARGIN+main.shape[0], MARGIN:MARGIN+main.shape[1]] = main
+    image[MARGIN:MARGIN+right.shape[0], 2*MARGIN+main.shape[1]:2*MARGIN+main.shape[1]+right.shape[1]] = right
+    image[2*MARGIN+main.shape[0]:2*MARGIN+main.shape[0]+bottom.shape[0], MARGIN:MARGIN+bottom.shape[1]] = bottom
+    return image
+
+def pngChunk(kind, data):
+    return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data) & 0xffffffff)
+
+def writePNG(filename, image):
+    ''' write an RGB image (an uint8 array of shape (height, width, 3)) as a PNG file
+    '''
+    height, width = image.shape[:2]
+    # each row of pixels starts with its filter type, 0 for none
+    raw = np.zeros((height, 1 + width * 3), dtype=np.uint8)
+    raw[:,1:] = image.reshape(height, width * 3)
+    header = struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)
+    with open(filename, 'wb') as f:
+        f.write(b'\x89PNG\r\n\x1a\n')
+        f.write(pngChunk(b'IHDR', header))
+        f.write(pngChunk(b'IDAT', zlib.compress(raw.tobytes(), 6)))
+        f.write(pngChunk(b'IEND', b''))
@@ -0,0 +1,66 @@
+import numpy as np
+import dataset
+import loader
+import sketches
+
+class Sample(object):
+    ''' a uniform sample of the rows of a csv file
+        Attributes :
+            * `table` : (Table)
+                the sampled rows as typed columns, in the order of the file
+            * `indices` : (ndarray)
+                the index of each sampled row in the file
+            * `missing_counts` : (ndarray)
+                the exact number of missing values of each feature over the whole file
+            * `sketches` : (list)
+                the `sketches.ColumnSketch` of each feature over the whole file, also set
+                as the `sketch` of the sampled columns, empty when not gathered
+            * `n_rows` : (int)
+                the number of rows of the file
+    '''
+    def __init__(self, table, indices, missing_counts, sketches, n_rows):
+        self.table = table
+        self.indices = indices
+        self.missing_counts = missing_counts
+        self.sketches = sketches
+        self.n_rows = n_rows
+
+def sampleCSV(filepath, n, chunk_size=loader.CHUNK_SIZE, seed=None, summarize=False):
+    ''' reservoir sample `n` rows of a csv file in a single sequential read,
+        the memory used is bounded by `n` rows and one chunk. With `summarize` set, the
+        cells of every chunk are added to the sketches of the features, the chunks of
+        numbers by value and the others as the strings read (a number written in two
+        ways counts twice)
+        returns a `Sample`
+    '''
+    labels, _ = loader.readLabels(filepath)
+    random = np.random.RandomState(seed)
+    reservoir = np.empty((n, len(labels)), dtype=object)
+    indices = np.empty(n, dtype=np.int64)
+    missing_counts = np.zeros(len(labels), dtype=np.int64)
+    column_sketches = [sketches.ColumnSketch() for _ in labels] if summarize else []
+    seen = 0
+    for chunk in loader.iterCSVChunks(filepath, chunk_size):
+        missing = np.isin(chunk, dataset.missing_labels)
+        missing_counts += np.count_nonzero(missing, axis=0)
+        for j, sketch in enumerate(column_sketches):
+            sketch.addCells(chunk[~missing[:,j],j])
+        rows = np.arange(seen, seen + len(chunk))
+        # fill the reservoir first, then row i replaces a random slot with probability n / (i + 1)
+        fill = rows < n
+        reservoir[rows[fill]] = chunk[fill]
+        indices[rows[fill]] = rows[fill]
+        slots = (random.random_sample(len(chunk)) * (rows + 1)).astype(np.int64)
+        replace = ~fill & (slots < n)
+        # when a slot is drawn several times in the chunk, the last row drawn wins
+        slots, last = np.unique(slots[replace][::-1], return_index=True)
+        taken = np.flatnonzero(replace)[::-1][last]
+        reservoir[slots] = chunk[taken]
+        indices[slots] = rows[taken]
+        seen += len(chunk)
+    size = min(n, seen)
+    order = np.argsort(indices[:size])
+    table = loader.buildTable(labels, [reservoir[:size][order]])
+    for column, sketch in zip(table.columns, column_sketches):
+        column.sketch = sketch
+    return Sample(table, indices[:size][order], missing_counts, column_sketches, seen)
@@ -0,0 +1,295 @@
+import numpy as np
+import json
+import re
+import sys
+import webbrowser
+try:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+except ImportError:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+import dataset
+import profiler
+import sorting
+import tiles
+import utils
+import wide
+import plotly_utils as pyUtils
+from normalize import MISSING_VALUE
+
+DEFAULT_PORT = 8050
+# the page switches to a finer level once the viewport shows less than SCREEN_ROWS bins of it
+SCREEN_ROWS = 2048
+
+class TileSource(object):
+    ''' the tiles of a profiled dataset, encoded and kept in a `tiles.TileCache`
+        Parameters :
+            * `profile` : (DatasetProfile)
+                the profiled dataset, its arrays may be memory-mapped (see `cache.readEntry`)
+            * `sort` : (list)
+                the labels to sort the rows by, see `sorting.sortPermutation`
+            * `reducer` : (string)
+                the summary of the aggregated rows, see `lod.aggregateRows`
+    '''
+    def __init__(self, profile, sort=None, reducer='mean', cache_size=tiles.TILE_CACHE_SIZE):
+        self.profile = profile
+        table = profile.table
+        heatmap = profile.heatmap
+        with profiler.stage('cell types'):
+            types = tiles.cellTypes(table, profile.features_type)
+            completeness = table.shape[1] - table.mask.countPerRow()
+        self.order = None
+        if sort is not None:
+            with profiler.stage('sort') as stage:
+                self.order = sorting.sortPermutation(heatmap, table.labels, sort)
+                stage.record(order=self.order)
+        with profiler.stage('pyramid') as stage:
+            # the rows are permuted by blocks while the first level is built, see `tiles.Pyramid`
+            self.pyramid = tiles.Pyramid(heatmap, types, completeness, profile.features_type, reducer=reducer, order=self.order)
+            stage.record(**dict(('level_%d' % k, level.summary) for k, level in enumerate(self.pyramid.levels) if level is not None))
+        self.cache = tiles.TileCache(self.encodedTile, cache_size)
+
+    def encodedTile(self, level, index):
+        tile = self.pyramid.tile(level, index)
+        if level == 0:
+            # the rows of the file and their raw values, for the hover labels
+            stop = tile['start'] + len(tile['heatmap'])
+            rows = np.arange(tile['start'], stop) if self.order is None else self.order[tile['start']:stop]
+            tile['rows'] = np.asarray(self.profile.row_indices)[rows]
+            tile['text'] = np.stack([column.strings(rows) for column in self.profile.table.columns], axis=1) \
+                if len(rows) > 0 else np.empty((0, self.profile.table.shape[1]), dtype=object)
+        return tiles.encodeTile(tile)
+
+    def meta(self, cmap, missing_color):
+        ''' the json of the figure without its heatmaps, and of the levels of the pyramid
+        '''
+        profile, pyramid = self.profile, self.pyramid
+        labels = [str(label) for label in profile.labels]
+        has_missing = profile.table.hasMissingValues()
+        colorscale = pyUtils.makeColorScale(pyUtils.cmaps[cmap])
+        if has_missing:
+            colorscale = pyUtils.appendColorToScale(colorscale, missing_color, p=0.001)
+        n_rows, n_features = pyramid.n_rows, pyramid.n_features
+        x = list(range(n_features))
+        # the labelled features, thinned to what fits
+        ticks = [int(j) for j in wide.tickIndices(n_features)]
+        missing_counts = [int(profile.missing_counts[j]) for j in ticks]
+        colorbar = dict(x=1., y=0.15, len=0.85, thicknessmode='fraction', thickness=0.025, xpad=8, ypad=0,
+                        xanchor='left', yanchor='bottom', ticks='inside', titleside='right', outlinewidth=0.5)
+        data = [
+            dict(type='heatmap', x=x, y=[], z=[], colorscale=colorscale, zmin=0, zmax=MISSING_VALUE if has_missing else 1,
+                 colorbar=dict(colorbar, ticklen=5, title='Raw values (Feature-relative scale)'), hoverinfo='none'),
+            dict(type='heatmap', visible=False, x=x, y=[], z=[], colorscale=colorscale, zmin=0,
+                 zmax=len(dataset.types)-1+(.01 if has_missing else 0),
+                 colorbar=dict(colorbar, ticklen=0, showticklabels=False, title='Values type (Missing, Numerical, String, Date, Boolean)'),
+                 hoverinfo='none'),
+            dict(type='scatter', x=[], y=[], mode='lines', hoverinfo='x+y', showlegend=False,
+                 line={'color': '#000000', 'shape': 'vhv', 'width': 1}, xaxis='x2', yaxis='y'),
+            dict(type='scatter', x=x, y=[0] * n_features, mode='lines', hoverinfo='skip', showlegend=False, xaxis='x3', yaxis='y3'),
+        ]
+        layout = dict(
+            margin=dict(l=60, r=80, t=90, b=30),
+            xaxis=dict(domain=[0, 0.955], tickangle=20, ticktext=[labels[j] for j in ticks], tickvals=ticks, ticklen=5, showgrid=False,
+                       zeroline=False, side='top', fixedrange=True),
+            yaxis=dict(title='Indices', domain=[0.15, 1], range=[n_rows-0.5, -0.5], autorange=False,
+                       showgrid=False, zeroline=False),
+            xaxis2=dict(title='Data<br>Completeness', titlefont=dict(size=11), tickfont=dict(size=11), domain=[0.96, 1],
+                        range=[-0.05, n_features+0.05], ticklen=3, showgrid=False, zeroline=False, fixedrange=True, side='top'),
+            xaxis3=dict(title='Missing values (per feature)', titlefont=dict(size=11, color='#505050'),
+                        tickfont=dict(size=10, color='#505050'), range=[-0.5, n_features-0.5], tickvals=ticks,
+                        ticktext=missing_counts, ticklen=1, showgrid=False, zeroline=False, fixedrange=True, overlaying='x'),
+            yaxis3=dict(domain=[0.12, 0.15], range=[1, 2], showticklabels=False, showgrid=False, zeroline=False, fixedrange=True),
+            updatemenus=[
+                dict(buttons=pyUtils.makeColorscaleButtons(pyUtils.cmaps, add_missing=missing_color if has_missing else None),
+                     type='dropdown', direction='left', active=list(pyUtils.cmaps.keys()).index(cmap), pad={'t': 7},
+                     showactive=True, x=.96, y=0.04, xanchor='left', yanchor='top', borderwidth=0.5),
+                dict(buttons=[dict(args=['visible', [True, False, True, True]], label='Features repartition', method='restyle'),
+                              dict(args=['visible', [False, True, True, True]], label='Data type', method='restyle')],
+                     type='dropdown', direction='left', active=0, showactive=True, pad={'t': 4},
+                     x=0.96, y=0.09, xanchor='left', yanchor='top', borderwidth=0.5),
+            ],
+        )
+        return json.dumps({
+            'figure': {'data': data, 'layout': layout},
+            'labels': labels,
+            'type_labels': [dataset.labels[t] for t in sorted(dataset.labels)],
+            'n_rows': n_rows,
+            'tile_rows': pyramid.tile_rows,
+            'levels': [pyramid.binSize(k) for k in range(len(pyramid.levels))],
+            'screen_rows': SCREEN_ROWS,
+        }).encode('utf-8')
+
+PAGE = '''<html><head><meta charset="utf-8" /><title>%(title)s</title></head><body>
+<script type="text/javascript" src="/plotly.js"></script>
+<div id="csv-plot" style="height: 100%%; width: 100%%;" class="plotly-graph-div"></div>
+<script type="text/javascript">%(script)s</script>
+</body></html>'''
+
+VIEWPORT_SCRIPT = '''
+(function() {
+    var TYPES = {uint8: Uint8Array, uint16: Uint16Array, uint32: Uint32Array, float32: Float32Array, float64: Float64Array};
+    var MAX_TILES = 64;
+    var gd = document.getElementById('csv-plot');
+    var json = function(url) { return fetch(url).then(function(response) { return response.json(); }); };
+    var values = function(encoded) {
+        var s = atob(encoded.data), a = new Uint8Array(s.length);
+        for (var i = 0; i < s.length; i++) a[i] = s.charCodeAt(i);
+        return new TYPES[encoded.dtype](a.buffer);
+    };
+    var rows = function(encoded) {
+        var flat = values(encoded), shape = encoded.shape, out = new Array(shape[0]);
+        if (shape.length === 1) return Array.prototype.slice.call(flat);
+        for (var i = 0; i < shape[0]; i++) out[i] = Array.prototype.slice.call(flat, i * shape[1], (i + 1) * shape[1]);
+        return out;
+    };
+    var strings = function(encoded) {
+        var columns = encoded.columns.map(function(column) {
+            var codes = values(column.codes);
+            return Array.prototype.map.call(codes, function(code) { return column.table[code]; });
+        });
+        var out = new Array(encoded.shape[0]);
+        for (var i = 0; i < out.length; i++) out[i] = columns.map(function(column) { return column[i]; });
+        return out;
+    };
+    // the tiles fetched last, as promises of their decoded arrays
+    var tiles = {}, keys = [];
+    var tile = function(level, index) {
+        var key = level + '/' + index;
+        if (tiles[key] === undefined) {
+            tiles[key] = json('/tile/' + key).then(function(t) {
+                var decoded = {start: t.start, size: t.size, z: rows(t.heatmap), types: rows(t.types), missing: rows(t.missing),
+                               completeness: rows(t.completeness)};
+                if (t.text !== undefined) { decoded.text = strings(t.text); decoded.rows = rows(t.rows); }
+                return decoded;
+            });
+            keys.push(key);
+            if (keys.length > MAX_TILES) delete tiles[keys.shift()];
+        }
+        return tiles[key];
+    };
+    json('/meta').then(function(meta) {
+        var request = 0, view = null;
+        var update = function(range) {
+            var lo = Math.min(Math.max(0, Math.floor(Math.min(range[0], range[1]))), Math.max(0, meta.n_rows - 1)),
+                hi = Math.max(lo + 1, Math.min(meta.n_rows, Math.ceil(Math.max(range[0], range[1])) + 1));
+            var level = meta.levels.length - 1;
+            while (level > 0 && (hi - lo) / meta.levels[level - 1] <= meta.screen_rows) level--;
+            var span = meta.levels[level] * meta.tile_rows, pending = [];
+            for (var t = Math.floor(lo / span); t <= Math.floor(Math.max(lo, hi - 1) / span); t++) pending.push(tile(level, t));
+            var id = ++request;
+            return Promise.all(pending).then(function(parts) {
+                if (id !== request) return;
+                var next = {level: level, y: [], z: [], types: [], missing: [], completeness: [], start: [], size: [], text: [], rows: []};
+                parts.forEach(function(part) {
+                    for (var i = 0; i < part.z.length; i++) {
+                        var start = part.start + i * part.size, size = Math.min(part.size, meta.n_rows - start);
+                        next.y.push(start + (size - 1) / 2);
+                        next.start.push(start);
+                        next.size.push(size);
+                    }
+                    ['z', 'types', 'missing', 'completeness', 'text', 'rows'].forEach(function(key) {
+                        if (part[key] !== undefined) Array.prototype.push.apply(next[key], part[key]);
+                    });
+                });
+                view = next;
+                return Plotly.restyle(gd, {y: [view.y, view.y], z: [view.z, view.types]}, [0, 1]).then(function() {
+                    return Plotly.restyle(gd, {x: [view.completeness], y: [view.y]}, [2]);
+                });
+            });
+        };
+        var tip = document.createElement('div');
+        tip.style.cssText = 'position: fixed; display: none; pointer-events: none; z-index: 1000; padding: 4px 6px; ' +
+            'font: 12px sans-serif; color: #ffffff; background: #424242; border-radius: 2px; white-space: nowrap;';
+        document.body.appendChild(tip);
+        return Plotly.newPlot(gd, meta.figure.data, meta.figure.layout, {showLink: false}).then(function() {
+            window.addEventListener('resize', function() { Plotly.Plots.resize(gd); });
+            gd.on('plotly_relayout', function(e) {
+                if (e['yaxis.range[0]'] !== undefined || e['yaxis.range'] !== undefined || e['yaxis.autorange'] !== undefined)
+                    update(gd.layout.yaxis.range);
+            });
+            gd.on('plotly_hover', function(e) {
+                var point = e.points[0];
+                if (point.curveNumber > 1 || view === null) return;
+                var i = point.pointNumber[0], j = point.pointNumber[1], lines;
+                if (point.curveNumber === 1) lines = [meta.labels[j], meta.type_labels[view.types[i][j]]];
+                else if (view.level === 0) lines = [meta.labels[j], 'row: ' + view.rows[i], view.text[i][j]];
+                else lines = [meta.labels[j], 'rows ' + view.start[i] + '-' + (view.start[i] + view.size[i] - 1),
+                              'missing: ' + Math.round(view.missing[i][j] * 100) + '%'];
+                tip.innerHTML = '';
+                lines.forEach(function(line, k) {
+                    if (k > 0) tip.appendChild(document.createElement('br'));
+                    tip.appendChild(document.createTextNode(line));
+                });
+                tip.style.left = (e.event.clientX + 12) + 'px';
+                tip.style.top = (e.event.clientY + 12) + 'px';
+                tip.style.display = 'block';
+            });
+            gd.on('plotly_unhover', function() { tip.style.display = 'none'; });
+            return update(gd.layout.yaxis.range);
+        });
+    });
+})();
+'''
+
+def makeHandler(source, meta, page):
+    ''' the request handler class serving the page, the meta data and the tiles of a `TileSource`
+    '''
+    class TileHandler(BaseHTTPRequestHandler):
+        plotlyjs = []
+
+        def send(self, body, content_type, status=200):
+            self.send_response(status)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            path = self.path.split('?')[0]
+            tile = re.match(r'^/tile/(\d+)/(\d+)$', path)
+            if path == '/':
+                self.send(page, 'text/html; charset=utf-8')
+            elif path == '/meta':
+                self.send(meta, 'application/json')
+            elif path == '/plotly.js':
+                if len(self.plotlyjs) == 0:
+                    # plotly is only imported once the page asks for plotly.js
+                    import plotly.offline.offline as pyOffline
+                    self.plotlyjs.append(pyOffline.get_plotlyjs().encode('utf-8'))
+                self.send(self.plotlyjs[0], 'application/javascript')
+            elif tile is not None:
+                try:
+                    body = source.cache.get(int(tile.group(1)), int(tile.group(2)))
+                except IndexError as e:
+                    return self.send(str(e).encode('utf-8'), 'text/plain', status=404)
+                self.send(body, 'application/json')
+            else:
+                self.send(b'not found', 'text/plain', status=404)
+
+        def log_message(self, format, *args):
+            pass
+
+    return TileHandler
+
+class ThreadingServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+def serve(profile, port=DEFAULT_PORT, cmap='viridis', missing_color='#424242', sort=None, reducer='mean', auto_open=True):
+    ''' serve the heatmaps of a profiled dataset on http://localhost:`port`/, the page only fetches
+        the tiles of the rows in view, aggregated into bins when more rows are in view than
+        the screen holds (see `tiles.Pyramid`)
+    '''
+    source = TileSource(profile, sort=sort, reducer=reducer)
+    page = (PAGE % {'title': utils.escapeHTML(profile.filepath), 'script': VIEWPORT_SCRIPT}).encode('utf-8')
+    httpd = ThreadingServer(('localhost', port), makeHandler(source, source.meta(cmap, missing_color), page))
+    url = 'http://localhost:%d/' % httpd.server_address[1]
+    sys.stderr.write('serving %s on %s (ctrl-c to stop)\n' % (profile.filepath, url))
+    if auto_open:
+        webbrowser.open(url)
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
@@ -0,0 +1,181 @@
+import numpy as np
+import collections
+import hashlib
+
+# the number of registers of a HyperLogLog is 2**HLL_PRECISION, its relative error is
+# about 1.04 / sqrt(2**HLL_PRECISION) (1.6%)
+HLL_PRECISION = 12
+# the number of counters of a Space-Saving summary, the counts of the values more frequent
+# than 1 / TOP_CAPACITY of the stream are kept
+TOP_CAPACITY = 256
+BLOCK_SIZE = 65536
+
+def hashStrings(strings):
+    ''' the 64 bits hash of each string (the first bytes of its md5), the same in every process
+    '''
+    if len(strings) == 0:
+        return np.empty(0, dtype=np.uint64)
+    digests = b''.join([hashlib.md5(s if isinstance(s, bytes) else s.encode('utf-8')).digest()[:8] for s in strings])
+    return np.frombuffer(digests, dtype='<u8').astype(np.uint64)
+
+def hashNumbers(values):
+    ''' the 64 bits hash of each number (the splitmix64 finalizer of its bits), 0. and -0. hash the same
+    '''
+    z = (np.asarray(values, dtype=np.float64) + 0.).view(np.uint64)
+    with np.errstate(over='ignore'):
+        z = z + np.uint64(0x9E3779B97F4A7C15)
+        z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return z ^ (z >> np.uint64(31))
+
+class HyperLogLog(object):
+    ''' an estimate of the number of distinct values of a stream, in 2**`precision` bytes
+        whatever the number of values. Two estimates merge into the estimate of both streams
+    '''
+    def __init__(self, precision=HLL_PRECISION):
+        self.precision = precision
+        self.registers = np.zeros(2**precision, dtype=np.uint8)
+
+    def update(self, hashes):
+        ''' add values by their 64 bits hashes (see `hashStrings`, `hashNumbers`)
+        '''
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        if len(hashes) == 0:
+            return
+        width = 64 - self.precision
+        index = (hashes >> np.uint64(width)).astype(np.int64)
+        rest = hashes & np.uint64(2**width - 1)
+        # the position of the first set bit of the rest, width + 1 when it is 0
+        rank = width + 1 - np.searchsorted(2**np.arange(width, dtype=np.uint64), rest, side='right')
+        np.maximum.at(self.registers, index, rank.astype(np.uint8))
+
+    def merge(self, other):
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def estimate(self):
+        m = float(len(self.registers))
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / np.sum(2.**-self.registers.astype(float))
+        zeros = np.count_nonzero(self.registers == 0)
+        if estimate <= 2.5 * m and zeros > 0:
+            # linear counting is more accurate for the small cardinalities
+            estimate = m * np.log(m / zeros)
+        return int(round(estimate))
+
+class SpaceSaving(object):
+    ''' the most frequent values of a stream and their counts, in `capacity` counters whatever
+        the number of distinct values (the Space-Saving summary, updated by batches of counted
+        values and merged as in the mergeable summaries of Agarwal et al.)
+        A count is an over-estimate by at most `floor`, the number of times a value which
+        is not kept may have been seen
+    '''
+    def __init__(self, capacity=TOP_CAPACITY):
+        self.capacity = capacity
+        self.keys = np.empty(0, dtype=np.uint64)
+        self.counts = np.empty(0, dtype=np.int64)
+        self.names = {}
+        self.floor = 0
+
+    def update(self, keys, counts, names=None, floor=0):
+        ''' add the distinct values `keys` (64 bits hashes) seen `counts` times, `names` being
+            the values themselves (kept for the values which are kept)
+        '''
+        keys = np.asarray(keys, dtype=np.uint64)
+        counts = np.asarray(counts, dtype=np.int64)
+        if len(keys) == 0:
+            return
+        merged, inverse = np.unique(np.concatenate([self.keys, keys]), return_inverse=True)
+        # a value missing from one of the summaries may have been seen up to its floor
+        totals = np.zeros(len(merged), dtype=np.int64)
+        in_self = np.zeros(len(merged), dtype=bool)
+        in_self[inverse[:len(self.keys)]] = True
+        in_other = np.zeros(len(merged), dtype=bool)
+        in_other[inverse[len(self.keys):]] = True
+        np.add.at(totals, inverse, np.concatenate([self.counts, counts]))
+        totals[~in_self] += self.floor
+        totals[~in_other] += floor
+        floor = self.floor + floor
+        if len(merged) > self.capacity:
+            order = np.argsort(-totals, kind='mergesort')
+            floor = max(floor, int(totals[order[self.capacity]]))
+            kept = np.sort(order[:self.capacity])
+            merged, totals = merged[kept], totals[kept]
+        if names is not None:
+            for key, name in zip(keys, names):
+                self.names[int(key)] = name
+        self.names = dict((int(key), self.names[int(key)]) for key in merged if int(key) in self.names)
+        self.keys, self.counts, self.floor = merged, totals, floor
+
+    def merge(self, other):
+        names = [other.names.get(int(key)) for key in other.keys]
+        self.update(other.keys, other.counts, names, other.floor)
+        return self
+
+    def mostCommon(self, k):
+        ''' the `k` most frequent values as a list of (name, count), the values without name
+            (added as hashes only) are left out
+        '''
+        order = np.argsort(-self.counts, kind='mergesort')
+        common = [(self.names[int(self.keys[i])], int(self.counts[i])) for i in order if int(self.keys[i]) in self.names]
+        return common[:k]
+
+class ColumnSketch(object):
+    ''' the distinct count (`HyperLogLog`) and the most frequent strings (`SpaceSaving`) of
+        the cells of a feature, in a bounded memory. Sketches of parts of a feature (chunks,
+        workers) merge into the sketch of the feature
+    '''
+    def __init__(self):
+        self.hll = HyperLogLog()
+        self.top = SpaceSaving()
+
+    def addStrings(self, strings, counts, hashes=None):
+        ''' add the distinct strings of a chunk and the number of cells holding each
+        '''
+        hashes = hashStrings(strings) if hashes is None else hashes
+        self.hll.update(hashes)
+        self.top.update(hashes, counts, strings)
+
+    def addCells(self, strings):
+        ''' add the present cells of a chunk of strings, as numbers when every cell is one
+        '''
+        try:
+            values = strings.astype(float)
+            is_numerical = not np.any(np.isnan(values))
+        except ValueError:
+            is_numerical = False
+        if is_numerical:
+            self.addNumbers(values)
+        else:
+            # counted in a dictionary, sorting the objects is slower
+            counts = collections.Counter(strings)
+            self.addStrings(list(counts.keys()), list(counts.values()))
+
+    def addNumbers(self, values):
+        ''' add the numerical cells of a chunk, to the distinct count only
+        '''
+        self.hll.update(hashNumbers(values))
+
+    def merge(self, other):
+        self.hll.merge(other.hll)
+        self.top.merge(other.top)
+        return self
+
+    def distinct(self):
+        return self.hll.estimate()
+
+def columnSketch(column, block_size=BLOCK_SIZE):
+    ''' the `ColumnSketch` of a `columns.Column` already loaded, read by blocks of rows
+    '''
+    sketch = ColumnSketch()
+    hashes = hashStrings(column.categories)
+    for start in range(0, len(column), block_size):
+        if column.values is not None:
+            values = column.values[start:start+block_size]
+            sketch.addNumbers(values[~np.isnan(values)])
+        if column.codes is not None:
+            codes = column.codes[start:start+block_size]
+            counts = np.bincount(codes[codes >= 0], minlength=len(column.categories))
+            seen = np.flatnonzero(counts)
+            sketch.addStrings([column.categories[i] for i in seen], counts[seen], hashes[seen])
+    return sketch
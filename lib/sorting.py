@@ -0,0 +1,66 @@
+import numpy as np
+import json
+
+def sortKeys(labels, sort_labels):
+    ''' the column indices of the known labels of `sort_labels`, in order
+    '''
+    labels = list(labels)
+    return [labels.index(label) for label in sort_labels if label in labels]
+
+def sortPermutation(heatmap, labels, sort_labels):
+    ''' return the permutation of the rows sorting the heatmap by decreasing values of the
+        feature `sort_labels[0]`, then of `sort_labels[1]` for the equal values, and so on.
+        The sort is stable, equal rows keep their order
+    '''
+    columns = sortKeys(labels, sort_labels)
+    if len(columns) == 0:
+        return np.arange(heatmap.shape[0])
+    # lexsort sorts by its last key first
+    return np.lexsort([-heatmap[:,j] for j in reversed(columns)])
+
+def buttonSortLabels(sort_labels):
+    ''' the sort keys of the button of each label: the label first, then the other labels in order
+    '''
+    return [[label] + [other for other in sort_labels if other != label] for label in sort_labels]
+
+def relativePermutation(permutation, displayed):
+    ''' express a permutation of the original rows in terms of the rows as displayed,
+        `displayed` being the permutation the figure was built with
+    '''
+    return np.argsort(displayed)[permutation]
+
+def sortButtonsScript(permutations, traces_z=(0, 1), traces_x=(2,)):
+    ''' javascript applying a row permutation when a sort button (of method 'skip') is clicked,
+        the permutation is kept in `gd.csvPlotOrder` (see `hover.hoverScript`)
+        Parameters :
+            * `permutations` : (dict)
+                the permutation of the displayed rows of each button label
+            * `traces_z` : (iterable)
+                the heatmap traces whose `z` and `text` rows are permuted
+            * `traces_x` : (iterable)
+                the scatter traces whose `x` values are permuted
+    '''
+    return '''
+(function() {
+    var permutations = %s;
+    var gd = document.getElementsByClassName('plotly-graph-div')[0];
+    var tracesZ = %s, tracesX = %s, base = {};
+    var take = function(rows, order) { return rows ? order.map(function(i) { return rows[i]; }) : rows; };
+    gd.on('plotly_buttonclicked', function(e) {
+        var order = permutations[e.button.label];
+        if (order === undefined) return;
+        if (base.z === undefined) {
+            base.z = tracesZ.map(function(t) { return gd.data[t].z; });
+            base.text = tracesZ.map(function(t) { return gd.data[t].text; });
+            base.x = tracesX.map(function(t) { return gd.data[t].x; });
+        }
+        var update = {z: base.z.map(function(z) { return take(z, order); })};
+        if (base.text.some(function(text) { return text !== undefined; }))
+            update.text = base.text.map(function(text) { return take(text, order); });
+        // the displayed rows, looked up by the hover script
+        gd.csvPlotOrder = order;
+        Plotly.restyle(gd, update, tracesZ);
+        Plotly.restyle(gd, {x: base.x.map(function(x) { return take(x, order); })}, tracesX);
+    });
+})();
+''' % (json.dumps(dict((label, [int(i) for i in p]) for label, p in permutations.items())), json.dumps(list(traces_z)), json.dumps(list(traces_x)))
@@ -0,0 +1,159 @@
+import numpy as np
+
+# the number of items of the top level of a quantile sketch, the rank error of the
+# quantiles is about 1.7 / SKETCH_SIZE
+SKETCH_SIZE = 256
+BLOCK_SIZE = 65536
+# the whiskers of the box plots reach the furthest value within WHISKER_IQR interquartile
+# ranges of the quartiles, as plotly does
+WHISKER_IQR = 1.5
+
+class QuantileSketch(object):
+    ''' a mergeable summary of the distribution of a stream of values (a KLL sketch), holding
+        a few hundred values whatever the length of the stream
+        The values are kept in levels, a value of the level h standing for 2**h values of
+        the stream. A full level is sorted and every other value is moved to the level above
+    '''
+    def __init__(self, k=SKETCH_SIZE, seed=0):
+        self.k = k
+        self.levels = [np.empty(0)]
+        self.count = 0
+        self.random = np.random.RandomState(seed)
+
+    def capacity(self, level):
+        # the levels below the top one hold geometrically less values
+        depth = len(self.levels) - level - 1
+        return max(2, int(np.ceil(self.k * (2. / 3) ** depth)))
+
+    def update(self, values):
+        values = np.asarray(values, dtype=float)
+        if len(values) == 0:
+            return
+        self.count += len(values)
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self.compress()
+
+    def merge(self, other):
+        ''' add the values summarized by another sketch
+        '''
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for h, items in enumerate(other.levels):
+            self.levels[h] = np.concatenate([self.levels[h], items])
+        self.count += other.count
+        self.compress()
+        return self
+
+    def compress(self):
+        level = 0
+        while level < len(self.levels):
+            items = self.levels[level]
+            if len(items) <= self.capacity(level):
+                level += 1
+                continue
+            if level + 1 == len(self.levels):
+                self.levels.append(np.empty(0))
+            items = np.sort(items)
+            # an odd value stays on its level, the others are halved with a random offset
+            odd = len(items) % 2
+            self.levels[level] = items[:odd]
+            promoted = items[odd + self.random.randint(2)::2]
+            self.levels[level + 1] = np.concatenate([self.levels[level + 1], promoted])
+            # adding a level shrinks the capacity of the levels below, check again from the bottom
+            level = 0
+
+    def weighted(self):
+        ''' the values of the sketch, sorted, and the number of values of the stream each stands for
+        '''
+        items = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(level), 2.**h) for h, level in enumerate(self.levels)])
+        order = np.argsort(items, kind='mergesort')
+        return items[order], weights[order]
+
+    def quantiles(self, qs):
+        ''' the values at the quantiles `qs` (between 0 and 1), exact (linearly interpolated as
+            `np.percentile`) as long as no value was dropped, nan for an empty sketch
+        '''
+        qs = np.asarray(qs, dtype=float)
+        if self.count == 0:
+            return np.full(qs.shape, np.nan)
+        if len(self.levels) == 1:
+            return np.percentile(self.levels[0], qs * 100)
+        items, weights = self.weighted()
+        ranks = np.cumsum(weights) - weights / 2
+        return np.interp(qs * weights.sum(), ranks, items)
+
+class ColumnStats(object):
+    ''' one pass summary statistics of a stream of numbers: count, mean and variance
+        (Welford, merged by chunks), minimum, maximum and a `QuantileSketch`.
+        The chunks may come from the csv loader (see `loader.ColumnBuilder`) and two
+        summaries of parts of a column merge into the summary of the column
+    '''
+    def __init__(self, k=SKETCH_SIZE):
+        self.count = 0
+        self.mean = 0.
+        self.m2 = 0.
+        self.min = np.inf
+        self.max = -np.inf
+        self.sketch = QuantileSketch(k)
+
+    def update(self, values):
+        ''' add the finite values of an array of numbers
+        '''
+        values = np.asarray(values, dtype=float)
+        values = values[np.isfinite(values)]
+        if len(values) == 0:
+            return
+        mean = values.mean()
+        self.combine(len(values), mean, np.sum((values - mean)**2), values.min(), values.max())
+        self.sketch.update(values)
+
+    def merge(self, other):
+        self.combine(other.count, other.mean, other.m2, other.min, other.max)
+        self.sketch.merge(other.sketch)
+        return self
+
+    def combine(self, count, mean, m2, minimum, maximum):
+        if count == 0:
+            return
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean += delta * count / float(total)
+        self.m2 += m2 + delta**2 * self.count * count / float(total)
+        self.count = total
+        self.min, self.max = min(self.min, minimum), max(self.max, maximum)
+
+    @property
+    def variance(self):
+        return self.m2 / self.count if self.count > 0 else np.nan
+
+    def summary(self):
+        ''' the json-serializable statistics of a box plot, None if no value was added
+            returns a dict of the count, mean, std, min, max, quartiles (q1, median, q3)
+            and the ends of the whiskers (lowerfence, upperfence)
+        '''
+        if self.count == 0:
+            return None
+        q1, median, q3 = self.sketch.quantiles([0.25, 0.5, 0.75])
+        items, _ = self.sketch.weighted()
+        low, high = q1 - WHISKER_IQR * (q3 - q1), q3 + WHISKER_IQR * (q3 - q1)
+        # the whiskers end on the furthest values within the fences, the min and max being exact
+        within = items[(items >= low) & (items <= high)]
+        lowerfence = self.min if self.min >= low else (within.min() if len(within) > 0 else q1)
+        upperfence = self.max if self.max <= high else (within.max() if len(within) > 0 else q3)
+        return dict((key, float(value)) for key, value in [
+            ('count', self.count), ('mean', self.mean), ('std', np.sqrt(self.variance)),
+            ('min', self.min), ('max', self.max), ('q1', q1), ('median', median), ('q3', q3),
+            ('lowerfence', lowerfence), ('upperfence', upperfence),
+        ])
+
+def columnStats(column, block_size=BLOCK_SIZE):
+    ''' the `ColumnStats` of the numerical cells of a `columns.Column`, read by blocks of rows
+        (the values may be memory-mapped)
+    '''
+    stats = ColumnStats()
+    if column.values is None:
+        return stats
+    for start in range(0, len(column), block_size):
+        stats.update(column.values[start:start+block_size])
+    return stats
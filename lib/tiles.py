@@ -0,0 +1,267 @@
+import numpy as np
+import collections
+import json
+import threading
+import dataset
+import lod
+import output
+from normalize import MISSING_VALUE
+
+# the number of bins of a level merged into a bin of the level above
+FACTOR = 4
+# a tile holds every feature of a band of rows, about TILE_CELLS cells
+TILE_CELLS = 64 * 1024
+MAX_TILE_ROWS = 4096
+# the rows aggregated at once into the first level, the heatmap may be memory-mapped
+BLOCK_ROWS = 256 * 1024
+TILE_CACHE_SIZE = 256
+
+def tileRows(n_features):
+    ''' the number of rows (or bins) of a tile, the power of 2 holding about `TILE_CELLS` cells
+    '''
+    rows = max(8, min(MAX_TILE_ROWS, TILE_CELLS // max(1, n_features)))
+    return 2 ** int(np.log2(rows))
+
+def cellTypes(table, features_type):
+    ''' the type of each cell of a table, the type of its feature or 0 when it is missing
+    '''
+    types = np.empty(table.shape, dtype=np.uint8)
+    for j in range(table.shape[1]):
+        types[:,j] = features_type[j]
+        types[table.mask.column(j),j] = 0
+    return types
+
+def groups(array, fill):
+    ''' split the rows of an array into groups of `FACTOR` rows, the last group padded with `fill`
+    '''
+    n_bins = -(-array.shape[0] // FACTOR)
+    padded = np.empty((n_bins * FACTOR,) + array.shape[1:], dtype=array.dtype)
+    padded[array.shape[0]:] = fill
+    padded[:array.shape[0]] = array
+    return padded.reshape((n_bins, FACTOR) + array.shape[1:])
+
+class Level(object):
+    ''' the rows of the heatmaps aggregated into bins of `size` rows
+        Attributes :
+            * `size` : (int)
+                the number of rows of a bin, the last bin may hold less rows
+            * `summary` : (ndarray)
+                the summary of the normalized values of each bin (float32), `MISSING_VALUE`
+                when no cell of the bin has a value
+            * `present` : (ndarray)
+                the number of cells with a value of each bin
+            * `missing` : (ndarray)
+                the number of missing cells of each bin
+            * `type_counts` : (ndarray)
+                the number of present cells of each type of each bin, of shape
+                (n_bins, n_features, n_types - 1) (see `lod.majorityTypes`)
+            * `completeness` : (ndarray)
+                the number of present features of each bin (mean, or minimum for the 'any' reducer)
+            * `n_rows` : (int)
+                the number of rows the bins cover
+    '''
+    def __init__(self, size, summary, present, missing, type_counts, completeness, n_rows):
+        self.size = size
+        self.summary = summary
+        self.present = present
+        self.missing = missing
+        self.type_counts = type_counts
+        self.completeness = completeness
+        self.n_rows = n_rows
+
+    def __len__(self):
+        return self.summary.shape[0]
+
+    def sizes(self, start=0, stop=None):
+        ''' the number of rows of the bins start:stop
+        '''
+        stop = len(self) if stop is None else stop
+        first = np.arange(start, stop, dtype=np.int64) * self.size
+        return np.minimum(self.size, self.n_rows - first)
+
+    @classmethod
+    def fromRows(cls, heatmap, types, completeness):
+        ''' the rows of the heatmaps as a level of bins of a single row
+        '''
+        heatmap, types = np.asarray(heatmap), np.asarray(types)
+        present = heatmap != MISSING_VALUE
+        type_counts = (types[:,:,None] == np.arange(1, len(dataset.types), dtype=types.dtype)).astype(np.uint8)
+        return cls(1, heatmap.astype(np.float32), present.astype(np.uint8), (types == 0).astype(np.uint8),
+                   type_counts, np.asarray(completeness, dtype=np.float32), heatmap.shape[0])
+
+    def reduce(self, string_features, reducer='mean'):
+        ''' merge the bins by groups of `FACTOR` into the level above
+            The string and boolean features are summarized by their mode, which is the mode of
+            the rows for the first level and the mode of the modes (weighted by their number of
+            values) above it
+        '''
+        size = self.size * FACTOR
+        counts = np.min_scalar_type(size)
+        values, present = groups(self.summary, MISSING_VALUE), groups(self.present, 0)
+        n_present = present.sum(axis=1, dtype=np.int64)
+        if reducer == 'max':
+            summary = np.where(present > 0, values, -np.inf).max(axis=1)
+        else:
+            with np.errstate(invalid='ignore', divide='ignore'):
+                summary = (values * present).sum(axis=1, dtype=np.float64) / n_present
+            for j in string_features:
+                summary[:,j] = groupModes(values[:,:,j], present[:,:,j])
+        summary[n_present == 0] = MISSING_VALUE
+        missing = groups(self.missing, 0).sum(axis=1, dtype=np.int64)
+        sizes = groups(self.sizes(), 0)
+        if reducer == 'any':
+            completeness = groups(self.completeness, np.inf).min(axis=1)
+        else:
+            completeness = (groups(self.completeness, 0) * sizes).sum(axis=1) / sizes.sum(axis=1)
+        type_counts = groups(self.type_counts, 0).sum(axis=1, dtype=np.int64)
+        return Level(size, summary.astype(np.float32), n_present.astype(counts), missing.astype(counts),
+                     type_counts.astype(counts), completeness.astype(np.float32), self.n_rows)
+
+def groupModes(values, weights):
+    ''' the most frequent value of each group of values (a row of `values`), each value counting
+        for its weight, the greatest of the most frequent values as `lod.reduceMode` does,
+        `MISSING_VALUE` for the groups without weight
+    '''
+    equal = values[:,:,None] == values[:,None,:]
+    totals = (equal * weights[:,None,:].astype(np.int64)).sum(axis=2)
+    totals[weights == 0] = -1
+    frequent = totals == totals.max(axis=1)[:,None]
+    modes = np.where(frequent, values, -np.inf).max(axis=1).astype(values.dtype)
+    modes[np.all(weights == 0, axis=1)] = MISSING_VALUE
+    return modes
+
+def concatenateLevels(levels):
+    first = levels[0]
+    merge = lambda name: np.concatenate([getattr(level, name) for level in levels])
+    return Level(first.size, merge('summary'), merge('present'), merge('missing'), merge('type_counts'), merge('completeness'),
+                 sum(level.n_rows for level in levels))
+
+class Pyramid(object):
+    ''' the heatmaps at every level of detail, the rows themselves then bins of `FACTOR`,
+        `FACTOR`**2, ... rows up to a level fitting in a single tile
+        Parameters :
+            * `heatmap` : (ndarray)
+                the normalized values as returned by `normalize.computeHeatmapValues`, may be memory-mapped
+            * `types` : (ndarray)
+                the type of each cell (see `cellTypes`)
+            * `completeness` : (ndarray)
+                the number of present features of each row
+            * `features_type` : (iterable)
+                the type of each feature
+            * `reducer` : (string)
+                the summary of the bins, see `lod.aggregateRows`
+            * `order` : (ndarray)
+                the permutation of the rows drawn, None to draw them in the order of the
+                arrays. It is applied to a block of rows at a time, the arrays are not permuted
+    '''
+    def __init__(self, heatmap, types, completeness, features_type, reducer='mean', order=None):
+        if reducer not in lod.REDUCERS:
+            raise ValueError("unknown reducer '%s', expected one of %s" % (reducer, lod.REDUCERS))
+        self.heatmap = heatmap
+        self.types = types
+        self.completeness = completeness
+        self.reducer = reducer
+        self.order = order
+        self.n_rows, self.n_features = heatmap.shape
+        self.tile_rows = tileRows(self.n_features)
+        self.string_features = [j for j, t in enumerate(features_type) if t in (dataset.types['string'], dataset.types['bool'])]
+        self.levels = [None]
+        if self.n_rows > self.tile_rows:
+            # the first level is reduced by blocks of rows, the rows are not copied as a whole
+            block = BLOCK_ROWS - BLOCK_ROWS % FACTOR
+            self.levels.append(concatenateLevels([
+                Level.fromRows(heatmap[rows], types[rows], completeness[rows]).reduce(self.string_features, reducer)
+                for rows in (self.rows(start, start + block) for start in range(0, self.n_rows, block))
+            ]))
+        while self.levels[-1] is not None and len(self.levels[-1]) > self.tile_rows:
+            self.levels.append(self.levels[-1].reduce(self.string_features, reducer))
+
+    def rows(self, start, stop):
+        ''' the rows of the arrays drawn at the positions start:stop
+        '''
+        stop = min(self.n_rows, stop)
+        return slice(start, stop) if self.order is None else self.order[start:stop]
+
+    def binSize(self, level):
+        return FACTOR ** level
+
+    def nTiles(self, level):
+        n_bins = self.n_rows if level == 0 else len(self.levels[level])
+        return max(1, -(-n_bins // self.tile_rows))
+
+    def tile(self, level, index):
+        ''' the bins of a tile: the band of bins index * `tile_rows` to (index + 1) * `tile_rows`
+            of a level, the rows of the heatmaps themselves at level 0
+            returns a dict of arrays, see `encodeTile`
+        '''
+        if level < 0 or level >= len(self.levels) or index < 0 or index >= self.nTiles(level):
+            raise IndexError('no tile %d of level %d' % (index, level))
+        start = index * self.tile_rows
+        if level == 0:
+            rows = self.rows(start, start + self.tile_rows)
+            types = np.asarray(self.types[rows])
+            return {
+                'level': 0, 'start': start, 'size': 1,
+                'heatmap': np.asarray(self.heatmap[rows], dtype=np.float32),
+                'types': types,
+                'missing': (types == 0).astype(np.uint8),
+                'completeness': np.asarray(self.completeness[rows]),
+            }
+        bins = self.levels[level]
+        stop = min(len(bins), start + self.tile_rows)
+        sizes = bins.sizes(start, stop)[:,None]
+        missing = bins.missing[start:stop] / sizes.astype(float)
+        summary, types = np.array(bins.summary[start:stop]), lod.majorityTypes(bins.type_counts[start:stop])
+        # a bin is missing when most of its cells are, or when any is with the 'any' reducer
+        types[missing > (0 if self.reducer == 'any' else 0.5)] = 0
+        if self.reducer == 'any':
+            summary[missing > 0] = MISSING_VALUE
+        return {
+            'level': level, 'start': start * bins.size, 'size': bins.size,
+            'heatmap': summary,
+            'types': types,
+            'missing': missing,
+            'completeness': bins.completeness[start:stop],
+        }
+
+def encodeTile(tile):
+    ''' the json of a tile, its arrays encoded with `output.encodeArray` and `output.encodeStrings`
+    '''
+    encoded = {}
+    for key, value in tile.items():
+        if isinstance(value, np.ndarray):
+            encoded[key] = output.encodeStrings(value) if value.dtype.kind in 'SUO' else output.encodeArray(value)
+        else:
+            encoded[key] = value
+    return json.dumps(encoded).encode('utf-8')
+
+class TileCache(object):
+    ''' the least recently used encoded tiles of a pyramid, shared by the threads of the server
+        Parameters :
+            * `function` : (function)
+                returns the encoded tile of (level, index)
+            * `size` : (int)
+                the number of tiles kept
+    '''
+    def __init__(self, function, size=TILE_CACHE_SIZE):
+        self.function = function
+        self.size = size
+        self.tiles = collections.OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def get(self, level, index):
+        key = (level, index)
+        with self.lock:
+            if key in self.tiles:
+                self.hits += 1
+                tile = self.tiles.pop(key)
+                self.tiles[key] = tile
+                return tile
+        tile = self.function(level, index)
+        with self.lock:
+            self.misses += 1
+            self.tiles[key] = tile
+            while len(self.tiles) > self.size:
+                self.tiles.popitem(last=False)
+        return tile
@@ -1,4 +1,11 @@
-from dateutil.parser import parse
+import numpy as np
+import dates
+from xml.sax.saxutils import escape
+
+def escapeHTML(string):
+    ''' escape a string for an html text or a quoted attribute (`cgi.escape` is not in python 3.8)
+    '''
+    return escape(string, {'"': '&quot;'})
 
 def isFloat(x):
     try:
@@ -8,8 +15,23 @@ def isFloat(x):
     return True
 
 def isDate(x):
+    return not np.isnan(dates.parseEpoch(x))
+
+def parseFloats(strings):
+    ''' parse an array of strings to floats
+        The spellings of nan which are not missing labels (ex: 'Nan', the name of a character
+        of character-predictions.csv) are not numbers, a numerical cell has a value
+        returns the parsed values (nan when unparsable) and a bool array of the parsable strings
+    '''
     try:
-        parse(x)
-    except:
-        return False
-    return True
+        parsed = np.asarray(strings).astype(float)
+        return parsed, ~np.isnan(parsed)
+    except ValueError:
+        pass
+    parsed = np.empty(len(strings))
+    for i in range(len(strings)):
+        try:
+            parsed[i] = float(strings[i])
+        except ValueError:
+            parsed[i] = np.nan
+    return parsed, ~np.isnan(parsed)
@@ -0,0 +1,150 @@
+import numpy as np
+import dataset
+import lod
+from columns import Table
+from missing import MissingMask
+from normalize import MISSING_VALUE
+from tiles import cellTypes
+
+# the number of features of a window of columns
+WINDOW_FEATURES = 200
+# the datasets with more features are drawn by windows even without --wide
+MAX_FEATURES = 1000
+# the features outside the window are aggregated into at most MAX_BLOCKS columns
+MAX_BLOCKS = 32
+# the number of labelled ticks of the feature axes
+MAX_TICKS = 100
+GROUPS = ['type', 'missing']
+
+class FeatureView(object):
+    ''' the columns of the figure: a window of features, then blocks aggregating the other
+        features, or every feature when there is no window
+        Attributes :
+            * `features` : (ndarray)
+                the index of each feature of the window
+            * `blocks` : (list)
+                the indices of the features aggregated by each block
+            * `table` : (Table)
+                the typed columns of the features of the window
+            * `labels` : (ndarray)
+                the label of each column, the features of the window then the blocks
+            * `features_type` : (list)
+                the type of each column, the blocks are numerical (they draw a mean)
+            * `heatmap` : (ndarray)
+                the normalized values of each column, the mean of the present values of its
+                features for a block
+            * `types` : (ndarray)
+                the type of each cell, 0 when missing, the most frequent type of the present
+                cells for a block and 0 when most of them are missing (as `lod.aggregateRows`)
+            * `missing_counts` : (ndarray)
+                the number of missing cells of each column
+    '''
+    def __init__(self, features, blocks, table, labels, features_type, heatmap, types, missing_counts):
+        self.features = features
+        self.blocks = blocks
+        self.table = table
+        self.labels = labels
+        self.features_type = features_type
+        self.heatmap = heatmap
+        self.types = types
+        self.missing_counts = missing_counts
+
+    @property
+    def n_columns(self):
+        return len(self.labels)
+
+def featureOrder(features_type, missing_counts, group_by=None):
+    ''' the order of the features split into windows: the order of the file, grouped by
+        type, or by decreasing number of missing cells (the sorts are stable)
+    '''
+    if group_by is None:
+        return np.arange(len(features_type))
+    if group_by == 'type':
+        return np.argsort(np.asarray(features_type), kind='mergesort')
+    if group_by == 'missing':
+        return np.argsort(-np.asarray(missing_counts), kind='mergesort')
+    raise ValueError("unknown feature grouping '%s', expected one of %s" % (group_by, GROUPS))
+
+def aggregateFeatures(profile, block):
+    ''' summarize the features `block` of a profile as a single column, one feature at a time
+        returns the normalized values, the types and the number of missing cells of the column
+    '''
+    n_rows = profile.heatmap.shape[0]
+    sums, counts = np.zeros(n_rows), np.zeros(n_rows, dtype=np.int64)
+    type_counts, missing = np.zeros((n_rows, len(dataset.types) - 1), dtype=np.int64), np.zeros(n_rows, dtype=np.int64)
+    for j in block:
+        values = profile.heatmap[:,j]
+        present = values != MISSING_VALUE
+        sums[present] += values[present]
+        counts += present
+        is_missing = profile.table.mask.column(j)
+        if profile.features_type[j] != dataset.types['missing']:
+            type_counts[:,profile.features_type[j]-1] += ~is_missing
+        missing += is_missing
+    summary = np.full(n_rows, MISSING_VALUE)
+    summary[counts > 0] = sums[counts > 0] / counts[counts > 0]
+    types = lod.majorityTypes(type_counts)
+    types[missing * 2 > len(block)] = 0
+    return summary, types, int(np.sum(profile.missing_counts[block]))
+
+def windowPages(order, window):
+    return [order[start:start+window] for start in range(0, len(order), window)]
+
+def blockLabel(pages, first, last):
+    n_features = sum(len(pages[k]) for k in range(first, last + 1))
+    name = 'page %d' % first if first == last else 'pages %d-%d' % (first, last)
+    return '[%s: %d features]' % (name, n_features)
+
+def pageGroups(n_pages, page, max_blocks=MAX_BLOCKS):
+    ''' split the pages other than `page` into at most `max_blocks` groups of consecutive
+        pages, the pages before `page` and after it being grouped apart
+    '''
+    before, after = np.arange(page), np.arange(page + 1, n_pages)
+    n_before = min(len(before), max(1, max_blocks * len(before) // max(1, n_pages - 1)))
+    n_after = min(len(after), max_blocks - n_before)
+    groups = (np.array_split(before, n_before) if n_before > 0 else []) + (np.array_split(after, n_after) if n_after > 0 else [])
+    return [group for group in groups if len(group) > 0]
+
+def featureView(profile, window=None, page=0, group_by=None):
+    ''' the columns drawn for a profile (see `FeatureView`)
+        Parameters :
+            * `window` : (int)
+                the number of features of a page, None to draw every feature
+            * `page` : (int)
+                the page of features drawn in full, the other pages are aggregated into
+                at most `MAX_BLOCKS` blocks of consecutive pages
+            * `group_by` : (string)
+                the order of the features split into pages, see `featureOrder`
+    '''
+    table = profile.table
+    if window is None:
+        features = np.arange(table.shape[1])
+        return FeatureView(features, [], table, table.labels, list(profile.features_type), profile.heatmap,
+                           cellTypes(table, profile.features_type), profile.missing_counts)
+    pages = windowPages(featureOrder(profile.features_type, profile.missing_counts, group_by), window)
+    if page < 0 or page >= len(pages):
+        raise ValueError('no page %d, the %d features make %d pages of %d' % (page, table.shape[1], len(pages), window))
+    features = pages[page]
+    groups = pageGroups(len(pages), page)
+    blocks = [np.concatenate([pages[k] for k in group]) for group in groups]
+    window_table = Table(table.labels[features], [table.columns[j] for j in features],
+                         MissingMask(table.mask.bits[features], table.shape[0]))
+    features_type = [profile.features_type[j] for j in features]
+    heatmap = np.empty((table.shape[0], len(features) + len(blocks)), dtype=profile.heatmap.dtype)
+    heatmap[:,:len(features)] = profile.heatmap[:,features]
+    types = np.empty(heatmap.shape, dtype=np.uint8)
+    types[:,:len(features)] = cellTypes(window_table, features_type)
+    missing_counts = np.empty(heatmap.shape[1], dtype=np.int64)
+    missing_counts[:len(features)] = profile.missing_counts[features]
+    for b, block in enumerate(blocks):
+        heatmap[:,len(features)+b], types[:,len(features)+b], missing_counts[len(features)+b] = aggregateFeatures(profile, block)
+    labels = np.asarray([str(label) for label in window_table.labels] + [blockLabel(pages, group[0], group[-1]) for group in groups])
+    features_type += [dataset.types['numerical']] * len(blocks)
+    return FeatureView(features, blocks, window_table, labels, features_type, heatmap, types, missing_counts)
+
+def tickIndices(n_columns, max_ticks=MAX_TICKS):
+    ''' the columns labelled on the feature axes, every column or evenly spaced columns
+        when they are more than `max_ticks`
+    '''
+    step = max(1, -(-n_columns // max_ticks))
+    return np.arange(0, n_columns, step)
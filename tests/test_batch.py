@@ -0,0 +1,52 @@
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'lib'))
+import batch
+import inference
+import loader
+
+def writeSummary(args, filepath, filename, auto_open):
+    ''' a report holding the path of its file
+    '''
+    with open(filename, 'w') as f:
+        f.write(filepath)
+    table = loader.loadColumns(filepath)
+    return batch.summarize(table, inference.inferTable(table), table.shape[0])
+
+class TestReportFilenames(unittest.TestCase):
+    ''' the reports of files sharing a name do not overwrite each other
+    '''
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_names(self):
+        paths = [os.path.join('data', 'a', 'part.csv'), os.path.join('data', 'b', 'part.csv'), 'index.csv', 'other.csv']
+        names = [os.path.basename(filename) for filename in batch.reportFilenames(paths, 'out')]
+        self.assertEqual(names, ['a_part.html', 'b_part.html', 'index-2.html', 'other.html'])
+
+    def test_batch(self):
+        paths = []
+        for name in ['a', 'b']:
+            os.makedirs(os.path.join(self.directory, 'data', name))
+            paths.append(os.path.join(self.directory, 'data', name, 'part.csv'))
+            with open(paths[-1], 'w') as f:
+                f.write('x,y\n1,%s\n' % name)
+        output_dir = os.path.join(self.directory, 'reports')
+        index = batch.runBatch(writeSummary, paths, argparse.Namespace(), output_dir)
+        reports = sorted(name for name in os.listdir(output_dir) if name != 'index.html')
+        self.assertEqual(len(reports), 2)
+        self.assertEqual(sorted(open(os.path.join(output_dir, name)).read() for name in reports), sorted(paths))
+        with open(index) as f:
+            page = f.read()
+        for name in reports:
+            self.assertIn('href="%s"' % name, page)
+
+if __name__ == '__main__':
+    unittest.main()
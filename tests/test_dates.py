@@ -0,0 +1,29 @@
+import os
+import sys
+import unittest
+import numpy as np
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'lib'))
+import dates
+
+class TestMatchFields(unittest.TestCase):
+    ''' the strings matched by their template match as they do one at a time
+    '''
+    STRINGS = ['2014-10-13', '2014-1-3 12:05:59', '2014-10-13T08:00:00.25Z', '20141013T000000', '2014/10/13',
+               '10/13/14', '13.10.2014', '13-10-2014', '2014-10-13\n', 'abc', '', '12345678',
+               '2014-10-13T08:00:00.' + '5' * 40, '2014-10-13' + ' ' * 40]
+
+    def test_same_as_each(self):
+        strings = np.asarray(self.STRINGS, dtype=object)
+        for name, pattern in dates.FORMATS.items():
+            fields, matched = dates.matchFields(strings, pattern)
+            expected_fields, expected_matched = dates.matchEach(strings, pattern)
+            self.assertEqual(list(matched), list(expected_matched), name)
+            self.assertTrue(np.array_equal(fields, expected_fields), name)
+
+    def test_fields(self):
+        fields, matched = dates.matchFields(np.asarray(['2014-1-3 12:05:59', 'x']), dates.FORMATS['%Y-%m-%d %H:%M:%S'])
+        self.assertEqual(list(matched), [True, False])
+        self.assertEqual(list(fields[0]), [2014, 1, 3, 12, 5, 59])
+
+if __name__ == '__main__':
+    unittest.main()
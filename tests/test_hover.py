@@ -0,0 +1,52 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+import numpy as np
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'lib'))
+import cache
+import dataset
+import hover
+import loader
+
+ROWS = [
+    ['id', 'price', 'code', 'name'],
+    ['1', '1.10', '007', 'Arya'],
+    ['2', '1e3', '7', 'NA'],
+    ['3', ' 5', '0.50', '12'],
+    ['04', '-0', '', 'Nan'],
+    ['5', '1.1', '+3', 'Old Nan'],
+]
+
+class TestLookupHover(unittest.TestCase):
+    ''' the hover of the cells looked up in the strings of their column is the text of the file
+    '''
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.filepath = os.path.join(self.directory, 'cells.csv')
+        with open(self.filepath, 'w') as f:
+            f.write('\n'.join(','.join(row) for row in ROWS) + '\n')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def checkTable(self, table):
+        for j, column in enumerate(table.columns):
+            strings, codes = hover.columnStrings(column)
+            expected = ['' if row[j] in dataset.missing_labels else row[j] for row in ROWS[1:]]
+            self.assertEqual([strings[code] for code in codes], expected)
+            self.assertEqual(list(column.strings()), expected)
+
+    def test_raw_cells(self):
+        self.checkTable(loader.loadColumns(self.filepath))
+
+    def test_cached_table(self):
+        table = loader.loadColumns(self.filepath)
+        entry = os.path.join(self.directory, 'entry')
+        os.mkdir(entry)
+        cache.writeEntry(entry, table, [dataset.types['numerical']] * table.shape[1], np.zeros(table.shape, dtype=np.float32))
+        self.checkTable(cache.readEntry(entry)[0])
+
+if __name__ == '__main__':
+    unittest.main()
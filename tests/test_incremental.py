@@ -0,0 +1,89 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+import numpy as np
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'lib'))
+import incremental
+import profiling
+
+class TestIncrementalRefresh(unittest.TestCase):
+    ''' the profile refreshed after appends equals the profile of the whole file
+    '''
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'data.csv')
+        self.state_dir = os.path.join(self.directory, 'state')
+        self.rng = np.random.RandomState(0)
+        with open(self.path, 'w') as f:
+            f.write('A,B,C\n')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def rows(self, n, low, high, categories, date=False):
+        ''' rows of a number (written in several formats, sometimes missing), a category and
+            a small integer or a string (or a date)
+        '''
+        lines = []
+        for _ in range(n):
+            a = '' if self.rng.rand() < .1 else self.rng.choice(['%g', '%.3f', '%07.2f']) % self.rng.uniform(low, high)
+            c = '2020-01-%02d' % self.rng.randint(1, 28) if date else ('x' if self.rng.rand() < .2 else '%d' % self.rng.randint(5))
+            lines.append('%s,%s,%s\n' % (a, self.rng.choice(categories), c))
+        return ''.join(lines)
+
+    def append(self, text):
+        with open(self.path, 'a') as f:
+            f.write(text)
+
+    def assertRefreshed(self):
+        table, features_type, heatmap, ranges = incremental.refresh(self.path, self.state_dir)
+        full = profiling.profileDataset(self.path, cache_dir=None)
+        self.assertEqual(list(features_type), list(full.features_type))
+        self.assertEqual(table.shape, full.table.shape)
+        np.testing.assert_array_equal(np.asarray(table.mask.bits), full.table.mask.bits)
+        np.testing.assert_allclose(np.asarray(heatmap), full.heatmap)
+        self.assertEqual(ranges, full.ranges)
+        np.testing.assert_array_equal(table.toStringMatrix().toArray(), full.table.toStringMatrix().toArray())
+
+    def test_appends(self):
+        steps = [
+            self.rows(1001, 0, 10, ['a', 'b']),
+            # a wider range and a new category
+            self.rows(5, 0, 20, ['a', 'b', 'c']),
+            # a partial last line, then continued
+            self.rows(3, 0, 5, ['b']) + '4,a',
+            ',a,3\n',
+            # the third feature turns into dates
+            self.rows(400, -5, 5, ['z'], date=True),
+            '7,q',
+            '',
+            '1\n',
+            self.rows(3000, 0, 10, ['a'], date=True),
+        ]
+        for step in steps:
+            self.append(step)
+            self.assertRefreshed()
+
+    def test_rewritten_file(self):
+        self.append(self.rows(200, 0, 10, ['a', 'b']))
+        self.assertRefreshed()
+        # the rows already profiled change, the state is built again
+        with open(self.path, 'w') as f:
+            f.write('A,B,C\n' + self.rows(150, 100, 200, ['d']))
+        self.assertRefreshed()
+        self.append(self.rows(20, 0, 10, ['e']))
+        self.assertRefreshed()
+
+    def test_profile(self):
+        self.append(self.rows(300, 0, 10, ['a', 'b']))
+        for step in [self.rows(10, 0, 30, ['c']), self.rows(10, 0, 3, ['d'], date=True)]:
+            self.append(step)
+            refreshed = profiling.profileDataset(self.path, cache_dir=self.directory, incremental_state=True)
+            full = profiling.profileDataset(self.path, cache_dir=None)
+            np.testing.assert_allclose(np.asarray(refreshed.heatmap), full.heatmap)
+            self.assertEqual(refreshed.stats()['features'], full.stats()['features'])
+
+if __name__ == '__main__':
+    unittest.main()
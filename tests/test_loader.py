@@ -0,0 +1,76 @@
+import os
+import sys
+import unittest
+import numpy as np
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'lib'))
+import dataset
+import inference
+import loader
+import normalize
+import utils
+
+def buildColumn(cells):
+    return loader.buildTable(['feature'], [np.asarray(cells)[:,None]]).columns[0]
+
+class TestNanSpellings(unittest.TestCase):
+    ''' the spellings of nan which are not missing labels are strings, not numbers
+    '''
+    def test_parse_floats(self):
+        parsed, parsable = utils.parseFloats(np.asarray(['1.5', 'Nan', 'nAN', 'x', '-2']))
+        self.assertEqual(list(parsable), [True, False, False, False, True])
+        self.assertEqual(list(parsed[parsable]), [1.5, -2.])
+
+    def test_numerical_column(self):
+        column = buildColumn(['1', 'Nan', '2', 'nan', ''])
+        self.assertEqual(list(column.isNumerical()), [True, False, True, False, False])
+        self.assertEqual(list(column.isCategorical()), [False, True, False, False, False])
+        self.assertEqual(list(column.missing), [False, False, False, True, True])
+        self.assertEqual(list(column.strings()), ['1', 'Nan', '2', '', ''])
+
+    def test_string_column(self):
+        column = buildColumn(['Arya', 'Nan', 'Old Nan', 'NaN'])
+        self.assertEqual(list(column.isCategorical()), [True, True, True, False])
+        kinds = inference.classifyStrings(column.categories)
+        self.assertTrue(np.all(kinds == dataset.types['string']))
+
+class TestBoundedDictionary(unittest.TestCase):
+    ''' the dictionary of a high-cardinality string feature stops growing once the sketch flags it
+    '''
+    def setUp(self):
+        self.defaults = normalize.HIGH_CARDINALITY, normalize.CARDINALITY_ENCODING
+        normalize.HIGH_CARDINALITY = 100
+        rng = np.random.RandomState(0)
+        self.ids = np.asarray(['id%05d' % i for i in rng.randint(0, 10000, 3000)], dtype=object)
+        self.ids[rng.rand(3000) < 0.4] = 'frequent'
+        self.dates = np.asarray(['2020-01-%02d %02d:%02d' % (1 + i % 28, i % 24, i % 60) for i in range(3000)], dtype=object)
+
+    def tearDown(self):
+        normalize.HIGH_CARDINALITY, normalize.CARDINALITY_ENCODING = self.defaults
+
+    def buildColumns(self):
+        chunks = [np.column_stack([self.ids, self.dates])[start:start+500] for start in range(0, 3000, 500)]
+        return loader.buildTable(['id', 'date'], chunks, summarize=True).columns
+
+    def test_top_strings(self):
+        normalize.CARDINALITY_ENCODING = 'topk'
+        ids, dates = self.buildColumns()
+        self.assertEqual(ids.encoding, 'topk')
+        self.assertEqual(len(ids.categories), normalize.TOP_K + 1)
+        self.assertEqual(ids.categories[0], 'frequent')
+        strings = ids.strings()
+        self.assertTrue(np.all((strings == self.ids) | (strings == normalize.OTHER_CATEGORY)))
+        self.assertTrue(np.all(strings[self.ids == 'frequent'] == 'frequent'))
+        # the dates keep every distinct string
+        self.assertIsNone(dates.encoding)
+        self.assertEqual(list(dates.strings()), list(self.dates))
+
+    def test_hash_bins(self):
+        normalize.CARDINALITY_ENCODING = 'hash'
+        ids, _ = self.buildColumns()
+        self.assertEqual(ids.encoding, 'hash')
+        self.assertEqual(len(ids.categories), normalize.HASH_BINS)
+        keys = normalize.hashKeys(buildColumn(self.ids), np.zeros(3000, dtype=bool), np.ones(3000, dtype=bool))
+        self.assertEqual(list(ids.codes), list(keys.astype(int)))
+
+if __name__ == '__main__':
+    unittest.main()
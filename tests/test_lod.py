@@ -0,0 +1,76 @@
+import os
+import sys
+import unittest
+import numpy as np
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'lib'))
+import dataset
+import lod
+from normalize import MISSING_VALUE
+
+def bruteForce(heatmap, types, completeness, features_type, starts, reducer):
+    ''' the bins of `lod.aggregateRows`, reduced one bin and one feature at a time
+    '''
+    ends = np.append(starts[1:], heatmap.shape[0])
+    summary = np.empty((len(starts), heatmap.shape[1]))
+    bin_types = np.zeros((len(starts), heatmap.shape[1]), dtype=int)
+    bin_completeness = np.empty(len(starts))
+    for b, (start, end) in enumerate(zip(starts, ends)):
+        bin_completeness[b] = np.min(completeness[start:end]) if reducer == 'any' else np.mean(completeness[start:end])
+        for j in range(heatmap.shape[1]):
+            values = [v for v in heatmap[start:end,j] if v != MISSING_VALUE]
+            cell_types = [int(t) for t in types[start:end,j]]
+            n_missing = cell_types.count(0)
+            if len(values) == 0 or (reducer == 'any' and n_missing > 0):
+                summary[b,j] = MISSING_VALUE
+            elif reducer == 'max':
+                summary[b,j] = max(values)
+            elif features_type[j] in (dataset.types['string'], dataset.types['bool']):
+                # the most frequent value, the greatest one on ties
+                summary[b,j] = max(values, key=lambda v: (values.count(v), v))
+            else:
+                summary[b,j] = np.mean(values)
+            present_types = [t for t in cell_types if t > 0]
+            if len(present_types) > 0 and n_missing <= 0.5 * (end - start) and not (reducer == 'any' and n_missing > 0):
+                bin_types[b,j] = max(present_types, key=lambda t: (present_types.count(t), t))
+    return summary, bin_types, bin_completeness
+
+class TestAggregateRows(unittest.TestCase):
+    ''' the bins of rows against a reduction of each bin
+    '''
+    def setUp(self):
+        rng = np.random.RandomState(0)
+        n_rows = 997
+        self.features_type = [dataset.types['numerical'], dataset.types['string'], dataset.types['bool']]
+        self.heatmap = np.column_stack([rng.rand(n_rows), rng.randint(0, 3, n_rows) / 2., rng.randint(0, 2, n_rows).astype(float)])
+        self.types = np.column_stack([np.full(n_rows, dataset.types['numerical']),
+                                      rng.choice([dataset.types['string'], dataset.types['numerical']], n_rows),
+                                      np.full(n_rows, dataset.types['bool'])])
+        missing = rng.rand(n_rows, 3) < 0.3
+        # a bin without present cell
+        missing[:4] = True
+        self.heatmap[missing] = MISSING_VALUE
+        self.types[missing] = 0
+        self.completeness = 3 - missing.sum(axis=1)
+
+    def test_reducers(self):
+        for reducer in lod.REDUCERS:
+            for target_rows in [50, 249, 997]:
+                levels = lod.aggregateRows(self.heatmap, self.types, self.completeness, self.features_type, target_rows, reducer)
+                summary, bin_types, completeness = bruteForce(self.heatmap, self.types, self.completeness, self.features_type, levels.rows, reducer)
+                self.assertEqual(list(levels.rows), list(lod.binStarts(len(self.heatmap), target_rows)))
+                np.testing.assert_allclose(levels.heatmap, summary)
+                np.testing.assert_array_equal(levels.types, bin_types)
+                np.testing.assert_allclose(levels.completeness, completeness)
+
+    def test_mode_ties(self):
+        heatmap = np.asarray([0.5, 1., 0.5, 1., 0., 0., 1., MISSING_VALUE])[:,None]
+        types = np.where(heatmap == MISSING_VALUE, 0, dataset.types['string'])
+        levels = lod.aggregateRows(heatmap, types, np.ones(8), [dataset.types['string']], 2)
+        self.assertEqual(list(levels.heatmap[:,0]), [1., 0.])
+
+    def test_majority_types(self):
+        counts = np.asarray([[2, 2, 0, 0], [0, 1, 3, 0], [0, 0, 0, 0], [1, 1, 1, 1]])
+        self.assertEqual(list(lod.majorityTypes(counts)), [2, 3, 0, 4])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+import base64
+import json
+import os
+import sys
+import unittest
+import zlib
+import numpy as np
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'lib'))
+import output
+from columns import StringColumns
+
+def decode(encoded):
+    ''' the array of an encoded payload value, as `output.LOADER_SCRIPT` rebuilds it
+    '''
+    if 'columns' in encoded:
+        return np.column_stack([decode(column) for column in encoded['columns']])
+    if 'table' in encoded:
+        return np.asarray(encoded['table'], dtype=object)[decode(encoded['codes'])].reshape(encoded['shape'])
+    return np.frombuffer(base64.b64decode(encoded['data']), dtype=np.dtype(encoded['dtype']).newbyteorder('<')).reshape(encoded['shape'])
+
+class TestEncoding(unittest.TestCase):
+    ''' the encoded arrays decode back to the source arrays, split in blocks or not
+    '''
+    def setUp(self):
+        self.block_size = output.BLOCK_SIZE
+        rng = np.random.RandomState(0)
+        strings = np.asarray(['a', 'b', 'caf\xc3\xa9', ''], dtype=object)[rng.randint(0, 4, (40, 7))]
+        self.payload = [
+            (0, 'z', rng.rand(300, 7)),
+            (0, 'x', np.arange(1000)),
+            (1, 'z', rng.randint(0, 5, (300, 7)).astype(float)),
+            (1, 'y', rng.randint(-2**30, 2**30, 500)),
+            (2, 'text', strings),
+            (3, 'text', StringColumns([['u', 'v'], ['w']], [np.arange(200) % 2, np.zeros(200, dtype=int)], 200)),
+        ]
+
+    def tearDown(self):
+        output.BLOCK_SIZE = self.block_size
+
+    def assertDecoded(self, encoded, source):
+        decoded = decode(encoded)
+        if isinstance(source, StringColumns):
+            source = source.toArray()
+        if decoded.dtype.kind in 'fui':
+            np.testing.assert_allclose(decoded, source, rtol=1e-7 if encoded['dtype'] == 'float32' else 0)
+        else:
+            # the strings are utf-8 bytes in python 2, decoded by json
+            text = np.vectorize(lambda s: s.decode('utf-8') if isinstance(s, bytes) else s, otypes=[object])
+            self.assertEqual(decoded.tolist(), text(source).tolist())
+
+    def test_array_dtypes(self):
+        arrays = [(np.arange(200), 'uint8'), (np.arange(70000), 'uint32'), (np.asarray([-3., 4.]), 'float32'),
+                  (np.asarray([2.**40, -1.]), 'float64'), (np.asarray([0.25, 1.5]), 'float32')]
+        for array, dtype in arrays:
+            encoded = output.encodeArray(array)
+            self.assertEqual(encoded['dtype'], dtype)
+            self.assertDecoded(encoded, array)
+
+    def test_payload(self):
+        for block_size in [self.block_size, 3 * 5, 3 * 64]:
+            output.BLOCK_SIZE = block_size
+            decoded = json.loads(''.join(output.payloadPieces(self.payload)))
+            self.assertEqual(len(decoded), len(self.payload))
+            for encoded, (trace, attribute, source) in zip(decoded, self.payload):
+                self.assertEqual((encoded['trace'], encoded['attribute']), (trace, attribute))
+                self.assertDecoded(encoded, source)
+
+    def test_compressed_payload(self):
+        for block_size in [self.block_size, 3 * 5, 3 * 64, 3 * 1000]:
+            output.BLOCK_SIZE = block_size
+            pieces = list(output.compressedPieces(output.payloadPieces(self.payload)))
+            text = ''.join(pieces)
+            self.assertTrue(text.startswith('"') and text.endswith('"'))
+            # every piece but the last of the base64 is a whole number of groups of 4 characters
+            self.assertTrue(all(len(piece) % 4 == 0 for piece in pieces[1:-2]))
+            inflated = zlib.decompress(base64.b64decode(text[1:-1]), 31)
+            self.assertEqual(inflated.decode('utf-8'), ''.join(output.payloadPieces(self.payload)))
+
+if __name__ == '__main__':
+    unittest.main()
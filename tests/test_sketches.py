@@ -0,0 +1,93 @@
+import os
+import sys
+import unittest
+import numpy as np
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'lib'))
+import profiling
+import sketches
+
+RESOURCES = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'resources')
+
+class TestHyperLogLog(unittest.TestCase):
+    # three times the standard error of the estimate
+    TOLERANCE = 3 * 1.04 / np.sqrt(2**sketches.HLL_PRECISION)
+
+    def test_known_cardinalities(self):
+        rng = np.random.RandomState(0)
+        for cardinality in [10, 1000, 50000, 300000]:
+            hll = sketches.HyperLogLog()
+            # every value is seen, some of them several times, by blocks
+            values = np.concatenate([np.arange(cardinality), rng.randint(0, cardinality, cardinality // 2)])
+            rng.shuffle(values)
+            for start in range(0, len(values), sketches.BLOCK_SIZE):
+                hll.update(sketches.hashNumbers(values[start:start+sketches.BLOCK_SIZE]))
+            error = abs(hll.estimate() - cardinality) / float(cardinality)
+            self.assertLess(error, self.TOLERANCE, 'cardinality %d estimated %d' % (cardinality, hll.estimate()))
+
+    def test_strings(self):
+        hll = sketches.HyperLogLog()
+        hll.update(sketches.hashStrings(['value %d' % i for i in range(20000)] * 2))
+        self.assertLess(abs(hll.estimate() - 20000) / 20000., self.TOLERANCE)
+
+    def test_merge(self):
+        hashes = sketches.hashNumbers(np.arange(100000))
+        whole, first, second = sketches.HyperLogLog(), sketches.HyperLogLog(), sketches.HyperLogLog()
+        whole.update(hashes)
+        first.update(hashes[:30000])
+        second.update(hashes[30000:])
+        self.assertTrue(np.array_equal(first.merge(second).registers, whole.registers))
+
+class TestSpaceSaving(unittest.TestCase):
+    def zipfStream(self, n_values, n_cells, seed=0):
+        rng = np.random.RandomState(seed)
+        weights = 1. / np.arange(1, n_values + 1)
+        return rng.choice(n_values, size=n_cells, p=weights / weights.sum())
+
+    def test_top_strings(self):
+        k = 20
+        cells = self.zipfStream(5000, 200000)
+        names = np.asarray(['value %d' % i for i in range(5000)], dtype=object)
+        summary = sketches.SpaceSaving()
+        for start in range(0, len(cells), 10000):
+            counted = np.bincount(cells[start:start+10000], minlength=len(names))
+            present = np.flatnonzero(counted)
+            summary.update(sketches.hashStrings(names[present]), counted[present], names[present])
+        true_counts = np.bincount(cells, minlength=len(names))
+        top = [names[i] for i in np.argsort(-true_counts, kind='mergesort')[:k]]
+        estimated = dict(summary.mostCommon(summary.capacity))
+        for name in top:
+            self.assertIn(name, estimated)
+            true_count = true_counts[int(name.split()[1])]
+            # the counts are over-estimates by at most the floor
+            self.assertGreaterEqual(estimated[name], true_count)
+            self.assertLessEqual(estimated[name], true_count + summary.floor)
+
+    def test_merge(self):
+        cells = self.zipfStream(2000, 50000, seed=1)
+        names = np.asarray(['value %d' % i for i in range(2000)], dtype=object)
+        summaries = []
+        for part in np.array_split(cells, 4):
+            summary = sketches.SpaceSaving()
+            counted = np.bincount(part, minlength=len(names))
+            present = np.flatnonzero(counted)
+            summary.update(sketches.hashStrings(names[present]), counted[present], names[present])
+            summaries.append(summary)
+        merged = summaries[0]
+        for summary in summaries[1:]:
+            merged.merge(summary)
+        true_counts = np.bincount(cells, minlength=len(names))
+        estimated = dict(merged.mostCommon(10))
+        self.assertEqual(set(estimated), set(names[np.argsort(-true_counts, kind='mergesort')[:10]]))
+
+class TestDistinctCount(unittest.TestCase):
+    ''' the distinct counts of the profile stats are exact below the high-cardinality threshold
+    '''
+    def test_iris(self):
+        profile = profiling.profileDataset(os.path.join(RESOURCES, 'Iris.csv'), cache_dir=None)
+        distinct = dict((feature['label'], feature['distinct']) for feature in profile.stats()['features'])
+        self.assertEqual(distinct['Id'], 150)
+        self.assertEqual(distinct['Species'], 3)
+        self.assertEqual(distinct['PetalWidthCm'], len(set(profile.table.columns[4].values)))
+
+if __name__ == '__main__':
+    unittest.main()
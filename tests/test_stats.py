@@ -0,0 +1,95 @@
+import os
+import sys
+import unittest
+import numpy as np
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'lib'))
+import stats
+
+# the rank error of a quantile of a sketch, with a high probability
+RANK_ERROR = 1.7 / stats.SKETCH_SIZE
+
+def rankErrors(values, sketch, qs):
+    ''' the distance between the quantiles `qs` and the ranks of the values the sketch
+        estimates for them, 0 when an estimate is equal to the values spanning its quantile
+    '''
+    values = np.sort(values)
+    estimates = sketch.quantiles(qs)
+    low = np.searchsorted(values, estimates, side='left') / float(len(values))
+    high = np.searchsorted(values, estimates, side='right') / float(len(values))
+    return np.maximum(0, np.maximum(low - qs, qs - high))
+
+class TestColumnStats(unittest.TestCase):
+    def test_merged_moments(self):
+        rng = np.random.RandomState(0)
+        values = np.concatenate([rng.randn(30000) * 5 + 100, rng.exponential(3, 20000)])
+        cells = values.copy()
+        cells[rng.randint(0, len(cells), 500)] = np.nan
+        cells[:3] = [np.inf, -np.inf, np.nan]
+        finite = cells[np.isfinite(cells)]
+        parts = []
+        for chunk in np.array_split(cells, [7, 1000, 1001, 25000, 40000]):
+            part = stats.ColumnStats()
+            for block in np.array_split(chunk, 3):
+                part.update(block)
+            parts.append(part)
+        merged = parts[0]
+        for part in parts[1:]:
+            merged.merge(part)
+        self.assertEqual(merged.count, len(finite))
+        self.assertAlmostEqual(merged.mean, np.mean(finite), delta=1e-9 * abs(np.mean(finite)))
+        self.assertAlmostEqual(merged.variance, np.var(finite), delta=1e-9 * np.var(finite))
+        self.assertEqual((merged.min, merged.max), (finite.min(), finite.max()))
+
+    def test_empty(self):
+        empty = stats.ColumnStats()
+        empty.update([np.nan])
+        self.assertIsNone(empty.summary())
+        filled = stats.ColumnStats()
+        filled.update([1., 2., 4.])
+        filled.merge(empty)
+        self.assertEqual((filled.count, filled.mean, filled.variance), (3, 7 / 3., np.var([1., 2., 4.])))
+
+class TestQuantileSketch(unittest.TestCase):
+    QS = np.linspace(0.01, 0.99, 99)
+
+    def streams(self):
+        rng = np.random.RandomState(1)
+        yield 'normal', rng.randn(200000)
+        yield 'sorted', np.sort(rng.rand(200000))
+        yield 'discrete', rng.randint(0, 50, 200000).astype(float)
+
+    def checkErrors(self, name, errors):
+        # the bound holds for each quantile with a high probability, the largest error
+        # of 99 quantiles may be above it
+        self.assertLess(np.mean(errors), RANK_ERROR / 2, name)
+        self.assertLess(np.max(errors), 2 * RANK_ERROR, name)
+
+    def test_exact(self):
+        values = np.random.RandomState(2).randn(stats.SKETCH_SIZE)
+        sketch = stats.QuantileSketch()
+        sketch.update(values)
+        self.assertTrue(np.allclose(sketch.quantiles(self.QS), np.percentile(values, self.QS * 100)))
+
+    def test_rank_error(self):
+        for name, values in self.streams():
+            sketch = stats.QuantileSketch()
+            for start in range(0, len(values), 7000):
+                sketch.update(values[start:start+7000])
+            self.assertEqual(sketch.count, len(values))
+            self.checkErrors(name, rankErrors(values, sketch, self.QS))
+
+    def test_merged_rank_error(self):
+        for name, values in self.streams():
+            sketches = []
+            for seed, part in enumerate(np.array_split(values, 5)):
+                sketch = stats.QuantileSketch(seed=seed)
+                sketch.update(part)
+                sketches.append(sketch)
+            merged = sketches[0]
+            for sketch in sketches[1:]:
+                merged.merge(sketch)
+            self.assertEqual(merged.count, len(values))
+            self.checkErrors(name, rankErrors(values, merged, self.QS))
+
+if __name__ == '__main__':
+    unittest.main()
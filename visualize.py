@@ -1,416 +1,618 @@
-import plotly.offline as py
-import plotly.graph_objs as go
 import numpy as np
 import argparse
-import time
 import os
-import dateutil.parser
+import webbrowser
+import multiprocessing
+import json
+import sys
 
-from lib import utils
+from lib import columns
 from lib import dataset
+from lib import normalize
+from lib import nullity
+from lib import lod
+from lib import cache
+from lib import profiling
+from lib import mmapreader
+from lib import sorting
+from lib import output
+from lib import hover
+from lib import batch
+from lib import profiler
+from lib import raster
+from lib import server
+from lib import wide
 from lib import plotly_utils as pyUtils
-from copy import deepcopy
 
-def parseArguments():
+def parseArguments(argv=None):
     parser = argparse.ArgumentParser()
-    parser.add_argument('dataset', help='the csv dataset to visualize')
+    parser.add_argument('dataset', nargs='?', default=None, help='the csv dataset to visualize')
     parser.add_argument('-s', '--sort', dest='sort', required=False, default=None, help='sort by feature name (could pass a list), ex: --sort Level,Login,Coalition')
     parser.add_argument('-c', '--cmap', dest='cmap', required=False, choices=pyUtils.cmaps.keys(), default='viridis', help='a custom colormap choice')
     parser.add_argument('-l', '--lines', dest='lines', required=False, action='store_true', default=False, help='set to show lines separating features')
-    args = parser.parse_args()
+    parser.add_argument('--lod', dest='lod', required=False, type=int, nargs='?', const=lod.TARGET_ROWS, default=None, help='aggregate the rows into at most LOD bins (%d if no value is given)' % lod.TARGET_ROWS)
+    parser.add_argument('--sample', dest='sample', required=False, type=int, default=None, help='only display a uniform sample of SAMPLE rows, read in a single pass over the file')
+    parser.add_argument('--rows', dest='rows', required=False, type=mmapreader.parseRows, default=None, help='only display a window of rows START:STOP[:STEP], decoded from a memory-mapped row index, ex: --rows 5000000:5010000')
+    parser.add_argument('--seed', dest='seed', required=False, type=int, default=None, help='the random seed of --sample')
+    parser.add_argument('-j', '--jobs', dest='jobs', required=False, type=int, default=None, help='the number of processes used to type and normalize the features, or to write the reports with --batch (1, or the number of cores with --batch, by default)')
+    parser.add_argument('--batch', dest='batch', required=False, default=None, help='write a report for each csv file of a directory or matching a glob pattern, and an index page')
+    parser.add_argument('--batch-dir', dest='batch_dir', required=False, default='csv-reports', help='the output directory of --batch')
+    parser.add_argument('--no-cache', dest='cache', required=False, action='store_false', default=True, help='do not use the profile cache')
+    parser.add_argument('--cache-dir', dest='cache_dir', required=False, default=cache.CACHE_DIR, help='the directory of the profile cache')
+    parser.add_argument('--incremental', dest='incremental', required=False, action='store_true', default=False, help='only parse the rows appended to the dataset since its last run, for append-only files')
+    parser.add_argument('--json-output', dest='compact', required=False, action='store_false', default=True, help='write the figure as plain json instead of binary arrays')
+    parser.add_argument('--sidecar', dest='sidecar', required=False, action='store_true', default=False, help='write the binary arrays of the figure in a separate csv-plot.data.js file')
+    parser.add_argument('--gzip', dest='gzip', required=False, action='store_true', default=False, help='gzip the binary arrays of the figure')
+    parser.add_argument('--quantize', dest='quantize', required=False, action='store_true', default=False, help='store the normalized values of the heatmap as uint16 instead of float32, halving their size in the report')
+    parser.add_argument('--hover', dest='hover', required=False, choices=['lookup', 'text'], default='lookup', help='look up the hovered values in per-feature tables of distinct strings, or write the text of every cell in the figure')
+    parser.add_argument('--stats-only', dest='stats_only', required=False, action='store_true', default=False, help='print the profile of the dataset as json instead of writing a report')
+    parser.add_argument('--profile', dest='profile', required=False, action='store_true', default=False, help='print the time and memory of each stage of the pipeline to stderr')
+    parser.add_argument('--profile-output', dest='profile_output', required=False, default=None, help='also write the stages profile to a file, see --profile-format')
+    parser.add_argument('--profile-format', dest='profile_format', required=False, choices=['json', 'trace'], default='json', help='the format of --profile-output, trace being the chrome trace event format')
+    parser.add_argument('--serve', dest='serve', required=False, type=int, nargs='?', const=server.DEFAULT_PORT, default=None, help='serve the heatmaps on a local http port (%d if no value is given), the page only fetches the rows in view' % server.DEFAULT_PORT)
+    parser.add_argument('--wide', dest='wide', required=False, type=int, nargs='?', const=wide.WINDOW_FEATURES, default=None, help='only draw a window of WIDE features (%d if no value is given), the other features being aggregated into blocks. Datasets of more than %d features are always drawn by windows' % (wide.WINDOW_FEATURES, wide.MAX_FEATURES))
+    parser.add_argument('--page', dest='page', required=False, type=int, default=0, help='the window of features drawn with --wide, from 0')
+    parser.add_argument('--group-features', dest='group_features', required=False, choices=wide.GROUPS, default=None, help='order the features by type or by decreasing missing count before splitting them into windows')
+    parser.add_argument('--png', dest='png', required=False, nargs='?', const='csv-plot.png', default=None, help='draw the heatmaps as a PNG image (csv-plot.png if no file is given) instead of writing a report, without plotly')
+    parser.add_argument('--png-plot', dest='png_plot', required=False, choices=['values', 'types'], default='values', help='the heatmap drawn by --png')
+    parser.add_argument('--missingness', dest='missingness', required=False, action='store_true', default=False, help='add the nullity correlation of the features and the table of the most frequent missing patterns of the rows to the plots')
+    parser.add_argument('--lod-reducer', dest='lod_reducer', required=False, choices=lod.REDUCERS, default='mean', help='the summary of the values of each bin with --lod')
+    args = parser.parse_args(argv)
+    if (args.dataset is None) == (args.batch is None):
+        parser.error('either a dataset or --batch is required')
+    if (args.stats_only is True or args.serve is not None or args.png is not None) and args.batch is not None:
+        parser.error('--stats-only, --serve and --png take a single dataset')
+    if args.jobs is None:
+        args.jobs = multiprocessing.cpu_count() if args.batch is not None else 1
     if args.sort is not None:
         args.sort = args.sort.split(',')
     return args
 
-def computeHeatmapValues(data, features_type):
-    tmp = deepcopy(data)
-    heatmap = np.empty_like(data, dtype=float)
+MISSING_COLOR = '#424242'
+# the colorscale buttons of each missing color
+colorscale_buttons = {}
 
-    for j in range(data.shape[1]):
-        column, indices = dataset.dropMissingData(data[:,j], return_indices=True)
-        if features_type[j] == dataset.types['missing']:
-            vals = None
-        elif features_type[j] == dataset.types['numerical']:
-            column = column.astype(float)
-            m = np.max(column)
-            d = (m - np.min(column))
-            vals = [(1 if d==0 else d), m]
-        elif features_type[j] == dataset.types['date']:
-            idxs = np.delete(np.arange(tmp.shape[0]), indices)
-            for i in idxs:
-                tmp[i,j] = str(time.mktime(dateutil.parser.parse(tmp[i,j]).timetuple()))
-            col = tmp[idxs,j].astype(float)
-            m = np.max(col)
-            d = (m - np.min(col))
-            vals = [d, m]
-        else:
-            unique = list(np.unique(column))
-            lu = len(unique)
-            vals = ([1,0] if lu==1 else [lu-1, lu-1])
-            idxs = np.delete(np.arange(tmp.shape[0]), indices)
-            for i in idxs:
-                tmp[i,j] = str(unique.index(tmp[i,j]))
+def colorscaleButtons(add_missing):
+    if add_missing not in colorscale_buttons:
+        # only the heatmaps of the values and types follow the colormap
+        colorscale_buttons[add_missing] = pyUtils.makeColorscaleButtons(pyUtils.cmaps, add_missing=add_missing, traces=[0, 1])
+    return colorscale_buttons[add_missing]
 
-        for i in range(data.shape[0]):
-            try:
-                point = tmp[i,j].astype(float)
-                point = (point - vals[1]) / vals[0] + 1.
-            except:
-                point = 1.001
-            heatmap[i,j] = point
-    return heatmap
+def loadProfile(args, filepath):
+    ''' profile the csv file `filepath` with the loading options of the arguments
+    '''
+    return profiling.profileDataset(filepath, sample=args.sample, rows=args.rows, seed=args.seed, jobs=args.jobs,
+                                    cache_dir=args.cache_dir if args.cache else None, incremental_state=args.incremental)
 
+def featureWindow(args, profile):
+    ''' the features drawn for a profile, a window of them for wide datasets (see `wide.featureView`)
+    '''
+    window = args.wide
+    if window is None and profile.table.shape[1] > wide.MAX_FEATURES:
+        window = wide.WINDOW_FEATURES
+    with profiler.stage('feature window') as stage:
+        view = wide.featureView(profile, window, args.page, args.group_features)
+        stage.record(heatmap=view.heatmap, types=view.types)
+    return view
 
-args = parseArguments()
-data, labels = dataset.loadCSV(args.dataset)
+def buildReport(args, filepath):
+    ''' profile the csv file `filepath` and build its figure (see `buildFigure`)
+    '''
+    return buildFigure(args, loadProfile(args, filepath))
 
-has_missing_values = False
-colors = pyUtils.cmaps[args.cmap]
-colorscale = pyUtils.makeColorScale(colors)
-missing_color = '#424242'
-if dataset.hasMissingValues(data) is True:
-    colorscale = pyUtils.appendColorToScale(colorscale, missing_color, p=0.001)
-    has_missing_values = True
+def buildFigure(args, profile):
+    ''' build the figure of a profiled file (see `profiling.DatasetProfile`)
+        returns the figure, the javascript run once it is drawn and the summary stats
+        of the file (see `batch.summarize`)
+    '''
+    # plotly is only imported when a report is built
+    import plotly.graph_objs as go
+    table, row_indices, n_rows = profile.table, profile.row_indices, profile.n_rows
+    # the figure draws a window of the features of wide datasets, the others in blocks
+    view = featureWindow(args, profile)
+    features_type, heatmap_array, labels = view.features_type, view.heatmap, view.labels
+    n_blocks = len(view.blocks)
+    # the raw values are only materialized as a text matrix with --hover text
+    data = None
+    if args.hover == 'text':
+        with profiler.stage('string matrix') as stage:
+            data = view.table.toStringMatrix()
+            if n_blocks > 0:
+                data = data.appendConstant(labels[-n_blocks:])
+            stage.record(data=data)
 
-array_x = np.arange(data.shape[1])
-array_y = np.arange(data.shape[0])
+    has_missing_values = False
+    colors = pyUtils.cmaps[args.cmap]
+    colorscale = pyUtils.makeColorScale(colors)
+    if table.hasMissingValues() is True:
+        colorscale = pyUtils.appendColorToScale(colorscale, MISSING_COLOR, p=0.001)
+        has_missing_values = True
 
-# Compute the data type
-features_type = dataset.determineFeaturesType(data)
-array_z = np.ones_like(data, dtype=float)
-for j in range(data.shape[1]):
-    array_z[:,j] = features_type[j]
-array_z[np.isin(data, dataset.missing_labels)] = 0
-valuesType = ([[dataset.labels[array_z[i,j]] for j in range(data.shape[1])] for i in range(data.shape[0])])
+    array_x = np.arange(view.n_columns)
+    # the labelled columns, thinned to what fits
+    ticks = wide.tickIndices(view.n_columns)
 
-missing_count_along_x = data.shape[0] - np.count_nonzero(array_z, axis=0)
-missing_count_along_x_range = [np.min(missing_count_along_x), np.max(missing_count_along_x)]
-missing_count_along_y = np.count_nonzero(array_z, axis=1)
-missing_count_along_y_range = [np.min(missing_count_along_y), np.max(missing_count_along_y)]
+    with profiler.stage('missing counts') as stage:
+        array_z = view.types
+        missing_count_along_x = view.missing_counts
+        missing_count_along_x_range = [np.min(missing_count_along_x), np.max(missing_count_along_x)]
+        missing_count_along_y = table.shape[1] - table.mask.countPerRow()
+        stage.record(types=array_z, missing_along_x=missing_count_along_x, missing_along_y=missing_count_along_y)
 
-heatmap_array = computeHeatmapValues(data, features_type)
+    # sort with arg --sort [labels], by the first label then by the next ones for the equal values
+    base_heatmap_array, base_array_z, base_missing_count_along_y = heatmap_array, array_z, missing_count_along_y
+    order = np.arange(table.shape[0])
+    if args.sort is not None:
+        with profiler.stage('sort') as stage:
+            order = sorting.sortPermutation(profile.heatmap, profile.labels, args.sort)
+            heatmap_array, array_z, missing_count_along_y = heatmap_array[order], array_z[order], missing_count_along_y[order]
+            if data is not None:
+                data = data.take(order)
+            stage.record(order=order)
 
-# sort with arg --sort [label]
-def sortHeatmapDataByLabel(label, data, heatmap_array):
-    idx = list(labels).index(label)
-    axis = 1
-    heatmap_array = np.insert(heatmap_array, 0, np.arange(heatmap_array.shape[0]), axis=axis)
-    heatmap_array = np.asarray(sorted(heatmap_array, key=lambda x:x[idx+1], reverse=True))
-    indices = np.asarray(heatmap_array[:,0], dtype=int)
-    data = data[indices]
-    heatmap_array = np.delete(heatmap_array, 0, axis=axis)
-    return data, heatmap_array
+    # aggregate the rows with arg --lod [rows]
+    def applyLevelOfDetail(data, heatmap_array, array_z, missing_count_along_y):
+        if args.lod is None or heatmap_array.shape[0] <= args.lod:
+            return data, heatmap_array, array_z, missing_count_along_y, row_indices
+        levels = lod.aggregateRows(heatmap_array, array_z, missing_count_along_y, features_type, args.lod, reducer=args.lod_reducer)
+        return levels.describe(), levels.heatmap, levels.types, levels.completeness, row_indices[levels.rows]
 
-if args.sort is not None and args.sort[0] in list(labels):
-    data, heatmap_array = sortHeatmapDataByLabel(args.sort[0], data, heatmap_array)
+    with profiler.stage('level of detail') as stage:
+        data, heatmap_array, array_z, missing_count_along_y, array_y = applyLevelOfDetail(data, heatmap_array, array_z, missing_count_along_y)
+        missing_count_along_y_range = [np.min(missing_count_along_y), np.max(missing_count_along_y)]
+        # the types of the bins of rows are looked up by the hover script
+        aggregated = args.lod is not None and base_heatmap_array.shape[0] > args.lod
+        valuesType = None
+        if data is not None and not aggregated:
+            valuesType = columns.StringColumns.fromCodes([dataset.labels[t] for t in range(len(dataset.labels))], array_z)
+        stage.record(heatmap=heatmap_array, types=array_z)
 
-dlist = [
-    #(Heatmap 1 : Features repartition)
-    go.Heatmap(
-        x=array_x,
-        y=array_y,
-        z=heatmap_array,
-        text=data,
-        colorscale=colorscale,
-        colorbar=dict(
-            x=1.,
-            y=0.15,
-            len=0.85,
-            thicknessmode='fraction',
-            thickness=0.025,
-            xpad=8,
-            ypad=0,
-            xanchor='left',
-            yanchor='bottom',
-            ticks='inside',
-            ticklen=5,
-            title='Raw values (Feature-relative scale)',
-            titleside='right',
-            outlinewidth=0.5,
+    # the heatmap is drawn quantized with --quantize, its colorbar keeping the labels of the normalized values
+    def drawnValues(heatmap_array):
+        return normalize.quantize(heatmap_array) if args.quantize else heatmap_array
+    value_ticks = {}
+    if args.quantize:
+        tick_values = np.linspace(0., 1., 6)
+        value_ticks = dict(tickvals=[int(round(v * normalize.QUANTIZATION_SCALE)) for v in tick_values], ticktext=['%g' % v for v in tick_values])
+
+    dlist = [
+        #(Heatmap 1 : Features repartition)
+        go.Heatmap(
+            x=array_x,
+            y=array_y,
+            z=drawnValues(heatmap_array),
+            text=data,
+            colorscale=colorscale,
+            colorbar=dict(
+                x=1.,
+                y=0.15,
+                len=0.85,
+                thicknessmode='fraction',
+                thickness=0.025,
+                xpad=8,
+                ypad=0,
+                xanchor='left',
+                yanchor='bottom',
+                ticks='inside',
+                ticklen=5,
+                title='Raw values (Feature-relative scale)',
+                titleside='right',
+                outlinewidth=0.5,
+                **value_ticks
+            ),
+            hoverinfo=("x+y+text" if data is not None else "none"),
+            xaxis='x',
+            yaxis='y',
         ),
-        hoverinfo="x+y+text",
-        xaxis='x',
-        yaxis='y',
-    ),
-    #(Heatmap 2 : Data type)
-    go.Heatmap(
-        visible=False,
-        x=array_x,
-        y=array_y,
-        z=array_z,
-        text=valuesType,
-        zmin=0,
-        zmax=len(dataset.types.keys())-1+(.01 if has_missing_values else 0),
-        colorscale=colorscale,
-        colorbar=dict(
-            x=1.,
-            y=0.15,
-            len=0.85,
-            thicknessmode='fraction',
-            thickness=0.025,
-            xpad=8,
-            ypad=0,
-            xanchor='left',
-            yanchor='bottom',
-            ticks='inside',
-            ticklen=0,
-            showticklabels=False,
-            title='Values type (Missing, Numerical, String, Date, Boolean)',
-            titleside='right',
-            outlinewidth=0.5,
+        #(Heatmap 2 : Data type)
+        go.Heatmap(
+            visible=False,
+            x=array_x,
+            y=array_y,
+            z=array_z,
+            text=valuesType,
+            zmin=0,
+            zmax=len(dataset.types.keys())-1+(.01 if has_missing_values else 0),
+            colorscale=colorscale,
+            colorbar=dict(
+                x=1.,
+                y=0.15,
+                len=0.85,
+                thicknessmode='fraction',
+                thickness=0.025,
+                xpad=8,
+                ypad=0,
+                xanchor='left',
+                yanchor='bottom',
+                ticks='inside',
+                ticklen=0,
+                showticklabels=False,
+                title='Values type (Missing, Numerical, String, Date, Boolean)',
+                titleside='right',
+                outlinewidth=0.5,
+            ),
+            hoverinfo=("text" if valuesType is not None else "none"),
+            showscale=True,
+            xaxis='x',
+            yaxis='y',
         ),
-        hoverinfo="text",
-        showscale=True,
-        xaxis='x',
-        yaxis='y',
-    ),
-    #(Data Completeness plot)
-    go.Scatter(
-        x=missing_count_along_y,
-        y=array_y,
-        hoverinfo="x+y",
-        showlegend=False,
-        line={
-            'color':"#000000",
-            'shape':'vhv',#should be hvh...
-            'width':1
-        },
-        mode='lines',
-        xaxis='x2',
-        yaxis='y2',
-    ),
-    #(xaxis missing values labels)
-    go.Scatter(
-        x=array_x,
-        y=np.zeros_like(array_x),
-        text=missing_count_along_x,
-        hoverinfo="skip",
-        showlegend=False,
-        mode='lines',
-        xaxis='x3',
-        yaxis='y3',
-    ),
-    #(xaxis missing values labels 2)
-    go.Scatter(
-        x=array_x,
-        y=np.zeros_like(array_x),
-        text=missing_count_along_x,
-        hoverinfo="skip",
-        showlegend=False,
-        mode='lines',
-        xaxis='x4',
-        yaxis='y4',
-    ),
-]# + pyUtils.makeBoxPlots(data, labels, features_type, axis=0, visible=False, normed=False)
-
-
-layout = go.Layout(
-    # font=dict(family='Balto', size=11, color='#2f2f2f'),
-    margin=dict(l=60,r=80,t=90,b=30),
+        #(Data Completeness plot)
+        go.Scatter(
+            x=missing_count_along_y,
+            y=array_y,
+            hoverinfo="x+y",
+            showlegend=False,
+            line={
+                'color':"#000000",
+                'shape':'vhv',#should be hvh...
+                'width':1
+            },
+            mode='lines',
+            xaxis='x2',
+            yaxis='y2',
+        ),
+        #(xaxis missing values labels)
+        go.Scatter(
+            x=array_x,
+            y=np.zeros_like(array_x),
+            text=missing_count_along_x,
+            hoverinfo="skip",
+            showlegend=False,
+            mode='lines',
+            xaxis='x3',
+            yaxis='y3',
+        ),
+        #(xaxis missing values labels 2)
+        go.Scatter(
+            x=array_x,
+            y=np.zeros_like(array_x),
+            text=missing_count_along_x,
+            hoverinfo="skip",
+            showlegend=False,
+            mode='lines',
+            xaxis='x4',
+            yaxis='y4',
+        ),
+    ]
+    #(Box plots of the numerical features, drawn from their summary statistics)
+    with profiler.stage('box plots'):
+        dlist += pyUtils.makeBoxPlots(profile.columnSummaries(view.features) + [None] * n_blocks, labels, axis=5, visible=False, normed=True)
+    #(Nullity correlation of the features and most frequent missing patterns, with --missingness)
+    if args.missingness:
+        with profiler.stage('missingness') as stage:
+            correlation = np.full((view.n_columns, view.n_columns), np.nan)
+            correlation[:len(view.features),:len(view.features)] = nullity.nullityCorrelation(view.table.mask)
+            patterns = nullity.missingPatterns(view.table.mask)
+            stage.record(correlation=correlation, patterns=patterns.patterns)
+        dlist += [
+            pyUtils.makeNullityHeatmap(correlation, labels, axis=6, visible=False),
+            pyUtils.makePatternTable(patterns.top(view.table.labels), dict(x=[0, 0.955], y=[0.15, 1]), visible=False),
+        ]
 
-    #(Axes main plot)
-    xaxis=dict(
-        domain=[0, 0.955],
-        tickangle=20,
-        ticktext=labels,
-        tickvals=array_x,
-        ticklen=5,
-        showgrid=False,
-        zeroline=False,
-        side="top",
-        fixedrange=True,
-    ),
-    yaxis=dict(
-        title='Indices',
-        domain=[0.15, 1],
-        tickvals=[0, data.shape[0]-1],
-        showgrid=False,
-        zeroline=False,
-        autorange='reversed'
-    ),
-    #(Axes Data Completeness)
-    xaxis2=dict(
-        title='Data<br>Completeness',
-        titlefont=dict(size=11),
-        tickfont=dict(size=11),
-        domain=[0.96, 1],
-        range=[missing_count_along_y_range[0]-0.05, missing_count_along_y_range[1]+0.05],
-        ticklen=3,
-        tickwidth=3,
-        tickvals=missing_count_along_y_range,
-        showgrid=False,
-        zeroline=False,
-        fixedrange=True,
-        side="top",
-    ),
-    yaxis2=dict(
-        autorange=False,
-        range=[data.shape[0]-0.5, -0.5],
-        showgrid=False,
-        showticklabels=False,
-        zeroline=False,
-        overlaying='y',
-    ),
-    #(Axes missing values labels)
-    xaxis3=dict(
-        tickfont=dict(size=10,color='#505050'),
-        range=[-0.5, data.shape[1]-0.5],
-        tickvals=np.arange(len(missing_count_along_x))[0::2],
-        ticktext=missing_count_along_x[0::2],
-        ticklen=1,
-        tickwidth=3,
-        showgrid=False,
-        zeroline=False,
-        fixedrange=True,
-        overlaying='x',
-    ),
-    yaxis3=dict(
-        domain=[0.13, 0.15],
-        range=[1, 2],
-        showticklabels=False,
-        showgrid=False,
-        zeroline=False,
-        fixedrange=True,
-    ),
-    #(Axes missing values labels 2)
-    xaxis4=dict(
-        title='Missing values (per feature)',
-        titlefont=dict(size=11,color='#505050',),
-        tickfont=dict(size=10,color='#505050'),
-        tickcolor='#b0b0b0',
-        range=[-0.5, data.shape[1]-0.5],
-        tickvals=np.arange(len(missing_count_along_x))[1::2],
-        ticktext=missing_count_along_x[1::2],
-        ticklen=15,
-        showgrid=False,
-        zeroline=False,
-        fixedrange=True,
-        overlaying='x',
-    ),
-    yaxis4=dict(
-        domain=[0.12, 0.13],
-        range=[1, 2],
-        showticklabels=False,
-        showgrid=False,
-        zeroline=False,
-        fixedrange=True,
-    ),
 
-    #(Title, which is the name of the file)
-    # annotations=[
-    #     dict(
-    #         x=0.5,
-    #         y=-0.02,
-    #         font=dict(size=14),
-    #         xref='paper',
-    #         yref='paper',
-    #         text=os.path.basename(args.dataset),
-    #         xanchor='middle',
-    #         showarrow=False
-    #     )
-    # ]
-    # boxgroupgap=(4./data.shape[1]), # -> rescales the box plots in function of the number of features
-)
-#(Lines on main plot)
-shapes = pyUtils.makeVerticalLines(np.arange(len(array_x)+1)-0.5, y0=0.15, xref='x', yref='paper', color='#000000', linewidth=0.5) + \
-         pyUtils.makeHorizontalLines([0.15,1], x0=0., x1=0.955, xref='paper', yref='paper', color='#000000', linewidth=0.5)
+    layout = go.Layout(
+        # font=dict(family='Balto', size=11, color='#2f2f2f'),
+        margin=dict(l=60,r=80,t=90,b=30),
 
-#(Dropdown menu for color map choices)
-buttons_cmaps=dict(
-    buttons=pyUtils.makeColorscaleButtons(pyUtils.cmaps, add_missing=missing_color if has_missing_values else None),
-    type='dropdown',
-    direction='left',
-    active=(pyUtils.cmaps.keys().index(args.cmap)),
-    pad={'t':7},
-    showactive=True,
-    x=.96,
-    y=0.04,
-    xanchor='left',
-    yanchor='top',
-    borderwidth=0.5,
-)
-#(Buttons to show/hide lines)
-buttons_lines=dict(
-    buttons=[
-        dict(
-            args=['shapes', []],
-            label='Hide',
-            method='relayout'
+        #(Axes main plot)
+        xaxis=dict(
+            domain=[0, 0.955],
+            tickangle=20,
+            ticktext=labels[ticks],
+            tickvals=ticks,
+            ticklen=5,
+            showgrid=False,
+            zeroline=False,
+            side="top",
+            fixedrange=True,
         ),
-        dict(
-            args=['shapes', shapes],
-            label='Show',
-            method='relayout'
-        )
-    ],
-    type='buttons',
-    direction='right',
-    active=(1 if args.lines else 0),
-    showactive=True,
-    pad={'t':8},
-    x=.96,
-    y=0.15,
-    xanchor='left',
-    yanchor='top',
-    borderwidth=0.5
-)
-#(Dropdown menu to select the plot to display)
-buttons_plot=dict(
-    buttons=[
-        dict(
-            args=['visible', [True, False, True]],
-            label='Features repartition',
-            method='restyle'
+        yaxis=dict(
+            title='Indices',
+            domain=[0.15, 1],
+            tickvals=[0, n_rows-1],
+            showgrid=False,
+            zeroline=False,
+            autorange='reversed'
+        ),
+        #(Axes Data Completeness)
+        xaxis2=dict(
+            title='Data<br>Completeness',
+            titlefont=dict(size=11),
+            tickfont=dict(size=11),
+            domain=[0.96, 1],
+            range=[missing_count_along_y_range[0]-0.05, missing_count_along_y_range[1]+0.05],
+            ticklen=3,
+            tickwidth=3,
+            tickvals=missing_count_along_y_range,
+            showgrid=False,
+            zeroline=False,
+            fixedrange=True,
+            side="top",
+        ),
+        yaxis2=dict(
+            autorange=False,
+            range=[n_rows-0.5, -0.5],
+            showgrid=False,
+            showticklabels=False,
+            zeroline=False,
+            overlaying='y',
+        ),
+        #(Axes missing values labels)
+        xaxis3=dict(
+            tickfont=dict(size=10,color='#505050'),
+            range=[-0.5, view.n_columns-0.5],
+            tickvals=ticks[0::2],
+            ticktext=missing_count_along_x[ticks[0::2]],
+            ticklen=1,
+            tickwidth=3,
+            showgrid=False,
+            zeroline=False,
+            fixedrange=True,
+            overlaying='x',
+        ),
+        yaxis3=dict(
+            domain=[0.13, 0.15],
+            range=[1, 2],
+            showticklabels=False,
+            showgrid=False,
+            zeroline=False,
+            fixedrange=True,
+        ),
+        #(Axes missing values labels 2)
+        xaxis4=dict(
+            title='Missing values (per feature)',
+            titlefont=dict(size=11,color='#505050',),
+            tickfont=dict(size=10,color='#505050'),
+            tickcolor='#b0b0b0',
+            range=[-0.5, view.n_columns-0.5],
+            tickvals=ticks[1::2],
+            ticktext=missing_count_along_x[ticks[1::2]],
+            ticklen=15,
+            showgrid=False,
+            zeroline=False,
+            fixedrange=True,
+            overlaying='x',
+        ),
+        yaxis4=dict(
+            domain=[0.12, 0.13],
+            range=[1, 2],
+            showticklabels=False,
+            showgrid=False,
+            zeroline=False,
+            fixedrange=True,
+        ),
+        #(Axes box plots)
+        xaxis5=dict(
+            range=[-0.5, view.n_columns-0.5],
+            showticklabels=False,
+            showgrid=False,
+            zeroline=False,
+            fixedrange=True,
+            overlaying='x',
+        ),
+        yaxis5=dict(
+            range=[-0.05, 1.05],
+            showticklabels=False,
+            showgrid=False,
+            zeroline=False,
+            fixedrange=True,
+            overlaying='y',
+        ),
+        #(Axes nullity correlation)
+        xaxis6=dict(
+            range=[-0.5, view.n_columns-0.5],
+            showticklabels=False,
+            showgrid=False,
+            zeroline=False,
+            fixedrange=True,
+            overlaying='x',
+        ),
+        yaxis6=dict(
+            range=[view.n_columns-0.5, -0.5],
+            showticklabels=False,
+            showgrid=False,
+            zeroline=False,
+            fixedrange=True,
+            overlaying='y',
         ),
-        dict(
-            args=['visible', [False, True, True]],
-            label='Data type',
-            method='restyle'
-        )
-    ],
-    type='dropdown',
-    direction='left',
-    active=0,
-    showactive=True,
-    pad={'t':4},
-    x=0.96,
-    y=0.09,
-    xanchor='left',
-    yanchor='top',
-    borderwidth=0.5
-)
 
-def createSortByLabelsButtonsDicts(labels):
-    dicts = []
-    for label in labels:
-        data_tmp, heatmap_array_tmp = sortHeatmapDataByLabel(label, deepcopy(data), deepcopy(heatmap_array))
-        dicts.append(dict(
-            args=[{'z':[heatmap_array_tmp, array_z], 'text':[data_tmp, valuesType, None, missing_count_along_x, missing_count_along_x]}],
-            label=label,
-            method='restyle'
-        ))
-    return dicts
+        #(Title, which is the name of the file)
+        # annotations=[
+        #     dict(
+        #         x=0.5,
+        #         y=-0.02,
+        #         font=dict(size=14),
+        #         xref='paper',
+        #         yref='paper',
+        #         text=os.path.basename(filepath),
+        #         xanchor='middle',
+        #         showarrow=False
+        #     )
+        # ]
+    )
+    #(Lines on main plot)
+    shapes = pyUtils.makeVerticalPath(np.arange(len(array_x)+1)-0.5, y0=0.15, xref='x', yref='paper', color='#000000', linewidth=0.5) + \
+             pyUtils.makeHorizontalLines([0.15,1], x0=0., x1=0.955, xref='paper', yref='paper', color='#000000', linewidth=0.5)
 
-if args.sort is not None and len(args.sort) > 1:
-    buttons_sort=dict(
-        buttons=createSortByLabelsButtonsDicts(args.sort),
+    #(Dropdown menu for color map choices)
+    buttons_cmaps=dict(
+        buttons=colorscaleButtons(MISSING_COLOR if has_missing_values else None),
         type='dropdown',
+        direction='left',
+        active=(pyUtils.cmaps.keys().index(args.cmap)),
+        pad={'t':7},
+        showactive=True,
+        x=.96,
+        y=0.04,
+        xanchor='left',
+        yanchor='top',
+        borderwidth=0.5,
+    )
+    #(Buttons to show/hide lines)
+    buttons_lines=dict(
+        buttons=[
+            dict(
+                args=['shapes', []],
+                label='Hide',
+                method='relayout'
+            ),
+            dict(
+                args=['shapes', shapes],
+                label='Show',
+                method='relayout'
+            )
+        ],
+        type='buttons',
         direction='right',
+        active=(1 if args.lines else 0),
+        showactive=True,
+        pad={'t':8},
+        x=.96,
+        y=0.15,
+        xanchor='left',
+        yanchor='top',
+        borderwidth=0.5
+    )
+    #(Dropdown menu to select the plot to display, with the traces shown by each plot)
+    plots = [('Features repartition', [0, 2, 3, 4]), ('Data type', [1, 2, 3, 4]), ('Box plots', [3, 4, 5, 6])]
+    if args.missingness:
+        plots += [('Nullity correlation', [3, 4, 7]), ('Missing patterns', [8])]
+    buttons_plot=dict(
+        buttons=[
+            dict(
+                args=['visible', [i in plot_traces for i in range(len(dlist))]],
+                label=plot_label,
+                method='restyle'
+            ) for plot_label, plot_traces in plots
+        ],
+        type='dropdown',
+        direction='left',
         active=0,
         showactive=True,
         pad={'t':4},
-        x=0.,
+        x=0.96,
         y=0.09,
         xanchor='left',
         yanchor='top',
         borderwidth=0.5
     )
-    layout['updatemenus'] = [buttons_cmaps, buttons_lines, buttons_plot, buttons_sort]
-else:
-    layout['updatemenus'] = [buttons_cmaps, buttons_lines, buttons_plot]
 
-if args.lines is True:
-    layout['shapes'] = shapes
+    def createSortByLabelsButtonsDicts(sort_labels):
+        ''' the sort buttons only hold the permutation of the rows, applied in the page by
+            `sort_script`, unless the rows are aggregated (--lod) in which case they hold the
+            aggregated heatmaps
+        '''
+        dicts, permutations = [], {}
+        for label, keys in zip(sort_labels, sorting.buttonSortLabels(sort_labels)):
+            permutation = sorting.sortPermutation(profile.heatmap, profile.labels, keys)
+            if aggregated:
+                data_tmp, heatmap_array_tmp, array_z_tmp = applyLevelOfDetail(None, base_heatmap_array[permutation], base_array_z[permutation], base_missing_count_along_y[permutation])[:3]
+                dicts.append(dict(
+                    args=[{'z':[drawnValues(heatmap_array_tmp), array_z_tmp], 'text':[data_tmp, None, None, missing_count_along_x, missing_count_along_x]}, [0, 1, 2, 3, 4]],
+                    label=label,
+                    method='restyle'
+                ))
+            else:
+                permutations[label] = sorting.relativePermutation(permutation, order)
+                dicts.append(dict(args=[], label=label, method='skip'))
+        return dicts, permutations
+
+    page_scripts = []
+    with profiler.stage('hover tables'):
+        if data is None:
+            page_scripts.append(hover.hoverScript(view.table, order if args.sort is not None else None, blocks=labels[len(view.features):]))
+        elif aggregated:
+            page_scripts.append(hover.hoverScript(view.table, blocks=labels[len(view.features):], values=False))
+    if args.sort is not None and len(args.sort) > 1:
+        with profiler.stage('sort buttons'):
+            sort_buttons, sort_permutations = createSortByLabelsButtonsDicts(args.sort)
+            if len(sort_permutations) > 0:
+                page_scripts.append(sorting.sortButtonsScript(sort_permutations))
+        buttons_sort=dict(
+            buttons=sort_buttons,
+            type='dropdown',
+            direction='right',
+            active=0,
+            showactive=True,
+            pad={'t':4},
+            x=0.,
+            y=0.09,
+            xanchor='left',
+            yanchor='top',
+            borderwidth=0.5
+        )
+        layout['updatemenus'] = [buttons_cmaps, buttons_lines, buttons_plot, buttons_sort]
+    else:
+        layout['updatemenus'] = [buttons_cmaps, buttons_lines, buttons_plot]
+
+    if args.lines is True:
+        layout['shapes'] = shapes
+
+    with profiler.stage('figure'):
+        fig = go.Figure(data=dlist, layout=layout)
+    return fig, page_scripts, batch.summarize(table, profile.features_type, n_rows)
+
+def writeReport(args, fig, scripts, filename, auto_open=True):
+    with profiler.stage('write html'):
+        if args.compact is True:
+            output.writeCompactHTML(fig, filename, scripts=scripts, sidecar=args.sidecar, compress=args.gzip, auto_open=auto_open)
+        else:
+            output.writeHTML(fig, filename, scripts=scripts, auto_open=auto_open)
+
+def writeImage(args, filepath, filename):
+    ''' profile the csv file `filepath` and draw its heatmaps as the PNG image `filename`
+        (see `raster.renderImage`), plotly is not imported
+    '''
+    with profiler.stage(os.path.basename(filepath)):
+        profile = loadProfile(args, filepath)
+        view = featureWindow(args, profile)
+        heatmap, types = view.heatmap, view.types
+        completeness = profile.table.shape[1] - profile.table.mask.countPerRow()
+        if args.sort is not None:
+            with profiler.stage('sort') as stage:
+                order = sorting.sortPermutation(profile.heatmap, profile.labels, args.sort)
+                heatmap, types, completeness = heatmap[order], types[order], completeness[order]
+                stage.record(order=order)
+        with profiler.stage('rasterize') as stage:
+            missing_color = MISSING_COLOR if profile.table.hasMissingValues() else None
+            image = raster.renderImage(heatmap, types, completeness, view.missing_counts, cmap=args.cmap,
+                                       missing_color=missing_color, plot=args.png_plot)
+            stage.record(image=image)
+        with profiler.stage('write png'):
+            raster.writePNG(filename, image)
+
+def visualize(args, filepath, filename='csv-plot.html', auto_open=True):
+    ''' profile the csv file `filepath` and write its report to `filename`
+        returns the summary stats of the file (see `batch.summarize`)
+    '''
+    with profiler.stage(os.path.basename(filepath)):
+        fig, scripts, summary = buildReport(args, filepath)
+        writeReport(args, fig, scripts, filename, auto_open)
+    return summary
 
-fig = go.Figure(data=dlist, layout=layout)
-py.plot(fig, filename='csv-plot.html', show_link=False)
+if __name__ == '__main__':
+    args = parseArguments()
+    if args.profile is True:
+        profiler.enable()
+    if args.stats_only is True:
+        json.dump(loadProfile(args, args.dataset).stats(), sys.stdout, indent=1)
+        sys.stdout.write('\n')
+    elif args.serve is not None:
+        server.serve(loadProfile(args, args.dataset), args.serve, cmap=args.cmap, missing_color=MISSING_COLOR,
+                     sort=args.sort, reducer=args.lod_reducer)
+    elif args.png is not None:
+        writeImage(args, args.dataset, args.png)
+    elif args.batch is None:
+        visualize(args, args.dataset)
+    else:
+        paths = batch.expandPaths(args.batch)
+        # the colorscale buttons are computed once, before the workers are forked
+        for add_missing in [None, MISSING_COLOR]:
+            colorscaleButtons(add_missing)
+        index = batch.runBatch(visualize, paths, args, args.batch_dir, jobs=args.jobs)
+        webbrowser.open('file://' + os.path.abspath(index))
+    if args.profile is True:
+        profile = profiler.disable()
+        profile.writeTable()
+        if args.profile_output is not None:
+            (profile.writeTrace if args.profile_format == 'trace' else profile.writeJSON)(args.profile_output)